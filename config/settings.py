@@ -99,7 +99,7 @@ DATABASE_ROUTERS = ['core.db_router.MultiTenantRouter']
 # Database configuration from environment variables
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db_backend',  # PostgreSQL with per-tenant connection pool (core.db_pool)
         'NAME': config('DB_NAME'),
         'USER': config('DB_USER'),
         'PASSWORD': config('DB_PASSWORD'),
@@ -109,11 +109,11 @@ DATABASES = {
             'client_encoding': 'UTF8',
             'connect_timeout': 10,
         },
-        'CONN_MAX_AGE': 0,  # Disable connection pooling to allow dynamic db switching
+        'CONN_MAX_AGE': 0,  # Release per request; core.db_backend returns the connection to the tenant pool
         'CONN_HEALTH_CHECKS': True,  # Enable connection health checks
     },
     'insurance': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db_backend',  # PostgreSQL with per-tenant connection pool (core.db_pool)
         'NAME': 'insurance',  # Insurance database name
         'USER': config('DB_USER'),
         'PASSWORD': config('DB_PASSWORD'),
@@ -123,8 +123,12 @@ DATABASES = {
             'client_encoding': 'UTF8',
             'connect_timeout': 10,
         },
-        'CONN_MAX_AGE': 0,  # Disable connection pooling to allow dynamic db switching
+        'CONN_MAX_AGE': 0,  # Release per request; core.db_backend returns the connection to the tenant pool
         'CONN_HEALTH_CHECKS': True,  # Enable connection health checks
+        'TEST': {
+            'NAME': 'test_insurance',  # Also gets the auth/contenttypes tables (core.db_router), core references auth_user
+            'DEPENDENCIES': [],  # Tests may use insurance alone
+        },
     }
 }
 
@@ -250,7 +254,11 @@ logs_dir = BASE_DIR / 'logs'
 if not os.path.exists(logs_dir):
     os.makedirs(logs_dir)
 
-# Cache Configuration (using Django's default cache)
+# Cache Configuration
+# 'default' stays per-process; 'tenant' is shared by all gunicorn workers on the
+# box (file-backed, no external service) and is used by core.cache.tenant_cache,
+# which prefixes every key with the tenant database name. Its version counters need an
+# atomic incr: keep the file-based backend (incr is file-locked) or use memcached / redis.
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
@@ -259,14 +267,40 @@ CACHES = {
         'OPTIONS': {
             'MAX_ENTRIES': 1000,
         }
-    }
+    },
+    'tenant': {
+        'BACKEND': config('TENANT_CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('TENANT_CACHE_LOCATION', default=str(BASE_DIR / 'cache')),
+        'TIMEOUT': 3600,  # 1 hour default timeout; entries are also invalidated explicitly
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        }
+    },
 }
+TENANT_CACHE_ALIAS = 'tenant'
 
 # Connection pooling configuration
 DB_POOL_SIZE = 5  # 5 concurrent connections per database
 DB_MAX_OVERFLOW = 3  # Extra 3 connections when pool is full
 DB_POOL_TIMEOUT = 30  # Wait 30 seconds for available connection
 DB_POOL_RECYCLE = 3600  # Recycle connections after 1 hour
+DB_POOL_IDLE_TIMEOUT = 300  # Close connections idle for more than 5 minutes
+DB_POOL_PING_INTERVAL = 30  # Health-check connections idle longer than 30 seconds before reuse
+DB_POOL_MAX_TENANTS = 50  # Maximum tenant pools kept per worker process (LRU evicted)
+
+# Policy Word documents (core.word_generator)
+WORD_TEMPLATE_CACHE_SIZE = 32  # Compiled Word templates kept per worker process (LRU evicted)
+POLICY_BATCH_WORKERS = 4  # Processes rendering documents for one batch download or generate_policy_documents run (core.policy_batch)
+POLICY_BATCH_MAX_POLICIES = 25  # Largest batch the download endpoint renders (must finish within the gunicorn timeout); larger: generate_policy_documents
+POLICY_BATCH_POOL_RESTARTS = 3  # Times a batch rebuilds its render pool after a worker dies before failing the rest
+POLICY_DOCUMENT_MAX_AGE_DAYS = 30  # Generated policy documents unused for longer are removed
+POLICY_DOCUMENT_MAX_BYTES = 2 * 1024 ** 3  # Size cap of MEDIA_ROOT/policy_documents, least recently used evicted first
+POLICY_DOCUMENT_PRUNE_INTERVAL = 3600  # Seconds between opportunistic retention runs per process
+POLICY_IMPORT_CHUNK_SIZE = 500  # Policies inserted per transaction by the bulk policy import
+
+# Tenant maintenance commands
+SQL_DEPLOY_WORKERS = 8  # Tenant databases updated concurrently by deploy_sql_functions (core.sql_deploy)
+MIGRATE_TENANTS_WORKERS = 4  # Tenant databases migrated concurrently by migrate_tenants (core.tenant_migrations)
 
 # Session timeout for security
 SESSION_COOKIE_AGE = 3600  # 1 hour session timeout
@@ -7,12 +7,21 @@ from typing import List, Optional
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.models import AnonymousUser
 from django.db.models import Prefetch
+from django.http import HttpResponse
+from django.utils.http import parse_etags
 from core.models import (
     Ref_Policy_Template,
     Ref_Template_Product,
     Ref_Template_Product_Item,
     Ref_Template_Product_Item_Risk
 )
+from core.template_cache import (
+    get_template_tree as get_cached_template_tree,
+    set_template_tree as set_cached_template_tree,
+    template_tree_etag,
+    template_tree_version
+)
+from core.thread_local import get_current_db
 from .schemas import (
     TemplateSchema,
     TemplateCreateSchema,
@@ -140,10 +149,35 @@ def delete_template(request, template_id: int):
 # This must come BEFORE parameterized routes to avoid routing conflicts
 
 @router.get("/templates/tree", response=List[TemplateTreeSchema])
-def get_template_tree(request):
-    """Get complete template tree structure with all nested relationships"""
+def get_template_tree(request, response: HttpResponse):
+    """
+    Get complete template tree structure with all nested relationships
+    Served from the tenant cache; If-None-Match with the current ETag returns 304
+    """
     check_auth(request)
     
+    db_name = get_current_db()
+    version = template_tree_version(db_name)
+    etag = template_tree_etag(version)
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        not_modified = HttpResponse(status=304)
+        not_modified['ETag'] = etag
+        not_modified['Cache-Control'] = 'private, no-cache'
+        return not_modified
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    
+    result = get_cached_template_tree(version, db_name)
+    if result is None:
+        # The version was read first, so a template edit committed meanwhile
+        # leaves this entry unreachable instead of serving it as current
+        result = _build_template_tree()
+        set_cached_template_tree(version, result, db_name)
+    return result
+
+
+def _build_template_tree():
+    """Serialize all templates with their products, items and risks (4 queries)"""
     # Optimized query with all prefetches
     templates = Ref_Policy_Template.objects.filter(
         IsDelete=False
@@ -213,86 +247,54 @@ def get_template_tree(request):
 
 # ==================== COMBINED DETAIL ENDPOINT ====================
 
+# CombinedDetailSchema field -> lookup path from Ref_Template_Product. The
+# reverse item / risk relations are joined with LEFT OUTER JOINs, so a product
+# without items (or an item without risks) still yields one row with NULLs.
+COMBINED_DETAIL_COLUMNS = {
+    'TemplateProductId': 'TemplateProductId',
+    'TemplateProductItemId': 'template_product_items__TemplateProductItemId',
+    'TemplateProductItemRiskId': 'template_product_items__template_product_item_risks__TemplateProductItemRiskId',
+    'ProductId': 'ProductId__ProductId',
+    'ProductName': 'ProductId__ProductName',
+    'ProductCode': 'ProductId__ProductCode',
+    'ItemId': 'template_product_items__ItemId__ItemId',
+    'ItemName': 'template_product_items__ItemId__ItemName',
+    'ItemCode': 'template_product_items__ItemId__ItemCode',
+    'RiskId': 'template_product_items__template_product_item_risks__RiskId__RiskId',
+    'RiskName': 'template_product_items__template_product_item_risks__RiskId__RiskName',
+    'RiskCode': 'template_product_items__template_product_item_risks__RiskId__RiskCode',
+    'CommPercent': 'template_product_items__template_product_item_risks__CommPercent',
+}
+
+
+def combined_detail_rows(template_id: int):
+    """Flattened product / item / risk rows of a template from one LEFT JOIN query"""
+    rows = Ref_Template_Product.objects.filter(
+        TemplateId=template_id
+    ).order_by(
+        'TemplateProductId',
+        'template_product_items__TemplateProductItemId',
+        'template_product_items__template_product_item_risks__TemplateProductItemRiskId'
+    ).values_list(*COMBINED_DETAIL_COLUMNS.values())
+    
+    result = []
+    for row in rows:
+        detail = dict(zip(COMBINED_DETAIL_COLUMNS, row))
+        if detail['CommPercent'] is not None:
+            detail['CommPercent'] = float(detail['CommPercent'])
+        result.append(CombinedDetailSchema(**detail))
+    return result
+
+
 @router.get("/templates/{template_id}/combined-details", response=List[CombinedDetailSchema])
 def get_combined_details(request, template_id: int):
     """Get combined/flattened view of all template relationships"""
     check_auth(request)
     get_object_or_404(Ref_Policy_Template, PolicyTemplateId=template_id, IsDelete=False)
     
-    # Get all template products with their items and risks
-    template_products = Ref_Template_Product.objects.filter(
-        TemplateId=template_id
-    ).select_related('ProductId').prefetch_related(
-        Prefetch(
-            'template_product_items',
-            queryset=Ref_Template_Product_Item.objects.select_related('ItemId').prefetch_related(
-                Prefetch(
-                    'template_product_item_risks',
-                    queryset=Ref_Template_Product_Item_Risk.objects.select_related('RiskId')
-                )
-            )
-        )
-    )
-    
-    result = []
-    for tp in template_products:
-        # If no items, add product-only row
-        if not tp.template_product_items.exists():
-            result.append(CombinedDetailSchema(
-                TemplateProductId=tp.TemplateProductId,
-                TemplateProductItemId=None,
-                TemplateProductItemRiskId=None,
-                ProductId=tp.ProductId.ProductId,
-                ProductName=tp.ProductId.ProductName,
-                ProductCode=tp.ProductId.ProductCode,
-                ItemId=None,
-                ItemName=None,
-                ItemCode=None,
-                RiskId=None,
-                RiskName=None,
-                RiskCode=None,
-                CommPercent=None
-            ))
-        else:
-            for tpi in tp.template_product_items.all():
-                # If no risks, add product-item row
-                if not tpi.template_product_item_risks.exists():
-                    result.append(CombinedDetailSchema(
-                        TemplateProductId=tp.TemplateProductId,
-                        TemplateProductItemId=tpi.TemplateProductItemId,
-                        TemplateProductItemRiskId=None,
-                        ProductId=tp.ProductId.ProductId,
-                        ProductName=tp.ProductId.ProductName,
-                        ProductCode=tp.ProductId.ProductCode,
-                        ItemId=tpi.ItemId.ItemId,
-                        ItemName=tpi.ItemId.ItemName,
-                        ItemCode=tpi.ItemId.ItemCode,
-                        RiskId=None,
-                        RiskName=None,
-                        RiskCode=None,
-                        CommPercent=None
-                    ))
-                else:
-                    # Add product-item-risk rows
-                    for tpir in tpi.template_product_item_risks.all():
-                        comm_percent = float(tpir.CommPercent) if tpir.CommPercent is not None else None
-                        result.append(CombinedDetailSchema(
-                            TemplateProductId=tp.TemplateProductId,
-                            TemplateProductItemId=tpi.TemplateProductItemId,
-                            TemplateProductItemRiskId=tpir.TemplateProductItemRiskId,
-                            ProductId=tp.ProductId.ProductId,
-                            ProductName=tp.ProductId.ProductName,
-                            ProductCode=tp.ProductId.ProductCode,
-                            ItemId=tpi.ItemId.ItemId,
-                            ItemName=tpi.ItemId.ItemName,
-                            ItemCode=tpi.ItemId.ItemCode,
-                            RiskId=tpir.RiskId.RiskId,
-                            RiskName=tpir.RiskId.RiskName,
-                            RiskCode=tpir.RiskId.RiskCode,
-                            CommPercent=comm_percent
-                        ))
-    
-    return result
+    # One row per product-item-risk; products without items and items without
+    # risks come back with NULL item / risk columns from the LEFT JOINs
+    return combined_detail_rows(template_id)
 
 
 # ==================== TEMPLATE PRODUCT ENDPOINTS ====================
@@ -576,77 +578,3 @@ def delete_template_product_item_risk(request, risk_id: int):
     except Exception as e:
         return 400, ErrorResponse(error=str(e))
 
-
-# ==================== TREE STRUCTURE ENDPOINT ====================
-
-@router.get("/templates/tree", response=List[TemplateTreeSchema])
-def get_template_tree(request):
-    """Get complete template tree structure with all nested relationships"""
-    check_auth(request)
-    
-    # Optimized query with all prefetches
-    templates = Ref_Policy_Template.objects.filter(
-        IsDelete=False
-    ).prefetch_related(
-        Prefetch(
-            'template_products',
-            queryset=Ref_Template_Product.objects.select_related('ProductId').prefetch_related(
-                Prefetch(
-                    'template_product_items',
-                    queryset=Ref_Template_Product_Item.objects.select_related('ItemId').prefetch_related(
-                        Prefetch(
-                            'template_product_item_risks',
-                            queryset=Ref_Template_Product_Item_Risk.objects.select_related('RiskId')
-                        )
-                    )
-                )
-            )
-        )
-    ).order_by('PolicyTemplateName')
-    
-    result = []
-    for template in templates:
-        products_data = []
-        for tp in template.template_products.all():
-            items_data = []
-            for tpi in tp.template_product_items.all():
-                risks_data = []
-                for tpir in tpi.template_product_item_risks.all():
-                    comm_percent = float(tpir.CommPercent) if tpir.CommPercent is not None else None
-                    risks_data.append({
-                        'TemplateProductItemRiskId': tpir.TemplateProductItemRiskId,
-                        'TemplateProductItemId': tpir.TemplateProductItemId.TemplateProductItemId,
-                        'RiskId': tpir.RiskId.RiskId,
-                        'CommPercent': comm_percent,
-                        'RiskName': tpir.RiskId.RiskName,
-                        'RiskCode': tpir.RiskId.RiskCode
-                    })
-                
-                items_data.append({
-                    'TemplateProductItemId': tpi.TemplateProductItemId,
-                    'TemplateProductId': tpi.TemplateProductId.TemplateProductId,
-                    'ItemId': tpi.ItemId.ItemId,
-                    'ItemName': tpi.ItemId.ItemName,
-                    'ItemCode': tpi.ItemId.ItemCode,
-                    'risks': risks_data
-                })
-            
-            products_data.append({
-                'TemplateProductId': tp.TemplateProductId,
-                'TemplateId': tp.TemplateId.PolicyTemplateId,
-                'ProductId': tp.ProductId.ProductId,
-                'ProductName': tp.ProductId.ProductName,
-                'ProductCode': tp.ProductId.ProductCode,
-                'items': items_data
-            })
-        
-        result.append({
-            'PolicyTemplateId': template.PolicyTemplateId,
-            'PolicyTemplateName': template.PolicyTemplateName,
-            'Description': template.Description,
-            'IsActive': template.IsActive,
-            'products': products_data
-        })
-    
-    return result
-
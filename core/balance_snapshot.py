@@ -0,0 +1,24 @@
+"""
+Period-end balance snapshots (balance_snapshot* tables, migration 0039).
+
+The ledger report functions used to rebuild opening balances from every
+document ever posted. refresh_balance_snapshot() stores the cumulative
+debit / credit totals per account, account + client and account + currency
+as of a period EndDate; calculate_trial_balance, calculate_st_balance and
+calculate_recpay_balance then start from the nearest snapshot before their
+begin date and only scan the documents dated after it.
+
+Snapshots are written when a period is locked or closed. The triggers in
+core/management/sql/balance_snapshot.sql drop every snapshot a back-dated
+posting would change, so a snapshot that exists is always current.
+"""
+from django.db import connections
+
+from .thread_local import get_current_db
+
+
+def refresh_balance_snapshot(period_id, db_name=None):
+    """(Re)build the balance snapshot of a period on a tenant database."""
+    db_name = db_name or get_current_db()
+    with connections[db_name].cursor() as cursor:
+        cursor.execute("SELECT refresh_balance_snapshot(%s::SMALLINT)", [period_id])
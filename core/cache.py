@@ -0,0 +1,123 @@
+"""
+Shared, tenant-aware cache layer.
+
+All tenant-scoped caching in core (constants, reference data, report results)
+goes through `tenant_cache`. Keys are automatically prefixed with the tenant
+database from core.thread_local.get_current_db(), so the same logical key never
+collides across tenants.
+
+The backend is the CACHES[TENANT_CACHE_ALIAS] entry in settings. By default it
+is Django's file-based cache, which lives on local disk and is therefore shared
+by every gunicorn worker on the box without running an external service; any
+other Django cache backend can be plugged in through settings.
+
+The version counters (see version() / bump_version()) must be incremented
+atomically across all workers, or a lost bump leaves stale entries
+reachable. The file-based cache's incr is a plain get-then-set, so TenantCache
+serializes it with a lock file in the cache directory. A replacement backend
+must either be file-based or have an atomic incr (memcached, redis); the
+database and local-memory backends qualify for neither.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.files import locks
+
+from .thread_local import get_current_db
+
+# Outside the *.djcache names, so cache culling and clear() leave it alone
+COUNTER_LOCK_NAME = 'counters.lock'
+
+
+class TenantCache:
+    """Thin wrapper over a Django cache that namespaces keys per tenant database."""
+
+    def __init__(self, alias=None):
+        self._alias = alias
+
+    @property
+    def backend(self):
+        # caches[] is per-thread, so resolve it on every access
+        return caches[self._alias or getattr(settings, 'TENANT_CACHE_ALIAS', 'default')]
+
+    @staticmethod
+    def make_key(key, db_name=None):
+        return f'{db_name or get_current_db()}:{key}'
+
+    def get(self, key, default=None, db_name=None):
+        return self.backend.get(self.make_key(key, db_name), default)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, db_name=None):
+        """Store a value; timeout=None keeps it until it is deleted or culled."""
+        self.backend.set(self.make_key(key, db_name), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, db_name=None):
+        return self.backend.add(self.make_key(key, db_name), value, timeout)
+
+    def delete(self, key, db_name=None):
+        return self.backend.delete(self.make_key(key, db_name))
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, db_name=None):
+        """Return the cached value, computing it with `default()` on a miss."""
+        value = self.get(key, db_name=db_name)
+        if value is None:
+            value = default() if callable(default) else default
+            if value is not None:
+                self.set(key, value, timeout, db_name=db_name)
+        return value
+
+    @contextmanager
+    def counter_lock(self):
+        """
+        Hold an exclusive lock shared by every process using the cache
+        directory when the backend is file-based; other backends must provide
+        an atomic incr themselves.
+        """
+        backend = self.backend
+        if not isinstance(backend, FileBasedCache):
+            yield
+            return
+        os.makedirs(backend._dir, exist_ok=True)
+        with open(os.path.join(backend._dir, COUNTER_LOCK_NAME), 'ab') as lock_file:
+            locks.lock(lock_file, locks.LOCK_EX)
+            try:
+                yield
+            finally:
+                locks.unlock(lock_file)
+
+    def incr(self, key, delta=1, db_name=None):
+        """Atomically increment a counter, creating it at `delta` when missing."""
+        cache_key = self.make_key(key, db_name)
+        with self.counter_lock():
+            try:
+                return self.backend.incr(cache_key, delta)
+            except ValueError:
+                # Missing key: create it, tolerating a concurrent creator.
+                if self.backend.add(cache_key, delta, None):
+                    return delta
+                return self.backend.incr(cache_key, delta)
+
+    def version(self, key, db_name=None):
+        """
+        Return a version counter used to namespace cached entries, creating it
+        on first use. It is seeded from the clock rather than 1: if the counter
+        is ever culled, a fresh one can never collide with older entries.
+        """
+        value = self.get(key, db_name=db_name)
+        if value is None:
+            self.add(key, time.time_ns(), None, db_name=db_name)
+            value = self.get(key, db_name=db_name)
+        return value
+
+    def bump_version(self, key, db_name=None):
+        """Advance a version counter, making every entry of the old version unreachable."""
+        self.version(key, db_name=db_name)
+        return self.incr(key, db_name=db_name)
+
+
+tenant_cache = TenantCache()
@@ -0,0 +1,60 @@
+"""
+Tenant-scoped cache for Ref_Constant.
+
+Constants rarely change but are read on every template render (through
+context_processors.global_constants) and by several views. They are loaded
+once per tenant database and kept in the cache until a Ref_Constant row is
+saved or deleted (see core.signals). The entries live in the shared
+tenant cache, so an invalidation is seen by every worker.
+"""
+from .cache import tenant_cache
+from .db_router import ensure_tenant_database
+from .thread_local import get_current_db
+
+CACHE_KEY = 'ref_constant'
+CACHE_TIMEOUT = 3600
+
+
+def get_constants(db_name=None):
+    """
+    Return {ConstantID: (ConstantName, ConstantDescription)} for a tenant database.
+    Defaults to the database of the current request.
+    """
+    from .models import Ref_Constant
+
+    db_name = ensure_tenant_database(db_name or get_current_db())
+    constants = tenant_cache.get(CACHE_KEY, db_name=db_name)
+    if constants is None:
+        constants = {
+            row['ConstantID']: (row['ConstantName'], row['ConstantDescription'])
+            for row in Ref_Constant.objects.using(db_name).values(
+                'ConstantID', 'ConstantName', 'ConstantDescription'
+            )
+        }
+        tenant_cache.set(CACHE_KEY, constants, CACHE_TIMEOUT, db_name=db_name)
+    return constants
+
+
+def get_constant(constant_id, db_name=None):
+    """
+    Cached equivalent of Ref_Constant.objects.get(ConstantID=constant_id).
+    Returns an unsaved Ref_Constant instance; raises Ref_Constant.DoesNotExist.
+    """
+    from .models import Ref_Constant
+
+    try:
+        name, description = get_constants(db_name)[constant_id]
+    except KeyError:
+        raise Ref_Constant.DoesNotExist(f'Ref_Constant with ConstantID={constant_id} does not exist')
+    return Ref_Constant(ConstantID=constant_id, ConstantName=name, ConstantDescription=description)
+
+
+def get_constant_value(constant_id, default=None, db_name=None):
+    """Return the ConstantName of a constant, or default if it is not defined."""
+    entry = get_constants(db_name).get(constant_id)
+    return entry[0] if entry is not None else default
+
+
+def invalidate_constants(db_name=None):
+    """Drop the cached constants of a tenant database."""
+    tenant_cache.delete(CACHE_KEY, db_name=db_name)
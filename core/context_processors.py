@@ -3,12 +3,14 @@ Context processor to make Ref_Constant values available globally in all template
 """
 from decimal import Decimal
 from .utils import get_database_description
+from .constants import get_constants
 
 
 def global_constants(request):
     """
     Load system constants from Ref_Constant table and make them available globally.
-    Constants are loaded once at startup for optimal performance.
+    Constants are cached per tenant database (core.constants) and reloaded only
+    after a Ref_Constant row is saved or deleted.
     
     Returns a dictionary with the following constants:
     - COMPANY_NAME: Company name (ConstantID=1)
@@ -47,8 +49,6 @@ def global_constants(request):
     }
     
     try:
-        from .models import Ref_Constant
-        
         # Fetch all constants we need (including hardcoded 7,8,11,12,13,14)
         constant_mapping = {
             1: 'COMPANY_NAME',
@@ -67,16 +67,14 @@ def global_constants(request):
             14: 'CONSTANT_14',  # Hardcoded placeholder
         }
         
-        # Fetch constants from database
-        ref_constants = Ref_Constant.objects.filter(
-            ConstantID__in=constant_mapping.keys()
-        ).values('ConstantID', 'ConstantName')
+        # Fetch constants from the tenant-scoped cache
+        ref_constants = get_constants()
         
         # Map database values to constant names
-        for ref_const in ref_constants:
-            constant_id = ref_const['ConstantID']
-            constant_value = ref_const['ConstantName']
-            constant_key = constant_mapping[constant_id]
+        for constant_id, constant_key in constant_mapping.items():
+            if constant_id not in ref_constants:
+                continue
+            constant_value = ref_constants[constant_id][0]
             
             # Special handling for VAT_RATE
             if constant_id == 2:
@@ -90,12 +88,6 @@ def global_constants(request):
             else:
                 constants[constant_key] = constant_value
         
-        # Debug logging for VAT accounts
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.info(f"VAT_ACCOUNT_RECEIVABLE: {constants.get('VAT_ACCOUNT_RECEIVABLE', 'NOT SET')}")
-        logger.info(f"VAT_ACCOUNT_PAYABLE: {constants.get('VAT_ACCOUNT_PAYABLE', 'NOT SET')}")
-        
     except Exception as e:
         # Log error but don't crash - use default fallback values
         import logging
@@ -0,0 +1,31 @@
+"""
+PostgreSQL backend that borrows connections from the per-tenant pool.
+
+Identical to django.db.backends.postgresql except that opening a connection
+checks one out of core.db_pool and closing it hands it back, so the usual
+Django lifecycle (CONN_MAX_AGE = 0, connections[alias].close()) becomes a
+cheap return-to-pool instead of a full disconnect.
+"""
+from django.db.backends.postgresql import base as postgresql_base
+
+from ..db_pool import pools
+from .creation import DatabaseCreation
+
+
+class DatabaseWrapper(postgresql_base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def get_new_connection(self, conn_params):
+        pool = pools.get(self.settings_dict['NAME'])
+        return pool.acquire(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = pools.get(self.settings_dict['NAME'])
+        # A connection closed inside an atomic block stays referenced by this
+        # wrapper until rollback, so it must never be handed to another thread.
+        # Connections that raised database errors are not trusted for reuse.
+        discard = self.in_atomic_block or self.errors_occurred
+        with self.wrap_database_errors:
+            pool.release(self.connection, discard=discard)
@@ -0,0 +1,11 @@
+from django.db.backends.postgresql import creation as postgresql_creation
+
+from ..db_pool import pools
+
+
+class DatabaseCreation(postgresql_creation.DatabaseCreation):
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Closed wrappers leave their connections idle in the pool, which blocks DROP DATABASE
+        pools.get(test_database_name).close_idle()
+        super()._destroy_test_db(test_database_name, verbosity)
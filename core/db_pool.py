@@ -0,0 +1,274 @@
+"""
+Per-tenant persistent connection pool.
+
+Each tenant database (keyed by its NAME) gets its own bounded pool of
+psycopg2 connections. Django keeps CONN_MAX_AGE = 0 so that every request
+still releases its connection, but the pooled backend (core.db_backend) hands
+the connection back here instead of closing it, so switching between tenants
+no longer pays a fresh connect + auth handshake.
+
+Pool behaviour is driven by the DB_POOL_* settings:
+- DB_POOL_SIZE: idle connections kept per tenant
+- DB_MAX_OVERFLOW: extra connections allowed on top of DB_POOL_SIZE under load
+- DB_POOL_TIMEOUT: seconds to wait for a free connection before failing
+- DB_POOL_RECYCLE: maximum connection lifetime in seconds
+- DB_POOL_IDLE_TIMEOUT: idle connections older than this are evicted
+- DB_POOL_PING_INTERVAL: idle time after which a connection is pinged before reuse
+- DB_POOL_MAX_TENANTS: maximum number of tenant pools kept per process
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import psycopg2
+from psycopg2 import extensions
+from django.conf import settings
+
+logger = logging.getLogger('core')
+
+
+class _PooledConnection:
+    """A raw connection plus the bookkeeping the pool needs."""
+
+    __slots__ = ('raw', 'created_at', 'last_used')
+
+    def __init__(self, raw):
+        now = time.monotonic()
+        self.raw = raw
+        self.created_at = now
+        self.last_used = now
+
+
+class TenantConnectionPool:
+    """Bounded, thread-safe pool of connections to a single tenant database."""
+
+    def __init__(self, db_name, pool_size, max_overflow, timeout, recycle,
+                 idle_timeout, ping_interval):
+        self.db_name = db_name
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.idle_timeout = idle_timeout
+        self.ping_interval = ping_interval
+
+        self._idle = []  # LIFO stack of _PooledConnection
+        self._in_use = {}  # id(raw connection) -> _PooledConnection
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self.last_used = time.monotonic()
+
+    @property
+    def max_connections(self):
+        return self.pool_size + self.max_overflow
+
+    @property
+    def in_use_count(self):
+        return len(self._in_use)
+
+    def acquire(self, connect):
+        """
+        Return a healthy raw connection, reusing an idle one when possible.
+
+        `connect` is a zero-argument callable that opens a brand new connection;
+        it is only called when no idle connection is available and the pool is
+        below its max_connections limit.
+        """
+        deadline = time.monotonic() + self.timeout
+        with self._available:
+            while True:
+                self.last_used = time.monotonic()
+                self._evict_idle_locked()
+
+                while self._idle:
+                    pooled = self._idle.pop()
+                    if self._is_healthy(pooled):
+                        pooled.last_used = time.monotonic()
+                        self._in_use[id(pooled.raw)] = pooled
+                        return pooled.raw
+                    self._discard(pooled)
+
+                if len(self._in_use) < self.max_connections:
+                    # Reserve the slot before releasing the lock to connect.
+                    placeholder = object()
+                    self._in_use[id(placeholder)] = placeholder
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise psycopg2.OperationalError(
+                        f"Connection pool for database '{self.db_name}' exhausted: "
+                        f"{self.max_connections} connections in use, "
+                        f"waited {self.timeout}s"
+                    )
+                self._available.wait(remaining)
+
+        try:
+            raw = connect()
+        except Exception:
+            with self._available:
+                del self._in_use[id(placeholder)]
+                self._available.notify()
+            raise
+
+        pooled = _PooledConnection(raw)
+        with self._available:
+            del self._in_use[id(placeholder)]
+            self._in_use[id(raw)] = pooled
+        return raw
+
+    def release(self, raw, discard=False):
+        """Return a connection obtained from acquire() to the pool."""
+        with self._available:
+            pooled = self._in_use.pop(id(raw), None)
+            self.last_used = time.monotonic()
+            if pooled is None:
+                # Not ours (e.g. pool was reset after a fork); just close it.
+                self._close_raw(raw)
+                return
+
+            if not discard and not self._reset(pooled):
+                discard = True
+            if (
+                discard
+                or len(self._idle) >= self.pool_size
+                or time.monotonic() - pooled.created_at > self.recycle
+            ):
+                self._discard(pooled)
+            else:
+                pooled.last_used = time.monotonic()
+                self._idle.append(pooled)
+            self._available.notify()
+
+    def close_idle(self):
+        """Close every idle connection. Checked-out connections are left alone."""
+        with self._available:
+            while self._idle:
+                self._discard(self._idle.pop())
+
+    def _evict_idle_locked(self):
+        if not self._idle:
+            return
+        now = time.monotonic()
+        keep = []
+        for pooled in self._idle:
+            if (
+                now - pooled.last_used > self.idle_timeout
+                or now - pooled.created_at > self.recycle
+            ):
+                self._discard(pooled)
+            else:
+                keep.append(pooled)
+        self._idle = keep
+
+    def _is_healthy(self, pooled):
+        raw = pooled.raw
+        if raw.closed:
+            return False
+        status = raw.get_transaction_status()
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if time.monotonic() - pooled.last_used < self.ping_interval:
+            return True
+        try:
+            with raw.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not raw.autocommit:
+                raw.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _reset(self, pooled):
+        """Bring a returned connection back to a clean, idle state."""
+        raw = pooled.raw
+        if raw.closed:
+            return False
+        try:
+            status = raw.get_transaction_status()
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                return False
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                raw.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, pooled):
+        self._close_raw(pooled.raw)
+
+    @staticmethod
+    def _close_raw(raw):
+        try:
+            raw.close()
+        except psycopg2.Error:
+            pass
+
+
+class PoolRegistry:
+    """Per-process registry of tenant pools with an LRU cap on tenant count."""
+
+    def __init__(self):
+        self._pools = OrderedDict()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def get(self, db_name):
+        with self._lock:
+            self._check_fork()
+            pool = self._pools.get(db_name)
+            if pool is None:
+                pool = TenantConnectionPool(
+                    db_name,
+                    pool_size=getattr(settings, 'DB_POOL_SIZE', 5),
+                    max_overflow=getattr(settings, 'DB_MAX_OVERFLOW', 3),
+                    timeout=getattr(settings, 'DB_POOL_TIMEOUT', 30),
+                    recycle=getattr(settings, 'DB_POOL_RECYCLE', 3600),
+                    idle_timeout=getattr(settings, 'DB_POOL_IDLE_TIMEOUT', 300),
+                    ping_interval=getattr(settings, 'DB_POOL_PING_INTERVAL', 30),
+                )
+                self._pools[db_name] = pool
+                self._enforce_tenant_cap()
+            else:
+                self._pools.move_to_end(db_name)
+            return pool
+
+    def close_all(self):
+        """Close idle connections of every pool and forget the pools."""
+        with self._lock:
+            for pool in self._pools.values():
+                pool.close_idle()
+            self._pools.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {'idle': len(pool._idle), 'in_use': pool.in_use_count}
+                for name, pool in self._pools.items()
+            }
+
+    def _enforce_tenant_cap(self):
+        max_tenants = getattr(settings, 'DB_POOL_MAX_TENANTS', 50)
+        if len(self._pools) <= max_tenants:
+            return
+        # Evict least recently used tenants that have nothing checked out.
+        for name in list(self._pools.keys()):
+            if len(self._pools) <= max_tenants:
+                break
+            pool = self._pools[name]
+            if pool.in_use_count == 0:
+                pool.close_idle()
+                del self._pools[name]
+                logger.debug(f"Evicted connection pool for tenant database {name}")
+
+    def _check_fork(self):
+        # Connections must never be shared across processes (gunicorn preload).
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pools = OrderedDict()
+            self._pid = pid
+
+
+pools = PoolRegistry()
@@ -1,4 +1,5 @@
 from django.conf import settings
+from .tenants import tenant_registry
 from .thread_local import get_current_db
 
 
@@ -25,13 +26,21 @@ class MultiTenantRouter:
     def allow_migrate(self, db, app_label, model_name=None, **hints):
         """
         Route migrations to insurance database for core app, default for Django built-in apps.
-        This makes insurance the default migration database for the core application.
+        This makes insurance the default migration database for the core application;
+        the other tenant databases of databases.txt are migrated explicitly
+        (python manage.py migrate_tenants).
         """
-        # For core app, only allow migrations on insurance database
+        # For core app, only allow migrations on insurance and registered tenant databases
         if app_label == 'core':
-            return db == 'insurance'
+            return db == 'insurance' or tenant_registry.get(db) is not None
         # For Django built-in apps (admin, auth, contenttypes, sessions), use default
-        return db == 'default'
+        # The insurance test database has no default next to it; core's FKs to auth_user need the tables there
+        return db == 'default' or (db == 'insurance' and self._is_test_database(db))
+    
+    def _is_test_database(self, db):
+        """True while the test runner has switched db to its TEST NAME."""
+        config = settings.DATABASES.get(db, {})
+        return config.get('NAME') == config.get('TEST', {}).get('NAME')
     
     def _get_tenant_db(self):
         """Get the current tenant database name from thread-local storage."""
@@ -45,7 +54,11 @@ class MultiTenantRouter:
         return tenant_db
     
     def _create_tenant_db_config(self, db_name):
-        """Create a database configuration for the tenant by cloning the default config."""
+        """
+        Create a database configuration for the tenant by cloning the default config.
+        The clone keeps the pooled ENGINE, so each tenant gets its own connection
+        pool in core.db_pool keyed by the tenant database name.
+        """
         from django.conf import settings
         
         # Clone the default database configuration
@@ -54,3 +67,13 @@ class MultiTenantRouter:
         
         # Add the tenant database to settings
         settings.DATABASES[db_name] = default_config
+
+
+def ensure_tenant_database(db_name):
+    """
+    Make sure a connection alias exists for db_name, for code that addresses a
+    tenant database explicitly (e.g. .using(db_name)) instead of via the router.
+    """
+    if db_name not in settings.DATABASES:
+        MultiTenantRouter()._create_tenant_db_config(db_name)
+    return db_name
@@ -0,0 +1,149 @@
+"""
+Document number sequence service.
+
+Replaces the legacy "order all Ref_Document_Counter rows by DocumentNo and
+regex-parse the last one" lookup with one Ref_Document_Sequence row per
+DocumentTypeId in each tenant database. Numbers are allocated with a single
+atomic `UPDATE ... RETURNING`, so concurrent saves never receive the same
+number and the cost does not grow with the counter table.
+
+- peek(): preview the next number without allocating it (form defaults)
+- claim(): confirm a previewed number on save, re-allocating if it was taken
+- reserve(n): allocate n consecutive numbers in one statement (bulk imports)
+"""
+import re
+
+from django.db import connections
+
+from .db_router import ensure_tenant_database
+from .thread_local import get_current_db
+
+NUMBER_PATTERN = re.compile(r'(\d+)$')
+DEFAULT_PREFIX = 'DOC'
+
+
+def format_document_no(prefix, number):
+    return f"{prefix}{number:04d}"
+
+
+def parse_document_no(document_no):
+    """Split a DocumentNo like "CASH0012" into ("CASH", 12); None if it has no numeric suffix."""
+    match = NUMBER_PATTERN.search(document_no or '')
+    if not match:
+        return None
+    return document_no[:match.start()], int(match.group(1))
+
+
+class DocumentSequenceAllocator:
+    """Allocates document numbers from ref_document_sequence of the current tenant."""
+
+    def peek(self, document_type_id, db_name=None):
+        """Return the next document number without allocating it."""
+        from .models import Ref_Document_Sequence
+
+        db_name = ensure_tenant_database(db_name or get_current_db())
+        document_type_id = int(document_type_id)
+        sequence = Ref_Document_Sequence.objects.using(db_name).filter(
+            DocumentTypeId=document_type_id
+        ).values('Prefix', 'LastNumber').first()
+        if sequence is None:
+            prefix, last_number = self._seed(document_type_id, db_name)
+        else:
+            prefix, last_number = sequence['Prefix'], sequence['LastNumber']
+        return format_document_no(prefix, last_number + 1)
+
+    def reserve(self, document_type_id, count, db_name=None):
+        """
+        Atomically allocate `count` consecutive document numbers.
+        Inside a transaction the numbers are released again if it rolls back.
+        """
+        if count <= 0:
+            return []
+        db_name = ensure_tenant_database(db_name or get_current_db())
+        prefix, last_number = self._advance(int(document_type_id), count, db_name)
+        first_number = last_number - count + 1
+        return [format_document_no(prefix, number) for number in range(first_number, last_number + 1)]
+
+    def claim(self, document_type_id, document_no, db_name=None):
+        """
+        Confirm a number previously shown by peek() when the document is saved.
+        Returns document_no if it is still free, otherwise a freshly allocated
+        number. Numbers that do not follow the sequence prefix are returned as-is.
+        """
+        parsed = parse_document_no(document_no)
+        if parsed is None:
+            return document_no
+        db_name = ensure_tenant_database(db_name or get_current_db())
+        document_type_id = int(document_type_id)
+        prefix, number = parsed
+
+        with connections[db_name].cursor() as cursor:
+            for _ in range(2):
+                cursor.execute(
+                    'UPDATE ref_document_sequence '
+                    'SET "LastNumber" = %s, "ModifiedDate" = NOW() '
+                    'WHERE "DocumentTypeId" = %s AND "Prefix" = %s AND "LastNumber" < %s '
+                    'RETURNING "LastNumber"',
+                    [number, document_type_id, prefix, number],
+                )
+                if cursor.fetchone() is not None:
+                    # Our number advanced the sequence, nobody else holds it
+                    return document_no
+                cursor.execute(
+                    'SELECT "Prefix" FROM ref_document_sequence WHERE "DocumentTypeId" = %s',
+                    [document_type_id],
+                )
+                row = cursor.fetchone()
+                if row is not None:
+                    break
+                self._seed(document_type_id, db_name)
+        if row is None or row[0] != prefix:
+            return document_no
+        # Already allocated to another document: hand out the next free number
+        return self.reserve(document_type_id, 1, db_name)[0]
+
+    def _advance(self, document_type_id, count, db_name):
+        """Increment LastNumber by count and return (prefix, new LastNumber)."""
+        with connections[db_name].cursor() as cursor:
+            for _ in range(2):
+                cursor.execute(
+                    'UPDATE ref_document_sequence '
+                    'SET "LastNumber" = "LastNumber" + %s, "ModifiedDate" = NOW() '
+                    'WHERE "DocumentTypeId" = %s '
+                    'RETURNING "Prefix", "LastNumber"',
+                    [count, document_type_id],
+                )
+                row = cursor.fetchone()
+                if row is not None:
+                    return row[0], row[1]
+                self._seed(document_type_id, db_name)
+        raise RuntimeError(f'Document sequence for DocumentTypeId {document_type_id} could not be initialized')
+
+    def _seed(self, document_type_id, db_name):
+        """
+        Create the sequence row for a document type from the legacy counters
+        (one-time scan). Raises Ref_Document_Type.DoesNotExist for unknown types.
+        """
+        from .models import Ref_Document_Counter, Ref_Document_Type
+
+        doc_type = Ref_Document_Type.objects.using(db_name).get(DocumentTypeId=document_type_id)
+        prefix = doc_type.DocumentTypeCode[:4] if doc_type.DocumentTypeCode else DEFAULT_PREFIX
+        last_number = 0
+        for document_no in Ref_Document_Counter.objects.using(db_name).filter(
+            DocumentTypeId=document_type_id
+        ).values_list('DocumentNo', flat=True).iterator():
+            parsed = parse_document_no(document_no)
+            if parsed and parsed[1] > last_number:
+                prefix, last_number = parsed
+
+        with connections[db_name].cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO ref_document_sequence ("DocumentTypeId", "Prefix", "LastNumber", "ModifiedDate") '
+                'VALUES (%s, %s, %s, NOW()) '
+                'ON CONFLICT ("DocumentTypeId") DO NOTHING',
+                [document_type_id, prefix, last_number],
+            )
+        return prefix, last_number
+
+
+document_sequences = DocumentSequenceAllocator()
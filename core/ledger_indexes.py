@@ -0,0 +1,71 @@
+"""
+Ledger query shapes and the indexes they must use (migration 0040).
+
+Shared by the check_ledger_indexes command, which EXPLAINs them on a live
+tenant database, and core.tests.LedgerIndexPlanTests, which EXPLAINs them
+on seeded test data.
+"""
+import json
+from datetime import timedelta
+
+from .models import (
+    Ast_Document, Ast_Document_Detail, Cash_Document, Cash_DocumentDetail, Inv_Document, Inv_Document_Detail,
+)
+
+# (header model, detail model, partial date index, account index) per ledger
+LEDGERS = [
+    (Cash_Document, Cash_DocumentDetail, 'cash_doc_live_date_idx', 'cash_detail_account_doc_idx'),
+    (Inv_Document, Inv_Document_Detail, 'inv_doc_live_date_idx', 'inv_detail_account_doc_idx'),
+    (Ast_Document, Ast_Document_Detail, 'ast_doc_live_date_idx', 'ast_detail_account_doc_idx'),
+]
+
+# Account statement / subsidiary ledger shape: one account over a long date range
+ACCOUNT_LINES_SQL = '''
+    SELECT d."DebitAmount", d."CreditAmount"
+    FROM {detail} d
+    INNER JOIN {header} h ON h."DocumentId" = d."DocumentId"
+    WHERE d."AccountId" = %s
+        AND h."DocumentDate" BETWEEN %s AND %s
+        AND h."IsDelete" = false
+'''
+
+# calculate_* period / snapshot gap shape: every account over a short date range
+PERIOD_TOTALS_SQL = '''
+    SELECT d."AccountId", SUM(d."DebitAmount"), SUM(d."CreditAmount")
+    FROM {detail} d
+    INNER JOIN {header} h ON h."DocumentId" = d."DocumentId"
+    WHERE h."DocumentDate" >= %s
+        AND h."DocumentDate" <= %s
+        AND h."IsDelete" = false
+    GROUP BY d."AccountId"
+'''
+
+
+def plan_index_names(plan):
+    """Return the index names used anywhere in an EXPLAIN (FORMAT JSON) plan node."""
+    names = set()
+    if plan.get('Index Name'):
+        names.add(plan['Index Name'])
+    for child in plan.get('Plans', []):
+        names |= plan_index_names(child)
+    return names
+
+
+def explain_index_names(cursor, sql, params):
+    """EXPLAIN a query and return the index names its plan uses."""
+    cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan, plan_index_names(plan[0]['Plan'])
+
+
+def ledger_checks(tables, account_id, date_from, date_to):
+    """(label, sql, params, expected index) of the ledger query shapes for one ledger."""
+    header_model, detail_model, date_index, account_index = tables
+    names = {'header': header_model._meta.db_table, 'detail': detail_model._meta.db_table}
+    return [
+        ('account lines', ACCOUNT_LINES_SQL.format(**names), [account_id, date_from, date_to], account_index),
+        ('period totals', PERIOD_TOTALS_SQL.format(**names),
+         [max(date_from, date_to - timedelta(days=30)), date_to], date_index),
+    ]
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+from core.api.insurance.template import combined_detail_rows
+from core.db_router import ensure_tenant_database
+from core.models import Ref_Policy_Template
+from core.tenants import tenant_registry
+from core.thread_local import set_current_db
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the queries issued by the template combined-details endpoint for every template '
+        'and fail if the query count depends on the template size'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', required=True, help='Tenant database name (see databases.txt)')
+        parser.add_argument('--template-id', type=int, action='append', help='Template to measure (repeatable, default all)')
+
+    def handle(self, *args, **options):
+        db_name = options['database']
+        if tenant_registry.get(db_name) is None:
+            raise CommandError(f'Unknown tenant database: {db_name}')
+        ensure_tenant_database(db_name)
+        set_current_db(db_name)
+
+        templates = Ref_Policy_Template.objects.using(db_name).filter(IsDelete=False)
+        if options['template_id']:
+            templates = templates.filter(PolicyTemplateId__in=options['template_id'])
+        templates = list(templates.order_by('PolicyTemplateId').values_list('PolicyTemplateId', 'PolicyTemplateName'))
+        if not templates:
+            raise CommandError('No templates to measure')
+
+        query_counts = set()
+        for template_id, template_name in templates:
+            started = time.perf_counter()
+            with CaptureQueriesContext(connections[db_name]) as queries:
+                rows = combined_detail_rows(template_id)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            query_counts.add(len(queries))
+            self.stdout.write(
+                f'{template_id:>6} {template_name[:40]:<40} rows={len(rows):<6} '
+                f'queries={len(queries):<3} {elapsed_ms:.1f} ms'
+            )
+
+        if len(query_counts) > 1:
+            raise CommandError(f'Query count varies with template size: {sorted(query_counts)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(templates)} template(s) measured, constant {query_counts.pop()} query(ies) each'
+        ))
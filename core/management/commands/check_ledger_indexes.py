@@ -0,0 +1,61 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Max, Min
+
+from core.db_router import ensure_tenant_database
+from core.ledger_indexes import LEDGERS, explain_index_names, ledger_checks
+from core.tenants import tenant_registry
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN the ledger report query shapes on a tenant database and fail if they stop using the '
+        'ledger indexes. Read-only; the seeded regression test is core.tests.LedgerIndexPlanTests.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', required=True, help='Tenant database name (see databases.txt)')
+
+    def handle(self, *args, **options):
+        db_name = options['database']
+        if tenant_registry.get(db_name) is None:
+            raise CommandError(f'Unknown tenant database: {db_name}')
+        ensure_tenant_database(db_name)
+
+        failures = []
+        try:
+            with connections[db_name].cursor() as cursor:
+                for ledger in LEDGERS:
+                    header_model, detail_model = ledger[0], ledger[1]
+                    dates = header_model.objects.using(db_name).filter(IsDelete=False).aggregate(
+                        date_from=Min('DocumentDate'), date_to=Max('DocumentDate')
+                    )
+                    account_id = (
+                        detail_model.objects.using(db_name).order_by('-pk')
+                        .values_list('AccountId', flat=True).first()
+                    )
+                    if dates['date_from'] is None or account_id is None:
+                        self.stdout.write(f'  {detail_model._meta.db_table}: no documents, skipped')
+                        continue
+                    for label, sql, params, expected_index in ledger_checks(
+                        ledger, account_id, dates['date_from'], dates['date_to']
+                    ):
+                        plan, used = explain_index_names(cursor, sql, params)
+                        name = f'{detail_model._meta.db_table} {label}'
+                        if expected_index in used:
+                            self.stdout.write(f'  OK    {name}: {expected_index}')
+                        else:
+                            failures.append(name)
+                            self.stdout.write(self.style.ERROR(
+                                f'  FAIL  {name}: expected {expected_index}, used {sorted(used) or "no index"}'
+                            ))
+                        if options['verbosity'] > 1:
+                            self.stdout.write(json.dumps(plan, indent=2))
+        finally:
+            connections[db_name].close()
+
+        if failures:
+            raise CommandError(f'{len(failures)} query shape(s) no longer use their index: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS('The ledger query shapes use their indexes'))
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.sql_deploy import SQL_DIR, VERSION_TABLE, deploy_tenants, load_sql_files
+from core.tenants import tenant_registry
+
+
+class Command(BaseCommand):
+    help = (
+        'Install the changed core/management/sql/*.sql functions on every tenant database '
+        f'(versions recorded per tenant in {VERSION_TABLE})'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', action='append', help='Tenant database (repeatable, default all in databases.txt)')
+        parser.add_argument('--file', action='append', help='SQL file name to deploy (repeatable, default all)')
+        parser.add_argument('--workers', type=int, default=None, help='Tenants updated concurrently (default SQL_DEPLOY_WORKERS)')
+        parser.add_argument('--force', action='store_true', help='Reinstall files even if their hash is unchanged')
+        parser.add_argument('--dry-run', action='store_true', help='Only list the files each tenant would install')
+
+    def handle(self, *args, **options):
+        db_names = options['database'] or tenant_registry.db_names()
+        unknown = [db_name for db_name in db_names if tenant_registry.get(db_name) is None]
+        if unknown:
+            raise CommandError(f'Unknown tenant database(s): {", ".join(unknown)}')
+        if not db_names:
+            raise CommandError('No tenant databases in databases.txt')
+
+        try:
+            files = load_sql_files(options['file'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        if not files:
+            raise CommandError(f'No SQL files in {SQL_DIR}')
+
+        self.stdout.write(
+            f'{len(files)} SQL file(s), {len(db_names)} tenant database(s)'
+            + (' (dry run)' if options['dry_run'] else '')
+        )
+        for sql_file in files:
+            self.stdout.write(f'  {sql_file["sha256"][:12]}  {sql_file["name"]}')
+
+        verb = 'would install' if options['dry_run'] else 'installed'
+
+        def progress(result):
+            line = f'{result["db_name"]}: {verb} {len(result["installed"])}, unchanged {result["unchanged"]} ({result["elapsed_seconds"]}s)'
+            if result['error']:
+                failed = f' in {result["failed"]}' if result['failed'] else ''
+                self.stdout.write(self.style.ERROR(f'{line} FAILED{failed}: {result["error"]}'))
+            else:
+                self.stdout.write(line)
+            for name in result['installed']:
+                self.stdout.write(f'    {name}')
+
+        results = deploy_tenants(
+            db_names, files, workers=options['workers'],
+            force=options['force'], dry_run=options['dry_run'], progress=progress
+        )
+
+        failed = [result['db_name'] for result in results if result['error']]
+        installed = sum(len(result['installed']) for result in results)
+        if failed:
+            raise CommandError(f'{len(failed)} tenant(s) failed: {", ".join(failed)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(results)} tenant(s) up to date, {installed} file installation(s)'
+            + (' pending' if options['dry_run'] else '')
+        ))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.policy_batch import (
+    batch_zip_filename, get_batch_workers, iter_batch_zip, parse_batch_filters, select_policies
+)
+from core.tenants import tenant_registry
+
+
+class Command(BaseCommand):
+    help = 'Generate Word documents for a batch of policies into a ZIP archive (with manifest.csv)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', required=True, help='Tenant database name (see databases.txt)')
+        parser.add_argument('--template-id', help='Ref_Policy_Template id')
+        parser.add_argument('--branch-id', help='Ref_Branch id')
+        parser.add_argument('--channel-id', help='Ref_Channel id')
+        parser.add_argument('--date-from', help='BeginDate from (YYYY-MM-DD)')
+        parser.add_argument('--date-to', help='BeginDate to (YYYY-MM-DD)')
+        parser.add_argument('--policy-ids', help='Comma separated PolicyIds')
+        parser.add_argument('--workers', type=int, default=None, help='Rendering processes (default POLICY_BATCH_WORKERS)')
+        parser.add_argument('--output', help='ZIP file to write (default policy_documents_<timestamp>.zip)')
+
+    def handle(self, *args, **options):
+        db_name = options['database']
+        if tenant_registry.get(db_name) is None:
+            raise CommandError(f'Unknown tenant database: {db_name}')
+
+        try:
+            filters = parse_batch_filters(options)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        policies = select_policies(db_name, **filters)
+        if not policies:
+            self.stdout.write(self.style.WARNING('No policies match the filter'))
+            return
+
+        workers = options['workers'] or get_batch_workers()
+        output = options['output'] or batch_zip_filename()
+        self.stdout.write(f'Generating {len(policies)} document(s) with {workers} worker(s) into {output}')
+
+        with open(output, 'wb') as archive:
+            for chunk in iter_batch_zip(policies, db_name, workers):
+                archive.write(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f'Done: {output} (see manifest.csv inside for failures)'))
@@ -0,0 +1,68 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core.db_router import ensure_tenant_database
+from core.policy_import import detect_import_format, import_policies, parse_import_file
+from core.tenants import tenant_registry
+
+
+class Command(BaseCommand):
+    help = 'Bulk import policies (with products, items, risks, questions, schedule and files) from JSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='Policies file (.json or .csv)')
+        parser.add_argument('--database', required=True, help='Tenant database name (see databases.txt)')
+        parser.add_argument('--format', choices=['json', 'csv'], help='File format (default: from the file extension)')
+        parser.add_argument('--user', help='Username recorded as CreatedBy / ModifiedBy')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only, insert nothing')
+        parser.add_argument('--errors', help='Write per-row errors to this JSON file')
+
+    def handle(self, *args, **options):
+        db_name = options['database']
+        if tenant_registry.get(db_name) is None:
+            raise CommandError(f'Unknown tenant database: {db_name}')
+        ensure_tenant_database(db_name)
+
+        import_format = options['format'] or detect_import_format(options['file'])
+        if import_format is None:
+            raise CommandError('Cannot detect the file format, use --format json|csv')
+
+        user_id = None
+        if options['user']:
+            user_id = User.objects.using(db_name).filter(username=options['user']).values_list('id', flat=True).first()
+            if user_id is None:
+                raise CommandError(f'Unknown user: {options["user"]}')
+
+        try:
+            with open(options['file'], 'rb') as source:
+                records = parse_import_file(source.read(), import_format)
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f'Importing {len(records)} policies into {db_name}' + (' (dry run)' if options['dry_run'] else ''))
+
+        def progress(processed, total):
+            self.stdout.write(f'  {processed}/{total} valid policies processed')
+
+        summary = import_policies(records, db_name, user_id=user_id, dry_run=options['dry_run'], progress=progress)
+
+        for error in summary['errors'][:20]:
+            self.stdout.write(self.style.ERROR(
+                f'Row {error["row"]} ({error["policy_no"] or "-"}): ' + '; '.join(error['errors'])
+            ))
+        if len(summary['errors']) > 20:
+            self.stdout.write(self.style.ERROR(f'... and {len(summary["errors"]) - 20} more row(s) with errors'))
+        if options['errors'] and summary['errors']:
+            with open(options['errors'], 'w', encoding='utf-8') as target:
+                json.dump(summary['errors'], target, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Row errors written to {options["errors"]}')
+
+        for table, count in summary['rows'].items():
+            if count:
+                self.stdout.write(f'  {table}: {count} row(s)')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {summary["imported"]}/{summary["total"]} policies, {summary["failed"]} failed, '
+            f'{summary["elapsed_seconds"]}s ({summary["policies_per_second"] or 0} policies/s)'
+        ))
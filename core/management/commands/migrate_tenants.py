@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.tenant_migrations import migrate_tenants
+from core.tenants import tenant_registry
+
+
+class Command(BaseCommand):
+    help = 'Apply the pending core migrations to every tenant database in databases.txt, several tenants at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', action='append', help='Tenant database (repeatable, default all in databases.txt)')
+        parser.add_argument('--workers', type=int, default=None, help='Tenants migrated concurrently (default MIGRATE_TENANTS_WORKERS)')
+        parser.add_argument('--plan', '--dry-run', action='store_true', dest='plan',
+                            help='Only list the pending migrations of each tenant')
+
+    def handle(self, *args, **options):
+        db_names = options['database'] or tenant_registry.db_names()
+        unknown = [db_name for db_name in db_names if tenant_registry.get(db_name) is None]
+        if unknown:
+            raise CommandError(f'Unknown tenant database(s): {", ".join(unknown)}')
+        if not db_names:
+            raise CommandError('No tenant databases in databases.txt')
+
+        plan = options['plan']
+        self.stdout.write(f'{"Planning" if plan else "Migrating"} {len(db_names)} tenant database(s)')
+        verb = 'pending' if plan else 'applied'
+        started = time.perf_counter()
+
+        def progress(result):
+            if result['error']:
+                self.stdout.write(self.style.ERROR(f'{result["db_name"]}: FAILED ({result["elapsed_seconds"]}s): {result["error"]}'))
+            elif result['migrations']:
+                self.stdout.write(f'{result["db_name"]}: {verb} {len(result["migrations"])} ({result["elapsed_seconds"]}s)')
+            else:
+                self.stdout.write(f'{result["db_name"]}: up to date ({result["elapsed_seconds"]}s)')
+            for name in result['migrations']:
+                self.stdout.write(f'    {name}')
+            if options['verbosity'] > 1 and result['output']:
+                self.stdout.write(result['output'])
+
+        results = migrate_tenants(db_names, workers=options['workers'], plan=plan, progress=progress)
+
+        elapsed = time.perf_counter() - started
+        failed = [result['db_name'] for result in results if result['error']]
+        changed = sum(1 for result in results if result['migrations'] and not result['error'])
+        if failed:
+            raise CommandError(f'{len(failed)} of {len(results)} tenant(s) failed in {elapsed:.1f}s: {", ".join(failed)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(results)} tenant(s) in {elapsed:.1f}s, {changed} with {verb} migrations'
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.word_generator import prune_generated_documents
+
+
+class Command(BaseCommand):
+    help = 'Apply the retention policy to generated policy Word documents (MEDIA_ROOT/policy_documents)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-days', type=int, default=None,
+                            help='Remove documents unused for this many days (default POLICY_DOCUMENT_MAX_AGE_DAYS)')
+        parser.add_argument('--max-bytes', type=int, default=None,
+                            help='Evict least recently used documents above this size (default POLICY_DOCUMENT_MAX_BYTES)')
+
+    def handle(self, *args, **options):
+        removed_files, removed_bytes = prune_generated_documents(options['max_age_days'], options['max_bytes'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {removed_files} document(s), {removed_bytes / (1024 * 1024):.1f} MB'
+        ))
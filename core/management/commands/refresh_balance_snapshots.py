@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from core.balance_snapshot import refresh_balance_snapshot
+from core.db_router import ensure_tenant_database
+from core.models import Ref_Period
+from core.tenants import tenant_registry
+
+
+class Command(BaseCommand):
+    help = (
+        'Build the period-end balance snapshots used by the ledger reports '
+        '(default: every locked period, oldest first)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', required=True, help='Tenant database name (see databases.txt)')
+        parser.add_argument('--period', type=int, action='append', help='Period to snapshot (repeatable)')
+
+    def handle(self, *args, **options):
+        db_name = options['database']
+        if tenant_registry.get(db_name) is None:
+            raise CommandError(f'Unknown tenant database: {db_name}')
+        ensure_tenant_database(db_name)
+
+        periods = Ref_Period.objects.using(db_name)
+        if options['period']:
+            periods = periods.filter(PeriodId__in=options['period'])
+        else:
+            periods = periods.filter(IsLock=True)
+        # Oldest first, each snapshot is built incrementally from the previous one
+        periods = list(periods.order_by('EndDate').values_list('PeriodId', 'PeriodName'))
+        if not periods:
+            raise CommandError('No periods to snapshot')
+
+        for period_id, period_name in periods:
+            started = time.perf_counter()
+            try:
+                refresh_balance_snapshot(period_id, db_name)
+            except DatabaseError as e:
+                raise CommandError(f'Period {period_id} ({period_name}): {e}')
+            self.stdout.write(f'  {period_id:>4} {period_name:<17} {(time.perf_counter() - started) * 1000:.1f} ms')
+
+        self.stdout.write(self.style.SUCCESS(f'{len(periods)} period snapshot(s) written to {db_name}'))
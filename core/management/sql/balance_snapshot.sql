@@ -0,0 +1,336 @@
+-- PostgreSQL Period-End Balance Snapshot Functions
+-- Maintains the balance_snapshot tables (migration 0039_balance_snapshot):
+--   balance_snapshot           - one row per snapshotted period (PeriodId, EndDate)
+--   balance_snapshot_account   - cumulative DebitAmount / CreditAmount per AccountId
+--   balance_snapshot_client    - cumulative DebitAmount / CreditAmount per AccountId + ClientId
+--   balance_snapshot_currency  - cumulative currency and MNT debit / credit per AccountId + CurrencyId
+-- The totals cover every non-deleted cash, inventory and asset document detail
+-- dated up to the period EndDate. Beginning balance tables are NOT included,
+-- each report keeps applying its own starting balance rules on top.
+--
+-- calculate_trial_balance, calculate_st_balance and calculate_recpay_balance
+-- start from the nearest snapshot before their begindate and only scan the
+-- documents dated after it.
+--
+-- Snapshots are written when a period is locked (period_lock_toggle) or closed
+-- (calculate_closing_record). The triggers at the end of this file drop every
+-- snapshot with EndDate >= DocumentDate whenever a document detail is inserted
+-- or deleted, or an update changes a value the snapshots depend on, so a
+-- back-dated posting never leaves a stale snapshot behind.
+--
+-- Invalidation and refresh are serialized with a transaction-level advisory
+-- lock on hashtext('balance_snapshot'): postings take it shared (they never
+-- wait for each other), a refresh takes it exclusive before reading anything.
+-- Without it, under READ COMMITTED a posting whose trigger runs before a
+-- concurrent refresh commits finds no snapshot to drop, while the refresh
+-- cannot see the uncommitted line, and the snapshot stays wrong for good.
+-- With it, a refresh waits for the postings in flight to commit (and then
+-- scans their lines), and a posting arriving during a refresh waits for it to
+-- commit (and then drops the new snapshot).
+--
+-- Install after migration 0039 (the tables must exist) and before the report
+-- functions that read the snapshots.
+
+-------------------------------------------------------------------
+-- 1. Invalidation
+-------------------------------------------------------------------
+DROP FUNCTION IF EXISTS public.invalidate_balance_snapshots(date);
+
+CREATE OR REPLACE FUNCTION public.invalidate_balance_snapshots(p_date DATE)
+RETURNS VOID AS $$
+BEGIN
+    IF p_date IS NULL THEN
+        RETURN;
+    END IF;
+
+    -- Shared with other postings, waits for a refresh in progress to commit
+    PERFORM pg_advisory_xact_lock_shared(hashtext('balance_snapshot'));
+
+    IF NOT EXISTS (
+        SELECT 1 FROM balance_snapshot WHERE "EndDate" >= p_date
+    ) THEN
+        RETURN;
+    END IF;
+
+    DELETE FROM balance_snapshot_account
+    WHERE "PeriodId" IN (SELECT "PeriodId" FROM balance_snapshot WHERE "EndDate" >= p_date);
+
+    DELETE FROM balance_snapshot_client
+    WHERE "PeriodId" IN (SELECT "PeriodId" FROM balance_snapshot WHERE "EndDate" >= p_date);
+
+    DELETE FROM balance_snapshot_currency
+    WHERE "PeriodId" IN (SELECT "PeriodId" FROM balance_snapshot WHERE "EndDate" >= p_date);
+
+    DELETE FROM balance_snapshot
+    WHERE "EndDate" >= p_date;
+END;
+$$ LANGUAGE plpgsql;
+
+-------------------------------------------------------------------
+-- 2. Build the snapshot of a period
+-------------------------------------------------------------------
+DROP FUNCTION IF EXISTS public.refresh_balance_snapshot(SMALLINT);
+
+CREATE OR REPLACE FUNCTION public.refresh_balance_snapshot(p_period_id SMALLINT)
+RETURNS VOID AS $$
+DECLARE
+    v_end_date DATE;
+    v_base_period_id SMALLINT;
+    v_base_date DATE;
+BEGIN
+    -- Waits for the postings in flight to commit, so gap_details below sees their lines
+    PERFORM pg_advisory_xact_lock(hashtext('balance_snapshot'));
+
+    SELECT "EndDate"
+    INTO v_end_date
+    FROM ref_period
+    WHERE "PeriodId" = p_period_id;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Period ID % not found', p_period_id;
+    END IF;
+
+    -- Drop the previous snapshot of this period
+    DELETE FROM balance_snapshot_account WHERE "PeriodId" = p_period_id;
+    DELETE FROM balance_snapshot_client WHERE "PeriodId" = p_period_id;
+    DELETE FROM balance_snapshot_currency WHERE "PeriodId" = p_period_id;
+    DELETE FROM balance_snapshot WHERE "PeriodId" = p_period_id;
+
+    -- Build incrementally from the nearest earlier snapshot (still valid, the
+    -- triggers drop any snapshot a later posting would change)
+    SELECT "PeriodId", "EndDate"
+    INTO v_base_period_id, v_base_date
+    FROM balance_snapshot
+    WHERE "EndDate" < v_end_date
+    ORDER BY "EndDate" DESC
+    LIMIT 1;
+
+    v_base_date := COALESCE(v_base_date, '-infinity'::DATE);
+
+    INSERT INTO balance_snapshot ("PeriodId", "EndDate", "CreatedDate")
+    VALUES (p_period_id, v_end_date, NOW());
+
+    WITH
+    -- Document details dated after the base snapshot up to the period end
+    gap_details AS MATERIALIZED (
+        SELECT cdd."AccountId", cdd."ClientId", cdd."CurrencyId", cdd."IsDebit",
+               cdd."CurrencyAmount", cdd."DebitAmount", cdd."CreditAmount"
+        FROM cash_document_detail cdd
+        INNER JOIN cash_document cd ON cdd."DocumentId" = cd."DocumentId"
+        WHERE cd."DocumentDate" > v_base_date
+            AND cd."DocumentDate" <= v_end_date
+            AND cd."IsDelete" = false
+
+        UNION ALL
+
+        SELECT idd."AccountId", idd."ClientId", idd."CurrencyId", idd."IsDebit",
+               idd."CurrencyAmount", idd."DebitAmount", idd."CreditAmount"
+        FROM inv_document_detail idd
+        INNER JOIN inv_document id ON idd."DocumentId" = id."DocumentId"
+        WHERE id."DocumentDate" > v_base_date
+            AND id."DocumentDate" <= v_end_date
+            AND id."IsDelete" = false
+
+        UNION ALL
+
+        SELECT add."AccountId", add."ClientId", add."CurrencyId", add."IsDebit",
+               add."CurrencyAmount", add."DebitAmount", add."CreditAmount"
+        FROM ast_document_detail add
+        INNER JOIN ast_document ad ON add."DocumentId" = ad."DocumentId"
+        WHERE ad."DocumentDate" > v_base_date
+            AND ad."DocumentDate" <= v_end_date
+            AND ad."IsDelete" = false
+    ),
+
+    account_snapshot AS (
+        INSERT INTO balance_snapshot_account ("PeriodId", "AccountId", "DebitAmount", "CreditAmount")
+        SELECT p_period_id, t."AccountId", COALESCE(SUM(t."DebitAmount"), 0), COALESCE(SUM(t."CreditAmount"), 0)
+        FROM (
+            SELECT bsa."AccountId", bsa."DebitAmount", bsa."CreditAmount"
+            FROM balance_snapshot_account bsa
+            WHERE bsa."PeriodId" = v_base_period_id
+            UNION ALL
+            SELECT g."AccountId", g."DebitAmount", g."CreditAmount"
+            FROM gap_details g
+        ) t
+        GROUP BY t."AccountId"
+    ),
+
+    client_snapshot AS (
+        INSERT INTO balance_snapshot_client ("PeriodId", "AccountId", "ClientId", "DebitAmount", "CreditAmount")
+        SELECT p_period_id, t."AccountId", t."ClientId", COALESCE(SUM(t."DebitAmount"), 0), COALESCE(SUM(t."CreditAmount"), 0)
+        FROM (
+            SELECT bsc."AccountId", bsc."ClientId", bsc."DebitAmount", bsc."CreditAmount"
+            FROM balance_snapshot_client bsc
+            WHERE bsc."PeriodId" = v_base_period_id
+            UNION ALL
+            SELECT g."AccountId", g."ClientId", g."DebitAmount", g."CreditAmount"
+            FROM gap_details g
+        ) t
+        GROUP BY t."AccountId", t."ClientId"
+    )
+
+    INSERT INTO balance_snapshot_currency (
+        "PeriodId", "AccountId", "CurrencyId",
+        "DebitCurrencyAmount", "CreditCurrencyAmount", "DebitAmount", "CreditAmount"
+    )
+    SELECT p_period_id, t."AccountId", t."CurrencyId",
+           COALESCE(SUM(t.debit_cur), 0), COALESCE(SUM(t.credit_cur), 0),
+           COALESCE(SUM(t."DebitAmount"), 0), COALESCE(SUM(t."CreditAmount"), 0)
+    FROM (
+        SELECT bsu."AccountId", bsu."CurrencyId",
+               bsu."DebitCurrencyAmount" AS debit_cur, bsu."CreditCurrencyAmount" AS credit_cur,
+               bsu."DebitAmount", bsu."CreditAmount"
+        FROM balance_snapshot_currency bsu
+        WHERE bsu."PeriodId" = v_base_period_id
+        UNION ALL
+        SELECT g."AccountId", g."CurrencyId",
+               CASE WHEN g."IsDebit" = true THEN g."CurrencyAmount" ELSE 0 END,
+               CASE WHEN g."IsDebit" = false THEN g."CurrencyAmount" ELSE 0 END,
+               g."DebitAmount", g."CreditAmount"
+        FROM gap_details g
+    ) t
+    GROUP BY t."AccountId", t."CurrencyId";
+END;
+$$ LANGUAGE plpgsql;
+
+-------------------------------------------------------------------
+-- 3. Invalidation triggers
+-------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION public.balance_snapshot_document_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM invalidate_balance_snapshots(OLD."DocumentDate");
+    ELSE
+        PERFORM invalidate_balance_snapshots(LEAST(OLD."DocumentDate", NEW."DocumentDate"));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION public.balance_snapshot_detail_changed()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_document_ids INTEGER[];
+    v_document_date DATE;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        v_document_ids := ARRAY[NEW."DocumentId"];
+    ELSIF TG_OP = 'DELETE' THEN
+        v_document_ids := ARRAY[OLD."DocumentId"];
+    ELSE
+        v_document_ids := ARRAY[OLD."DocumentId", NEW."DocumentId"];
+    END IF;
+
+    IF TG_TABLE_NAME = 'cash_document_detail' THEN
+        SELECT MIN("DocumentDate") INTO v_document_date
+        FROM cash_document WHERE "DocumentId" = ANY(v_document_ids);
+    ELSIF TG_TABLE_NAME = 'inv_document_detail' THEN
+        SELECT MIN("DocumentDate") INTO v_document_date
+        FROM inv_document WHERE "DocumentId" = ANY(v_document_ids);
+    ELSE
+        SELECT MIN("DocumentDate") INTO v_document_date
+        FROM ast_document WHERE "DocumentId" = ANY(v_document_ids);
+    END IF;
+
+    PERFORM invalidate_balance_snapshots(v_document_date);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Document headers: only a date change or a (soft) delete moves amounts.
+-- Django's save() writes every column, so UPDATE OF alone would also fire on
+-- an edited description; the WHEN clause compares the values themselves.
+DROP TRIGGER IF EXISTS balance_snapshot_document ON cash_document;
+CREATE TRIGGER balance_snapshot_document
+    AFTER UPDATE OF "DocumentDate", "IsDelete" ON cash_document
+    FOR EACH ROW
+    WHEN (OLD."DocumentDate" IS DISTINCT FROM NEW."DocumentDate" OR OLD."IsDelete" IS DISTINCT FROM NEW."IsDelete")
+    EXECUTE PROCEDURE balance_snapshot_document_changed();
+
+DROP TRIGGER IF EXISTS balance_snapshot_document_delete ON cash_document;
+CREATE TRIGGER balance_snapshot_document_delete
+    AFTER DELETE ON cash_document
+    FOR EACH ROW EXECUTE PROCEDURE balance_snapshot_document_changed();
+
+DROP TRIGGER IF EXISTS balance_snapshot_document ON inv_document;
+CREATE TRIGGER balance_snapshot_document
+    AFTER UPDATE OF "DocumentDate", "IsDelete" ON inv_document
+    FOR EACH ROW
+    WHEN (OLD."DocumentDate" IS DISTINCT FROM NEW."DocumentDate" OR OLD."IsDelete" IS DISTINCT FROM NEW."IsDelete")
+    EXECUTE PROCEDURE balance_snapshot_document_changed();
+
+DROP TRIGGER IF EXISTS balance_snapshot_document_delete ON inv_document;
+CREATE TRIGGER balance_snapshot_document_delete
+    AFTER DELETE ON inv_document
+    FOR EACH ROW EXECUTE PROCEDURE balance_snapshot_document_changed();
+
+DROP TRIGGER IF EXISTS balance_snapshot_document ON ast_document;
+CREATE TRIGGER balance_snapshot_document
+    AFTER UPDATE OF "DocumentDate", "IsDelete" ON ast_document
+    FOR EACH ROW
+    WHEN (OLD."DocumentDate" IS DISTINCT FROM NEW."DocumentDate" OR OLD."IsDelete" IS DISTINCT FROM NEW."IsDelete")
+    EXECUTE PROCEDURE balance_snapshot_document_changed();
+
+DROP TRIGGER IF EXISTS balance_snapshot_document_delete ON ast_document;
+CREATE TRIGGER balance_snapshot_document_delete
+    AFTER DELETE ON ast_document
+    FOR EACH ROW EXECUTE PROCEDURE balance_snapshot_document_changed();
+
+-- Document details: every inserted or deleted line, and updates of the
+-- columns the snapshots sum (bulk_update rewrites unchanged lines as well)
+DROP TRIGGER IF EXISTS balance_snapshot_detail ON cash_document_detail;
+CREATE TRIGGER balance_snapshot_detail
+    AFTER INSERT OR DELETE ON cash_document_detail
+    FOR EACH ROW EXECUTE PROCEDURE balance_snapshot_detail_changed();
+
+DROP TRIGGER IF EXISTS balance_snapshot_detail_update ON cash_document_detail;
+CREATE TRIGGER balance_snapshot_detail_update
+    AFTER UPDATE ON cash_document_detail
+    FOR EACH ROW
+    WHEN ((OLD."DocumentId", OLD."AccountId", OLD."ClientId", OLD."CurrencyId", OLD."IsDebit",
+           OLD."CurrencyAmount", OLD."DebitAmount", OLD."CreditAmount")
+          IS DISTINCT FROM
+          (NEW."DocumentId", NEW."AccountId", NEW."ClientId", NEW."CurrencyId", NEW."IsDebit",
+           NEW."CurrencyAmount", NEW."DebitAmount", NEW."CreditAmount"))
+    EXECUTE PROCEDURE balance_snapshot_detail_changed();
+
+DROP TRIGGER IF EXISTS balance_snapshot_detail ON inv_document_detail;
+CREATE TRIGGER balance_snapshot_detail
+    AFTER INSERT OR DELETE ON inv_document_detail
+    FOR EACH ROW EXECUTE PROCEDURE balance_snapshot_detail_changed();
+
+DROP TRIGGER IF EXISTS balance_snapshot_detail_update ON inv_document_detail;
+CREATE TRIGGER balance_snapshot_detail_update
+    AFTER UPDATE ON inv_document_detail
+    FOR EACH ROW
+    WHEN ((OLD."DocumentId", OLD."AccountId", OLD."ClientId", OLD."CurrencyId", OLD."IsDebit",
+           OLD."CurrencyAmount", OLD."DebitAmount", OLD."CreditAmount")
+          IS DISTINCT FROM
+          (NEW."DocumentId", NEW."AccountId", NEW."ClientId", NEW."CurrencyId", NEW."IsDebit",
+           NEW."CurrencyAmount", NEW."DebitAmount", NEW."CreditAmount"))
+    EXECUTE PROCEDURE balance_snapshot_detail_changed();
+
+DROP TRIGGER IF EXISTS balance_snapshot_detail ON ast_document_detail;
+CREATE TRIGGER balance_snapshot_detail
+    AFTER INSERT OR DELETE ON ast_document_detail
+    FOR EACH ROW EXECUTE PROCEDURE balance_snapshot_detail_changed();
+
+DROP TRIGGER IF EXISTS balance_snapshot_detail_update ON ast_document_detail;
+CREATE TRIGGER balance_snapshot_detail_update
+    AFTER UPDATE ON ast_document_detail
+    FOR EACH ROW
+    WHEN ((OLD."DocumentId", OLD."AccountId", OLD."ClientId", OLD."CurrencyId", OLD."IsDebit",
+           OLD."CurrencyAmount", OLD."DebitAmount", OLD."CreditAmount")
+          IS DISTINCT FROM
+          (NEW."DocumentId", NEW."AccountId", NEW."ClientId", NEW."CurrencyId", NEW."IsDebit",
+           NEW."CurrencyAmount", NEW."DebitAmount", NEW."CreditAmount"))
+    EXECUTE PROCEDURE balance_snapshot_detail_changed();
+
+-- Example usage:
+-- Snapshot period 12 (normally done by period_lock_toggle / calculate_closing_record):
+-- SELECT refresh_balance_snapshot(12::SMALLINT);
+--
+-- Periods with a valid snapshot:
+-- SELECT * FROM balance_snapshot ORDER BY "EndDate";
@@ -1,6 +1,7 @@
 -- PostgreSQL Closing Record Calculation Function
 -- Calculates period-end closing entries for income and expense accounts
 -- Creates two cash documents: one for income closing, one for expense closing
+-- and writes the period-end balance snapshot (requires balance_snapshot.sql)
 
 DROP FUNCTION IF EXISTS public.calculate_closing_record(SMALLINT, INTEGER);
 
@@ -357,6 +358,9 @@ BEGIN
     -- Clean up temporary table
     DROP TABLE IF EXISTS temp_calculated_amounts;
     
+    -- Period-end balance snapshot including the closing entries (balance_snapshot.sql)
+    PERFORM refresh_balance_snapshot(p_period_id);
+    
 END;
 $$ LANGUAGE plpgsql;
 
@@ -366,5 +370,6 @@ COMMENT ON FUNCTION calculate_closing_record(SMALLINT, INTEGER) IS
 Creates two cash documents (DocumentTypeId=14): one for income closing (ХБ1), one for expense closing (ХБ2).
 Aggregates accounts with AccountTypeId between 69 and 101 from cash, inventory, and asset documents.
 Parameters: p_period_id (accounting period), p_user_id (session user for audit fields).
-Automatically deletes existing closing entries for the period before creating new ones.';
+Automatically deletes existing closing entries for the period before creating new ones.
+Refreshes the period-end balance snapshot (balance_snapshot) afterwards.';
 
@@ -3,6 +3,7 @@
 -- for a given date range
 -- Parameters: begindate DATE, enddate DATE
 -- Returns: Balance data for receivable and payable accounts grouped by AccountId and ClientId
+-- Requires: balance_snapshot.sql (the beginning balance starts from the nearest period-end snapshot)
 
 -- Drop the function if it exists
 DROP FUNCTION IF EXISTS public.calculate_recpay_balance(date, date);
@@ -42,7 +43,27 @@ BEGIN
     ),
     
     -- 2. Transactions Before Begin Date (grouped by AccountId and ClientId)
+    -- Nearest period-end snapshot before begindate (see balance_snapshot.sql)
+    balance_snapshot_before AS (
+        SELECT bs."PeriodId", bs."EndDate"
+        FROM balance_snapshot bs
+        WHERE bs."EndDate" < begindate
+        ORDER BY bs."EndDate" DESC
+        LIMIT 1
+    ),
+    
+    -- Cumulative totals up to the snapshot plus the documents dated after it
     transactions_before_begin AS (
+        SELECT 
+            bsc."AccountId",
+            bsc."ClientId",
+            bsc."DebitAmount" AS debit_before,
+            bsc."CreditAmount" AS credit_before
+        FROM balance_snapshot_client bsc
+        INNER JOIN balance_snapshot_before bsb ON bsc."PeriodId" = bsb."PeriodId"
+        
+        UNION ALL
+        
         SELECT 
             cdd."AccountId",
             cdd."ClientId",
@@ -51,6 +72,7 @@ BEGIN
         FROM cash_document_detail cdd
         INNER JOIN cash_document cd ON cdd."DocumentId" = cd."DocumentId"
         WHERE cd."DocumentDate" < begindate 
+            AND cd."DocumentDate" > COALESCE((SELECT "EndDate" FROM balance_snapshot_before), '-infinity'::DATE)
             AND cd."IsDelete" = false
         GROUP BY cdd."AccountId", cdd."ClientId"
         
@@ -64,6 +86,7 @@ BEGIN
         FROM inv_document_detail idd
         INNER JOIN inv_document id ON idd."DocumentId" = id."DocumentId"
         WHERE id."DocumentDate" < begindate 
+            AND id."DocumentDate" > COALESCE((SELECT "EndDate" FROM balance_snapshot_before), '-infinity'::DATE)
             AND id."IsDelete" = false
         GROUP BY idd."AccountId", idd."ClientId"
         
@@ -77,6 +100,7 @@ BEGIN
         FROM ast_document_detail add
         INNER JOIN ast_document ad ON add."DocumentId" = ad."DocumentId"
         WHERE ad."DocumentDate" < begindate 
+            AND ad."DocumentDate" > COALESCE((SELECT "EndDate" FROM balance_snapshot_before), '-infinity'::DATE)
             AND ad."IsDelete" = false
         GROUP BY add."AccountId", add."ClientId"
     ),
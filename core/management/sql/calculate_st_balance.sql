@@ -51,27 +51,44 @@ BEGIN
         ) ast_bb USING ("AccountId")
     ),
 
+    -- nearest period-end snapshot before begindate (see balance_snapshot.sql)
+    snapshot_before AS (
+        SELECT bs."PeriodId", bs."EndDate"
+        FROM balance_snapshot bs
+        WHERE bs."EndDate" < begindate
+        ORDER BY bs."EndDate" DESC
+        LIMIT 1
+    ),
+
     transactions_before AS (
         SELECT "AccountId",
                SUM("DebitAmount") AS debit_before,
                SUM("CreditAmount") AS credit_before
         FROM (
+            SELECT bsa."AccountId", bsa."DebitAmount", bsa."CreditAmount"
+            FROM balance_snapshot_account bsa
+            JOIN snapshot_before s ON s."PeriodId" = bsa."PeriodId"
+
+            UNION ALL
             SELECT cdd."AccountId", cdd."DebitAmount", cdd."CreditAmount"
             FROM cash_document_detail cdd
             JOIN cash_document cd ON cd."DocumentId" = cdd."DocumentId"
             WHERE cd."DocumentDate" < begindate AND cd."IsDelete" = false
+              AND cd."DocumentDate" > COALESCE((SELECT "EndDate" FROM snapshot_before), '-infinity'::date)
 
             UNION ALL
             SELECT idd."AccountId", idd."DebitAmount", idd."CreditAmount"
             FROM inv_document_detail idd
             JOIN inv_document id ON id."DocumentId" = idd."DocumentId"
             WHERE id."DocumentDate" < begindate AND id."IsDelete" = false
+              AND id."DocumentDate" > COALESCE((SELECT "EndDate" FROM snapshot_before), '-infinity'::date)
 
             UNION ALL
             SELECT add."AccountId", add."DebitAmount", add."CreditAmount"
             FROM ast_document_detail add
             JOIN ast_document ad ON ad."DocumentId" = add."DocumentId"
             WHERE ad."DocumentDate" < begindate AND ad."IsDelete" = false
+              AND ad."DocumentDate" > COALESCE((SELECT "EndDate" FROM snapshot_before), '-infinity'::date)
         ) t
         GROUP BY "AccountId"
     ),
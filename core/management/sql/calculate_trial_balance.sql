@@ -2,6 +2,7 @@
 -- This function calculates trial balance for a given date range
 -- Parameters: begindate DATE, enddate DATE
 -- Returns: Trial balance data with beginning balances, period transactions, and ending balances
+-- Requires: balance_snapshot.sql (the beginning balance starts from the nearest period-end snapshot)
 
 -- Drop the function if it exists
 DROP FUNCTION IF EXISTS public.calculate_trial_balance(date, date);
@@ -81,7 +82,26 @@ BEGIN
     ),
     
     -- 2. Transactions Before Begin Date
+    -- Nearest period-end snapshot before begindate (see balance_snapshot.sql)
+    balance_snapshot_before AS (
+        SELECT bs."PeriodId", bs."EndDate"
+        FROM balance_snapshot bs
+        WHERE bs."EndDate" < begindate
+        ORDER BY bs."EndDate" DESC
+        LIMIT 1
+    ),
+    
+    -- Cumulative totals up to the snapshot plus the documents dated after it
     transactions_before_begin AS (
+        SELECT 
+            bsa."AccountId",
+            bsa."DebitAmount" AS debit_before,
+            bsa."CreditAmount" AS credit_before
+        FROM balance_snapshot_account bsa
+        INNER JOIN balance_snapshot_before bsb ON bsa."PeriodId" = bsb."PeriodId"
+        
+        UNION ALL
+        
         SELECT 
             cdd."AccountId",
             COALESCE(SUM(cdd."DebitAmount"), 0) AS debit_before,
@@ -89,6 +109,7 @@ BEGIN
         FROM cash_document_detail cdd
         INNER JOIN cash_document cd ON cdd."DocumentId" = cd."DocumentId"
         WHERE cd."DocumentDate" < begindate 
+            AND cd."DocumentDate" > COALESCE((SELECT "EndDate" FROM balance_snapshot_before), '-infinity'::DATE)
             AND cd."IsDelete" = false
         GROUP BY cdd."AccountId"
         
@@ -101,6 +122,7 @@ BEGIN
         FROM inv_document_detail idd
         INNER JOIN inv_document id ON idd."DocumentId" = id."DocumentId"
         WHERE id."DocumentDate" < begindate 
+            AND id."DocumentDate" > COALESCE((SELECT "EndDate" FROM balance_snapshot_before), '-infinity'::DATE)
             AND id."IsDelete" = false
         GROUP BY idd."AccountId"
         
@@ -113,6 +135,7 @@ BEGIN
         FROM ast_document_detail add
         INNER JOIN ast_document ad ON add."DocumentId" = ad."DocumentId"
         WHERE ad."DocumentDate" < begindate 
+            AND ad."DocumentDate" > COALESCE((SELECT "EndDate" FROM balance_snapshot_before), '-infinity'::DATE)
             AND ad."IsDelete" = false
         GROUP BY add."AccountId"
     ),
@@ -1,11 +1,18 @@
 -- PostgreSQL Asset Balance Function (As Of Date)
 -- Calculates asset balances by AccountId + AssetCardId as of a given date
 -- Includes beginning balances, cumulative income/expense up to the date, and depreciation expense
+-- report_assetcard_balance(date, integer[], integer): only the given asset cards (optionally one account),
+--   e.g. the items of a single asset document; NULL means all. Every source CTE is filtered
+--   before aggregating, so the cost follows the number of cards instead of the portfolio.
+-- report_assetcard_balance(date): all asset cards of the tenant
 
 DROP FUNCTION IF EXISTS public.report_assetcard_balance(date);
+DROP FUNCTION IF EXISTS public.report_assetcard_balance(date, integer[], integer);
 
 CREATE OR REPLACE FUNCTION public.report_assetcard_balance(
-    asofdate DATE
+    asofdate DATE,
+    p_asset_card_ids INTEGER[],
+    p_account_id INTEGER DEFAULT NULL
 )
 RETURNS TABLE (
     accountid INTEGER,
@@ -36,21 +43,6 @@ RETURNS TABLE (
 BEGIN
     RETURN QUERY
     WITH 
-    period_bounds AS (
-        SELECT 
-            rp."BeginDate",
-            rp."EndDate"
-        FROM ref_period rp
-        WHERE asofdate BETWEEN rp."BeginDate" AND rp."EndDate"
-        ORDER BY rp."BeginDate" DESC
-        LIMIT 1
-    ),
-    period_dates AS (
-        SELECT 
-            COALESCE((SELECT "BeginDate" FROM period_bounds), date_trunc('month', asofdate)::DATE) AS period_begin,
-            asofdate AS period_end
-    ),
-
     -- 1) Starting Balance from ast_beginning_balance (per AccountId + AssetCardId)
     starting_balances AS (
         SELECT 
@@ -63,6 +55,8 @@ BEGIN
         FROM ast_beginning_balance abb
         INNER JOIN ref_asset_card rac ON abb."AssetCardId" = rac."AssetCardId"
         WHERE abb."IsDelete" = false
+            AND (p_asset_card_ids IS NULL OR abb."AssetCardId" = ANY(p_asset_card_ids))
+            AND (p_account_id IS NULL OR abb."AccountId" = p_account_id)
         GROUP BY abb."AccountId", abb."AssetCardId", rac."AssetId"
     ),
 
@@ -78,6 +72,8 @@ BEGIN
         WHERE ad."DocumentTypeId" = 10
             AND ad."DocumentDate" <= asofdate
             AND ad."IsDelete" = false
+            AND (p_asset_card_ids IS NULL OR adi."AssetCardId" = ANY(p_asset_card_ids))
+            AND (p_account_id IS NULL OR ad."AccountId" = p_account_id)
         GROUP BY ad."AccountId", adi."AssetCardId"
     ),
 
@@ -93,6 +89,8 @@ BEGIN
         WHERE ad."DocumentTypeId" = 11
             AND ad."DocumentDate" <= asofdate
             AND ad."IsDelete" = false
+            AND (p_asset_card_ids IS NULL OR adi."AssetCardId" = ANY(p_asset_card_ids))
+            AND (p_account_id IS NULL OR ad."AccountId" = p_account_id)
         GROUP BY ad."AccountId", adi."AssetCardId"
     ),
 
@@ -109,45 +107,16 @@ BEGIN
         INNER JOIN ref_asset_card rac ON et."AssetCardId" = rac."AssetCardId"
     ),
 
-    -- 5) First receipt (DocumentTypeId=10) dates per asset up to asofdate
-    asset_receipts AS (
-        SELECT 
-            ad."AccountId",
-            adi."AssetCardId",
-            MIN(ad."DocumentDate") AS first_receipt_date
-        FROM ast_document ad
-        INNER JOIN ast_document_item adi ON ad."DocumentId" = adi."DocumentId"
-        CROSS JOIN period_dates pd
-        WHERE ad."DocumentTypeId" = 10
-            AND ad."IsDelete" = false
-            AND ad."DocumentDate" <= pd.period_end
-        GROUP BY ad."AccountId", adi."AssetCardId"
-    ),
-
-    -- 6) First disposal (DocumentTypeId=11) during the current period (up to asofdate)
-    asset_disposals AS (
-        SELECT 
-            ad."AccountId",
-            adi."AssetCardId",
-            MIN(ad."DocumentDate") AS first_disposal_date
-        FROM ast_document ad
-        INNER JOIN ast_document_item adi ON ad."DocumentId" = adi."DocumentId"
-        CROSS JOIN period_dates pd
-        WHERE ad."DocumentTypeId" = 11
-            AND ad."IsDelete" = false
-            AND ad."DocumentDate" BETWEEN pd.period_begin AND pd.period_end
-        GROUP BY ad."AccountId", adi."AssetCardId"
-    ),
-
-    -- 7) Determine activity windows and compute depreciation based on daily expense
+    -- 5) Depreciation expense booked up to and including asofdate
     depreciation_expenses AS (
         SELECT
             ade."AccountId",
             ade."AssetCardId",
             COALESCE(SUM(ade."ExpenseAmount"), 0)::NUMERIC(24,6) AS depreciation_expense
         FROM ast_depreciation_expense ade
-        CROSS JOIN period_dates pd
-        WHERE ade."DepreciationDate" <= pd.period_end
+        WHERE ade."DepreciationDate" <= asofdate
+            AND (p_asset_card_ids IS NULL OR ade."AssetCardId" = ANY(p_asset_card_ids))
+            AND (p_account_id IS NULL OR ade."AccountId" = p_account_id)
         GROUP BY ade."AccountId", ade."AssetCardId"
     )
 
@@ -217,3 +186,36 @@ BEGIN
     ORDER BY ra."AccountCode", ras."AssetCode", rac."AssetCardCode";
 END;
 $$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION public.report_assetcard_balance(
+    asofdate DATE
+)
+RETURNS TABLE (
+    accountid INTEGER,
+    accountcode VARCHAR(20),
+    accountname VARCHAR(200),
+    assetid INTEGER,
+    assetcode VARCHAR(5),
+    assetname VARCHAR(50),
+    assettypeid SMALLINT,
+    assettypename VARCHAR(50),
+    assetcardid INTEGER,
+    assetcardcode VARCHAR(5),
+    assetcardname VARCHAR(50),
+    cumulateddepreciation NUMERIC(24,6),
+    depreciationexpense NUMERIC(24,6),
+    beginningquantity NUMERIC(24,6),
+    beginningcost NUMERIC(24,6),
+    inquantity NUMERIC(24,6),
+    incost NUMERIC(24,6),
+    outquantity NUMERIC(24,6),
+    outcost NUMERIC(24,6),
+    endingquantity NUMERIC(24,6),
+    endingcost NUMERIC(24,6),
+    dailyexpense NUMERIC(24,6),
+    totalexpense NUMERIC(24,6),
+    netbookvalue NUMERIC(24,6)
+) AS $$
+    SELECT * FROM public.report_assetcard_balance(asofdate, NULL, NULL);
+$$ LANGUAGE sql STABLE;
@@ -0,0 +1,176 @@
+-- PostgreSQL Ledger Lines Function
+-- Returns every detail line of the cash, inventory and asset documents in a date range
+-- that have at least one line posted to the account (and client, if given).
+-- Used by the account statement and subsidiary ledger views and their CSV/XLSX export.
+-- Parameters: p_account_id INTEGER, p_begin_date DATE, p_end_date DATE, p_client_id INTEGER (NULL = all clients)
+-- Returns: one row per document detail with the column names and types the views use directly
+-- (amounts as DOUBLE PRECISION, IsMatchingAccount = the line itself posts to the account)
+
+-- Drop the function if it exists
+DROP FUNCTION IF EXISTS public.report_ledger_lines(INTEGER, DATE, DATE, INTEGER);
+
+CREATE OR REPLACE FUNCTION public.report_ledger_lines(
+    p_account_id INTEGER,
+    p_begin_date DATE,
+    p_end_date DATE,
+    p_client_id INTEGER DEFAULT NULL
+)
+RETURNS TABLE (
+    "DocumentId" INTEGER,
+    "DocumentDate" DATE,
+    "DocumentNo" VARCHAR,
+    "DocumentTypeId" SMALLINT,
+    "DocumentType" VARCHAR,
+    "Description" VARCHAR,
+    "DocumentSource" VARCHAR,
+    "DocumentCategory" VARCHAR,
+    "DocumentDetailId" INTEGER,
+    "AccountCode" VARCHAR,
+    "AccountName" VARCHAR,
+    "ClientCode" VARCHAR,
+    "ClientName" VARCHAR,
+    "CurrencyName" VARCHAR,
+    "CurrencyExchange" DOUBLE PRECISION,
+    "CurrencyAmount" DOUBLE PRECISION,
+    "DebitAmount" DOUBLE PRECISION,
+    "CreditAmount" DOUBLE PRECISION,
+    "IsDebit" BOOLEAN,
+    "IsMatchingAccount" BOOLEAN
+)
+-- A single SQL statement, so the planner inlines it and the NULL client checks fold away
+LANGUAGE sql STABLE
+AS $$
+    -- Cash Document Lines
+    SELECT 
+        h."DocumentId",
+        h."DocumentDate",
+        h."DocumentNo"::VARCHAR,
+        h."DocumentTypeId"::SMALLINT,
+        dt."Description"::VARCHAR,
+        COALESCE(h."Description", '')::VARCHAR,
+        'cash'::VARCHAR,
+        'Cash'::VARCHAR,
+        d."DocumentDetailId",
+        a."AccountCode"::VARCHAR,
+        a."AccountName"::VARCHAR,
+        COALESCE(c."ClientCode", '')::VARCHAR,
+        COALESCE(c."ClientName", '')::VARCHAR,
+        COALESCE(cur."Currency_name", '')::VARCHAR,
+        COALESCE(d."CurrencyExchange", 1.0)::DOUBLE PRECISION,
+        COALESCE(d."CurrencyAmount", 0)::DOUBLE PRECISION,
+        COALESCE(d."DebitAmount", 0)::DOUBLE PRECISION,
+        COALESCE(d."CreditAmount", 0)::DOUBLE PRECISION,
+        d."IsDebit",
+        d."AccountId" = p_account_id
+    FROM cash_document h
+    INNER JOIN cash_document_detail d ON h."DocumentId" = d."DocumentId"
+    INNER JOIN ref_account a ON d."AccountId" = a."AccountId"
+    LEFT JOIN ref_client c ON d."ClientId" = c."ClientId"
+    LEFT JOIN ref_currency cur ON d."CurrencyId" = cur."CurrencyId"
+    INNER JOIN ref_document_type dt ON h."DocumentTypeId" = dt."DocumentTypeId"
+    WHERE h."DocumentDate" >= p_begin_date
+        AND h."DocumentDate" <= p_end_date
+        AND h."IsDelete" = false
+        AND (p_client_id IS NULL OR d."ClientId" = p_client_id)
+        AND EXISTS (
+            SELECT 1
+            FROM cash_document_detail m
+            WHERE m."DocumentId" = h."DocumentId"
+                AND m."AccountId" = p_account_id
+                AND (p_client_id IS NULL OR m."ClientId" = p_client_id)
+        )
+
+    UNION ALL
+
+    -- Inventory Document Lines
+    SELECT 
+        h."DocumentId",
+        h."DocumentDate",
+        h."DocumentNo"::VARCHAR,
+        h."DocumentTypeId"::SMALLINT,
+        dt."Description"::VARCHAR,
+        COALESCE(h."Description", '')::VARCHAR,
+        'inv'::VARCHAR,
+        'Inventory'::VARCHAR,
+        d."DocumentDetailId",
+        a."AccountCode"::VARCHAR,
+        a."AccountName"::VARCHAR,
+        COALESCE(c."ClientCode", '')::VARCHAR,
+        COALESCE(c."ClientName", '')::VARCHAR,
+        COALESCE(cur."Currency_name", '')::VARCHAR,
+        COALESCE(d."CurrencyExchange", 1.0)::DOUBLE PRECISION,
+        COALESCE(d."CurrencyAmount", 0)::DOUBLE PRECISION,
+        COALESCE(d."DebitAmount", 0)::DOUBLE PRECISION,
+        COALESCE(d."CreditAmount", 0)::DOUBLE PRECISION,
+        d."IsDebit",
+        d."AccountId" = p_account_id
+    FROM inv_document h
+    INNER JOIN inv_document_detail d ON h."DocumentId" = d."DocumentId"
+    INNER JOIN ref_account a ON d."AccountId" = a."AccountId"
+    LEFT JOIN ref_client c ON d."ClientId" = c."ClientId"
+    LEFT JOIN ref_currency cur ON d."CurrencyId" = cur."CurrencyId"
+    INNER JOIN ref_document_type dt ON h."DocumentTypeId" = dt."DocumentTypeId"
+    WHERE h."DocumentDate" >= p_begin_date
+        AND h."DocumentDate" <= p_end_date
+        AND h."IsDelete" = false
+        AND (p_client_id IS NULL OR d."ClientId" = p_client_id)
+        AND EXISTS (
+            SELECT 1
+            FROM inv_document_detail m
+            WHERE m."DocumentId" = h."DocumentId"
+                AND m."AccountId" = p_account_id
+                AND (p_client_id IS NULL OR m."ClientId" = p_client_id)
+        )
+
+    UNION ALL
+
+    -- Asset Document Lines
+    SELECT 
+        h."DocumentId",
+        h."DocumentDate",
+        h."DocumentNo"::VARCHAR,
+        h."DocumentTypeId"::SMALLINT,
+        dt."Description"::VARCHAR,
+        COALESCE(h."Description", '')::VARCHAR,
+        'ast'::VARCHAR,
+        'Asset'::VARCHAR,
+        d."DocumentDetailId",
+        a."AccountCode"::VARCHAR,
+        a."AccountName"::VARCHAR,
+        COALESCE(c."ClientCode", '')::VARCHAR,
+        COALESCE(c."ClientName", '')::VARCHAR,
+        COALESCE(cur."Currency_name", '')::VARCHAR,
+        COALESCE(d."CurrencyExchange", 1.0)::DOUBLE PRECISION,
+        COALESCE(d."CurrencyAmount", 0)::DOUBLE PRECISION,
+        COALESCE(d."DebitAmount", 0)::DOUBLE PRECISION,
+        COALESCE(d."CreditAmount", 0)::DOUBLE PRECISION,
+        d."IsDebit",
+        d."AccountId" = p_account_id
+    FROM ast_document h
+    INNER JOIN ast_document_detail d ON h."DocumentId" = d."DocumentId"
+    INNER JOIN ref_account a ON d."AccountId" = a."AccountId"
+    LEFT JOIN ref_client c ON d."ClientId" = c."ClientId"
+    LEFT JOIN ref_currency cur ON d."CurrencyId" = cur."CurrencyId"
+    INNER JOIN ref_document_type dt ON h."DocumentTypeId" = dt."DocumentTypeId"
+    WHERE h."DocumentDate" >= p_begin_date
+        AND h."DocumentDate" <= p_end_date
+        AND h."IsDelete" = false
+        AND (p_client_id IS NULL OR d."ClientId" = p_client_id)
+        AND EXISTS (
+            SELECT 1
+            FROM ast_document_detail m
+            WHERE m."DocumentId" = h."DocumentId"
+                AND m."AccountId" = p_account_id
+                AND (p_client_id IS NULL OR m."ClientId" = p_client_id)
+        )
+
+    -- DocumentDate, DocumentNo, DocumentDetailId
+    ORDER BY 2, 3, 9;
+$$;
+
+-- Example usage:
+-- All lines of the documents posting to account 1:
+-- SELECT * FROM report_ledger_lines(1, '2025-01-01', '2025-12-31');
+
+-- Only the lines of client 2 on the documents posting to account 1 for client 2:
+-- SELECT * FROM report_ledger_lines(1, '2025-01-01', '2025-12-31', 2);
@@ -0,0 +1,26 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0036_add_account_fields_to_ref_product_group'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ref_Document_Sequence',
+            fields=[
+                ('DocumentTypeId', models.OneToOneField(db_column='DocumentTypeId', on_delete=django.db.models.deletion.PROTECT, primary_key=True, related_name='document_sequence', serialize=False, to='core.ref_document_type')),
+                ('Prefix', models.CharField(max_length=8)),
+                ('LastNumber', models.IntegerField(default=0)),
+                ('ModifiedDate', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Document Sequence',
+                'verbose_name_plural': 'Document Sequences',
+                'db_table': 'ref_document_sequence',
+            },
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0037_ref_document_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ref_template_design',
+            name='ModifiedDate',
+            field=models.DateTimeField(auto_now=True, null=True, blank=True),
+        ),
+    ]
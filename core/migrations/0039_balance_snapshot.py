@@ -0,0 +1,79 @@
+# Generated by Django 4.2.23 on 2026-10-18 06:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0038_ref_template_design_modifieddate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Balance_Snapshot',
+            fields=[
+                ('PeriodId', models.OneToOneField(db_column='PeriodId', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='balance_snapshot', serialize=False, to='core.ref_period')),
+                ('EndDate', models.DateField(db_index=True)),
+                ('CreatedDate', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Balance Snapshot',
+                'verbose_name_plural': 'Balance Snapshots',
+                'db_table': 'balance_snapshot',
+            },
+        ),
+        migrations.CreateModel(
+            name='Balance_Snapshot_Currency',
+            fields=[
+                ('SnapshotCurrencyId', models.AutoField(primary_key=True, serialize=False)),
+                ('DebitCurrencyAmount', models.DecimalField(decimal_places=6, default=0, max_digits=24)),
+                ('CreditCurrencyAmount', models.DecimalField(decimal_places=6, default=0, max_digits=24)),
+                ('DebitAmount', models.DecimalField(decimal_places=6, default=0, max_digits=24)),
+                ('CreditAmount', models.DecimalField(decimal_places=6, default=0, max_digits=24)),
+                ('AccountId', models.ForeignKey(db_column='AccountId', on_delete=django.db.models.deletion.PROTECT, related_name='currency_balance_snapshots', to='core.ref_account')),
+                ('CurrencyId', models.ForeignKey(blank=True, db_column='CurrencyId', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='balance_snapshots', to='core.ref_currency')),
+                ('PeriodId', models.ForeignKey(db_column='PeriodId', on_delete=django.db.models.deletion.CASCADE, related_name='currencies', to='core.balance_snapshot')),
+            ],
+            options={
+                'verbose_name': 'Currency Balance Snapshot',
+                'verbose_name_plural': 'Currency Balance Snapshots',
+                'db_table': 'balance_snapshot_currency',
+                'indexes': [models.Index(fields=['PeriodId', 'AccountId', 'CurrencyId'], name='balance_sna_PeriodI_9ee15a_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Balance_Snapshot_Client',
+            fields=[
+                ('SnapshotClientId', models.AutoField(primary_key=True, serialize=False)),
+                ('DebitAmount', models.DecimalField(decimal_places=6, default=0, max_digits=24)),
+                ('CreditAmount', models.DecimalField(decimal_places=6, default=0, max_digits=24)),
+                ('AccountId', models.ForeignKey(db_column='AccountId', on_delete=django.db.models.deletion.PROTECT, related_name='client_balance_snapshots', to='core.ref_account')),
+                ('ClientId', models.ForeignKey(blank=True, db_column='ClientId', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='balance_snapshots', to='core.refclient')),
+                ('PeriodId', models.ForeignKey(db_column='PeriodId', on_delete=django.db.models.deletion.CASCADE, related_name='clients', to='core.balance_snapshot')),
+            ],
+            options={
+                'verbose_name': 'Client Balance Snapshot',
+                'verbose_name_plural': 'Client Balance Snapshots',
+                'db_table': 'balance_snapshot_client',
+                'indexes': [models.Index(fields=['PeriodId', 'AccountId', 'ClientId'], name='balance_sna_PeriodI_87d915_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Balance_Snapshot_Account',
+            fields=[
+                ('SnapshotAccountId', models.AutoField(primary_key=True, serialize=False)),
+                ('DebitAmount', models.DecimalField(decimal_places=6, default=0, max_digits=24)),
+                ('CreditAmount', models.DecimalField(decimal_places=6, default=0, max_digits=24)),
+                ('AccountId', models.ForeignKey(db_column='AccountId', on_delete=django.db.models.deletion.PROTECT, related_name='balance_snapshots', to='core.ref_account')),
+                ('PeriodId', models.ForeignKey(db_column='PeriodId', on_delete=django.db.models.deletion.CASCADE, related_name='accounts', to='core.balance_snapshot')),
+            ],
+            options={
+                'verbose_name': 'Account Balance Snapshot',
+                'verbose_name_plural': 'Account Balance Snapshots',
+                'db_table': 'balance_snapshot_account',
+                'indexes': [models.Index(fields=['PeriodId', 'AccountId'], name='balance_sna_PeriodI_3e3325_idx')],
+            },
+        ),
+    ]
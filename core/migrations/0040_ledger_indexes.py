@@ -0,0 +1,90 @@
+# Generated by Django 4.2.23 on 2026-10-18 06:52
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    # CREATE / DROP INDEX CONCURRENTLY keep the ledger tables writable while the indexes change
+    atomic = False
+
+    dependencies = [
+        ('core', '0039_balance_snapshot'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='ast_document',
+            index=models.Index(condition=models.Q(('IsDelete', False)), fields=['DocumentDate', 'DocumentId'], name='ast_doc_live_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='ast_document_detail',
+            index=models.Index(fields=['AccountId', 'DocumentId'], name='ast_detail_account_doc_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='cash_document',
+            index=models.Index(condition=models.Q(('IsDelete', False)), fields=['DocumentDate', 'DocumentId'], name='cash_doc_live_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='cash_documentdetail',
+            index=models.Index(fields=['AccountId', 'DocumentId'], name='cash_detail_account_doc_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='inv_document',
+            index=models.Index(condition=models.Q(('IsDelete', False)), fields=['DocumentDate', 'DocumentId'], name='inv_doc_live_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='inv_document_detail',
+            index=models.Index(fields=['AccountId', 'DocumentId'], name='inv_detail_account_doc_idx'),
+        ),
+        # The composite indexes lead with AccountId, the single column FK indexes become redundant.
+        # Only the state changes through AlterField: on the database a db_index change makes Django
+        # drop and re-add the FK constraint, which revalidates the whole table under a write lock.
+        # The old indexes (Django's default FK index names) are dropped concurrently instead.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='ast_document_detail',
+                    name='AccountId',
+                    field=models.ForeignKey(db_column='AccountId', db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='ast_document_details', to='core.ref_account'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    'DROP INDEX CONCURRENTLY IF EXISTS "ast_document_detail_AccountId_ba139604"',
+                    reverse_sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS "ast_document_detail_AccountId_ba139604" ON "ast_document_detail" ("AccountId")',
+                ),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='cash_documentdetail',
+                    name='AccountId',
+                    field=models.ForeignKey(db_column='AccountId', db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='cash_document_details', to='core.ref_account'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    'DROP INDEX CONCURRENTLY IF EXISTS "cash_document_detail_AccountId_b14d810d"',
+                    reverse_sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS "cash_document_detail_AccountId_b14d810d" ON "cash_document_detail" ("AccountId")',
+                ),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='inv_document_detail',
+                    name='AccountId',
+                    field=models.ForeignKey(db_column='AccountId', db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='inv_document_details', to='core.ref_account'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    'DROP INDEX CONCURRENTLY IF EXISTS "inv_document_detail_AccountId_2fc3a3fb"',
+                    reverse_sql='CREATE INDEX CONCURRENTLY IF NOT EXISTS "inv_document_detail_AccountId_2fc3a3fb" ON "inv_document_detail" ("AccountId")',
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.23 on 2026-10-18 07:07
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY keeps ins_policy_main writable while the index builds
+    atomic = False
+
+    dependencies = [
+        ('core', '0040_ledger_indexes'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='policy_main',
+            index=models.Index(fields=['-CreatedDate', '-PolicyId'], name='policy_created_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-18 07:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0041_policy_list_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ref_document_sequence',
+            name='Prefix',
+            field=models.CharField(max_length=10),
+        ),
+    ]
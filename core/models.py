@@ -337,6 +337,28 @@ class Ref_Document_Counter(models.Model):
         return f"{self.DocumentNo} - {self.DocumentTypeId.Description}"
 
 
+class Ref_Document_Sequence(models.Model):
+    """Per-DocumentTypeId document number sequence (see core.document_sequence)"""
+    DocumentTypeId = models.OneToOneField(
+        Ref_Document_Type,
+        on_delete=models.PROTECT,
+        primary_key=True,
+        db_column='DocumentTypeId',
+        related_name='document_sequence'
+    )
+    Prefix = models.CharField(max_length=10)  # As long as Ref_Document_Counter.DocumentNo, whose prefix _seed copies
+    LastNumber = models.IntegerField(default=0)
+    ModifiedDate = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'ref_document_sequence'
+        verbose_name = 'Document Sequence'
+        verbose_name_plural = 'Document Sequences'
+
+    def __str__(self):
+        return f"{self.Prefix}{self.LastNumber:04d}"
+
+
 class Ref_CashFlow(models.Model):
     """Cash Flow model for categorizing cash flow types"""
     CashFlowId = models.SmallIntegerField(primary_key=True)
@@ -463,6 +485,10 @@ class Cash_Document(models.Model):
         db_table = 'cash_document'
         verbose_name = 'Cash Document'
         verbose_name_plural = 'Cash Documents'
+        indexes = [
+            # Live documents by date: report period / before-date scans joined to the details
+            models.Index(fields=['DocumentDate', 'DocumentId'], condition=models.Q(IsDelete=False), name='cash_doc_live_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.DocumentNo} - {self.Description}"
@@ -481,7 +507,8 @@ class Cash_DocumentDetail(models.Model):
         Ref_Account,
         on_delete=models.PROTECT,
         db_column='AccountId',
-        related_name='cash_document_details'
+        related_name='cash_document_details',
+        db_index=False  # covered by the (AccountId, DocumentId) index
     )
     ClientId = models.ForeignKey(
         RefClient,
@@ -521,6 +548,10 @@ class Cash_DocumentDetail(models.Model):
         db_table = 'cash_document_detail'
         verbose_name = 'Cash Document Detail'
         verbose_name_plural = 'Cash Document Details'
+        indexes = [
+            # Account filtered ledger lines joined to their documents
+            models.Index(fields=['AccountId', 'DocumentId'], name='cash_detail_account_doc_idx'),
+        ]
  
     def __str__(self):
         return f"{self.DocumentId.DocumentNo} - {self.AccountId.AccountName} - {self.ClientId.ClientName}"
@@ -596,6 +627,10 @@ class Inv_Document(models.Model):
         db_table = 'inv_document'
         verbose_name = 'Inventory Document'
         verbose_name_plural = 'Inventory Documents'
+        indexes = [
+            # Live documents by date: report period / before-date scans joined to the details
+            models.Index(fields=['DocumentDate', 'DocumentId'], condition=models.Q(IsDelete=False), name='inv_doc_live_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.DocumentNo} - {self.Description}"
@@ -684,7 +719,8 @@ class Inv_Document_Detail(models.Model):
         Ref_Account,
         on_delete=models.PROTECT,
         db_column='AccountId',
-        related_name='inv_document_details'
+        related_name='inv_document_details',
+        db_index=False  # covered by the (AccountId, DocumentId) index
     )
     ClientId = models.ForeignKey(
         RefClient,
@@ -712,6 +748,10 @@ class Inv_Document_Detail(models.Model):
         db_table = 'inv_document_detail'
         verbose_name = 'Inventory Document Detail'
         verbose_name_plural = 'Inventory Document Details'
+        indexes = [
+            # Account filtered ledger lines joined to their documents
+            models.Index(fields=['AccountId', 'DocumentId'], name='inv_detail_account_doc_idx'),
+        ]
 
     def __str__(self):
         return f"{self.DocumentId.DocumentNo} - {self.AccountId.AccountName} - {self.CurrencyAmount}"
@@ -751,6 +791,131 @@ class Ref_Constant(models.Model):
         return f"{self.ConstantName} - {self.ConstantDescription}"
 
 
+class Balance_Snapshot(models.Model):
+    """
+    Period-end ledger snapshot marker. The snapshot lines hold the cumulative
+    DebitAmount / CreditAmount of every document dated up to EndDate (beginning
+    balance tables excluded) and are maintained by the balance_snapshot.sql
+    functions and triggers.
+    """
+    PeriodId = models.OneToOneField(
+        Ref_Period,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        db_column='PeriodId',
+        related_name='balance_snapshot'
+    )
+    EndDate = models.DateField(db_index=True)
+    CreatedDate = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'balance_snapshot'
+        verbose_name = 'Balance Snapshot'
+        verbose_name_plural = 'Balance Snapshots'
+
+    def __str__(self):
+        return f"{self.PeriodId_id} - {self.EndDate}"
+
+
+class Balance_Snapshot_Account(models.Model):
+    """Cumulative debit / credit per account as of the snapshot EndDate"""
+    SnapshotAccountId = models.AutoField(primary_key=True)
+    PeriodId = models.ForeignKey(
+        Balance_Snapshot,
+        on_delete=models.CASCADE,
+        db_column='PeriodId',
+        related_name='accounts'
+    )
+    AccountId = models.ForeignKey(
+        Ref_Account,
+        on_delete=models.PROTECT,
+        db_column='AccountId',
+        related_name='balance_snapshots'
+    )
+    DebitAmount = models.DecimalField(max_digits=24, decimal_places=6, default=0)
+    CreditAmount = models.DecimalField(max_digits=24, decimal_places=6, default=0)
+
+    class Meta:
+        db_table = 'balance_snapshot_account'
+        verbose_name = 'Account Balance Snapshot'
+        verbose_name_plural = 'Account Balance Snapshots'
+        indexes = [
+            models.Index(fields=['PeriodId', 'AccountId']),
+        ]
+
+
+class Balance_Snapshot_Client(models.Model):
+    """Cumulative debit / credit per account and client as of the snapshot EndDate"""
+    SnapshotClientId = models.AutoField(primary_key=True)
+    PeriodId = models.ForeignKey(
+        Balance_Snapshot,
+        on_delete=models.CASCADE,
+        db_column='PeriodId',
+        related_name='clients'
+    )
+    AccountId = models.ForeignKey(
+        Ref_Account,
+        on_delete=models.PROTECT,
+        db_column='AccountId',
+        related_name='client_balance_snapshots'
+    )
+    ClientId = models.ForeignKey(
+        RefClient,
+        on_delete=models.PROTECT,
+        db_column='ClientId',
+        related_name='balance_snapshots',
+        null=True,
+        blank=True
+    )
+    DebitAmount = models.DecimalField(max_digits=24, decimal_places=6, default=0)
+    CreditAmount = models.DecimalField(max_digits=24, decimal_places=6, default=0)
+
+    class Meta:
+        db_table = 'balance_snapshot_client'
+        verbose_name = 'Client Balance Snapshot'
+        verbose_name_plural = 'Client Balance Snapshots'
+        indexes = [
+            models.Index(fields=['PeriodId', 'AccountId', 'ClientId']),
+        ]
+
+
+class Balance_Snapshot_Currency(models.Model):
+    """Cumulative debit / credit (currency and MNT) per account and currency as of the snapshot EndDate"""
+    SnapshotCurrencyId = models.AutoField(primary_key=True)
+    PeriodId = models.ForeignKey(
+        Balance_Snapshot,
+        on_delete=models.CASCADE,
+        db_column='PeriodId',
+        related_name='currencies'
+    )
+    AccountId = models.ForeignKey(
+        Ref_Account,
+        on_delete=models.PROTECT,
+        db_column='AccountId',
+        related_name='currency_balance_snapshots'
+    )
+    CurrencyId = models.ForeignKey(
+        Ref_Currency,
+        on_delete=models.PROTECT,
+        db_column='CurrencyId',
+        related_name='balance_snapshots',
+        null=True,
+        blank=True
+    )
+    DebitCurrencyAmount = models.DecimalField(max_digits=24, decimal_places=6, default=0)
+    CreditCurrencyAmount = models.DecimalField(max_digits=24, decimal_places=6, default=0)
+    DebitAmount = models.DecimalField(max_digits=24, decimal_places=6, default=0)
+    CreditAmount = models.DecimalField(max_digits=24, decimal_places=6, default=0)
+
+    class Meta:
+        db_table = 'balance_snapshot_currency'
+        verbose_name = 'Currency Balance Snapshot'
+        verbose_name_plural = 'Currency Balance Snapshots'
+        indexes = [
+            models.Index(fields=['PeriodId', 'AccountId', 'CurrencyId']),
+        ]
+
+
 class Inv_Beginning_Balance(models.Model):
     """Inventory Beginning Balance model for managing initial inventory balances"""
     BeginningBalanceId = models.AutoField(primary_key=True, db_column='BeginningBalanceId')
@@ -1051,6 +1216,10 @@ class Ast_Document(models.Model):
         db_table = 'ast_document'
         verbose_name = 'Asset Document'
         verbose_name_plural = 'Asset Documents'
+        indexes = [
+            # Live documents by date: report period / before-date scans joined to the details
+            models.Index(fields=['DocumentDate', 'DocumentId'], condition=models.Q(IsDelete=False), name='ast_doc_live_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.DocumentNo} - {self.Description}"
@@ -1069,7 +1238,8 @@ class Ast_Document_Detail(models.Model):
         Ref_Account,
         on_delete=models.PROTECT,
         db_column='AccountId',
-        related_name='ast_document_details'
+        related_name='ast_document_details',
+        db_index=False  # covered by the (AccountId, DocumentId) index
     )
     ClientId = models.ForeignKey(
         RefClient,
@@ -1097,6 +1267,10 @@ class Ast_Document_Detail(models.Model):
         db_table = 'ast_document_detail'
         verbose_name = 'Asset Document Detail'
         verbose_name_plural = 'Asset Document Details'
+        indexes = [
+            # Account filtered ledger lines joined to their documents
+            models.Index(fields=['AccountId', 'DocumentId'], name='ast_detail_account_doc_idx'),
+        ]
 
     def __str__(self):
         return f"{self.DocumentId.DocumentNo} - {self.AccountId.AccountName} - {self.CurrencyAmount}"
@@ -1885,6 +2059,7 @@ class Ref_Template_Design(models.Model):
         db_column='CreatedBy'
     )
     CreatedDate = models.DateField(auto_now_add=True, null=True, blank=True)
+    ModifiedDate = models.DateTimeField(auto_now=True, null=True, blank=True)
 
     class Meta:
         db_table = 'ins_ref_template_design'
@@ -2060,6 +2235,10 @@ class Policy_Main(models.Model):
         db_table = 'ins_policy_main'
         verbose_name = 'Policy'
         verbose_name_plural = 'Policies'
+        indexes = [
+            # policy_list keyset pages, newest first (scanned backwards for the previous page)
+            models.Index(fields=['-CreatedDate', '-PolicyId'], name='policy_created_keyset_idx'),
+        ]
 
     def __str__(self):
         return f"{self.PolicyNo}"
@@ -0,0 +1,268 @@
+"""
+Batch generation of policy Word documents.
+
+Policies are selected by template, branch, channel, BeginDate range and/or
+explicit PolicyIds, rendered in parallel by a bounded process pool and
+streamed back as one ZIP archive. Each document is added to the archive as
+soon as it is ready, so the batch is never held in memory. Failures are
+collected in manifest.csv inside the archive instead of aborting the batch.
+The manifest is always written, also when a render process dies (the pool
+is rebuilt, see POLICY_BATCH_POOL_RESTARTS) or the batch stops early.
+
+Large batches run through the generate_policy_documents command. The HTTP
+endpoint only accepts batches that fit in a gunicorn worker timeout
+(POLICY_BATCH_MAX_POLICIES).
+
+The ZIP is streamed after the request has finished, when the middleware
+has already cleared the request's tenant, so every render selects its
+tenant database explicitly from the db_name passed in.
+"""
+import csv
+import io
+import logging
+import multiprocessing
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from django.conf import settings
+
+from .db_router import ensure_tenant_database
+from .report_export import ChunkBuffer
+from .thread_local import clear_current_db, get_current_db, set_current_db
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.csv'
+MANIFEST_HEADERS = ['PolicyId', 'PolicyNo', 'Status', 'File', 'Error']
+
+
+def get_batch_workers():
+    return max(1, getattr(settings, 'POLICY_BATCH_WORKERS', min(4, os.cpu_count() or 1)))
+
+
+def get_batch_max_policies():
+    return getattr(settings, 'POLICY_BATCH_MAX_POLICIES', 25)
+
+
+def get_batch_pool_restarts():
+    return max(0, getattr(settings, 'POLICY_BATCH_POOL_RESTARTS', 3))
+
+
+def parse_batch_filters(params):
+    """
+    Convert request/command parameters (strings) into select_policies() keyword
+    arguments. Raises ValueError for malformed values or an empty filter.
+    """
+    filters = {}
+    for name in ('template_id', 'branch_id', 'channel_id'):
+        value = (params.get(name) or '').strip()
+        if value:
+            if not value.isdigit():
+                raise ValueError(f'Invalid {name}: {value}')
+            filters[name] = int(value)
+    for name in ('date_from', 'date_to'):
+        value = (params.get(name) or '').strip()
+        if value:
+            try:
+                filters[name] = datetime.strptime(value, '%Y-%m-%d').date()
+            except ValueError:
+                raise ValueError(f'Invalid {name}: {value} (expected YYYY-MM-DD)')
+    policy_ids = (params.get('policy_ids') or '').replace(' ', '')
+    if policy_ids:
+        try:
+            filters['policy_ids'] = [int(policy_id) for policy_id in policy_ids.split(',') if policy_id]
+        except ValueError:
+            raise ValueError(f'Invalid policy_ids: {policy_ids}')
+    if not filters:
+        raise ValueError('At least one filter is required: template_id, branch_id, channel_id, date_from, date_to or policy_ids')
+    return filters
+
+
+def select_policies(db_name=None, template_id=None, branch_id=None, channel_id=None,
+                    date_from=None, date_to=None, policy_ids=None):
+    """
+    Return [(PolicyId, PolicyNo), ...] matching the batch filter, ordered by PolicyId.
+    date_from / date_to filter on BeginDate (inclusive).
+    """
+    from .models import Policy_Main
+
+    db_name = ensure_tenant_database(db_name or get_current_db())
+    policies = Policy_Main.objects.using(db_name).all()
+    if template_id:
+        policies = policies.filter(PolicyTemplateId_id=template_id)
+    if branch_id:
+        policies = policies.filter(AgentBranchId_id=branch_id)
+    if channel_id:
+        policies = policies.filter(AgentChannelId_id=channel_id)
+    if date_from:
+        policies = policies.filter(BeginDate__gte=date_from)
+    if date_to:
+        policies = policies.filter(BeginDate__lte=date_to)
+    if policy_ids:
+        policies = policies.filter(PolicyId__in=policy_ids)
+    return list(policies.order_by('PolicyId').values_list('PolicyId', 'PolicyNo'))
+
+
+def _init_worker():
+    # Spawned workers start from a clean interpreter without inherited connections
+    import django
+    django.setup()
+
+
+def _render_in_worker(db_name, policy_id):
+    """Process pool task: render one policy document in the given tenant database."""
+    from .word_generator import render_policy_word_document
+
+    ensure_tenant_database(db_name)
+    set_current_db(db_name)
+    return render_policy_word_document(policy_id)
+
+
+def _error_text(e):
+    return ' '.join(str(e).split()) or e.__class__.__name__
+
+
+def _new_executor(workers):
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+    )
+
+
+def iter_rendered_documents(policies, db_name=None, workers=None):
+    """
+    Render policies in a process pool and yield (PolicyId, PolicyNo, path, error)
+    as documents complete. At most 2 x workers renders are queued at a time.
+
+    Every policy is yielded exactly once. When a render process dies (e.g.
+    killed for memory) the pool is broken: the renders in flight are reported
+    as errors and a new pool takes the rest, up to POLICY_BATCH_POOL_RESTARTS
+    times; after that the remaining policies are reported as errors.
+    """
+    db_name = db_name or get_current_db()
+    workers = workers or get_batch_workers()
+    queue = deque(policies)
+    in_flight = {}
+    restarts = 0
+    executor = _new_executor(workers)
+
+    try:
+        while queue or in_flight:
+            broken = False
+            while queue and len(in_flight) < workers * 2:
+                try:
+                    future = executor.submit(_render_in_worker, db_name, queue[0][0])
+                except BrokenProcessPool:
+                    broken = True
+                    break
+                in_flight[future] = queue.popleft()
+
+            if in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    policy_id, policy_no = in_flight.pop(future)
+                    try:
+                        yield policy_id, policy_no, future.result(), None
+                    except BrokenProcessPool as e:
+                        broken = True
+                        logger.warning(f'Batch render process died while rendering policy {policy_id}: {str(e)}')
+                        yield policy_id, policy_no, None, _error_text(e)
+                    except Exception as e:
+                        logger.warning(f'Batch document generation failed for policy {policy_id}: {str(e)}')
+                        yield policy_id, policy_no, None, _error_text(e)
+
+            if broken:
+                # A broken pool fails everything it still holds; which render killed it is unknown
+                executor.shutdown(wait=False, cancel_futures=True)
+                for future, (policy_id, policy_no) in in_flight.items():
+                    if future.done() and not future.cancelled() and future.exception() is None:
+                        yield policy_id, policy_no, future.result(), None
+                    else:
+                        yield policy_id, policy_no, None, 'Render process terminated abruptly'
+                in_flight.clear()
+                restarts += 1
+                if restarts > get_batch_pool_restarts():
+                    logger.error(f'Batch render pool broke {restarts} times; skipping {len(queue)} remaining policies')
+                    while queue:
+                        policy_id, policy_no = queue.popleft()
+                        yield policy_id, policy_no, None, 'Not rendered: render process pool kept failing'
+                    break
+                executor = _new_executor(workers)
+    finally:
+        # Also reached when the client disconnects mid-download
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_rendered_documents_in_process(policies, db_name=None):
+    """
+    Render policies one after another in the current process, in the given
+    tenant database, and yield (PolicyId, PolicyNo, path, error).
+    """
+    from .word_generator import render_policy_word_document
+
+    db_name = ensure_tenant_database(db_name or get_current_db())
+    try:
+        for policy_id, policy_no in policies:
+            # Set before every render: the generator may resume after the middleware cleared the tenant
+            set_current_db(db_name)
+            try:
+                yield policy_id, policy_no, render_policy_word_document(policy_id), None
+            except Exception as e:
+                logger.warning(f'Batch document generation failed for policy {policy_id}: {str(e)}')
+                yield policy_id, policy_no, None, _error_text(e)
+    finally:
+        clear_current_db()
+
+
+def iter_batch_zip(policies, db_name=None, workers=None, in_process=False):
+    """
+    Yield the chunks of a ZIP archive with one docx per policy and a manifest.
+    in_process renders in the calling process instead of a process pool.
+    """
+    policies = list(policies)
+    sink = ChunkBuffer()
+    manifest = io.StringIO()
+    manifest_writer = csv.writer(manifest)
+    manifest_writer.writerow(MANIFEST_HEADERS)
+    used_names = set()
+    reported = set()
+
+    if in_process:
+        documents = iter_rendered_documents_in_process(policies, db_name)
+    else:
+        documents = iter_rendered_documents(policies, db_name, workers)
+
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        try:
+            for policy_id, policy_no, path, error in documents:
+                reported.add(policy_id)
+                if error is None:
+                    try:
+                        name = f'{policy_no or policy_id}.docx'.replace('/', '_')
+                        if name in used_names:
+                            name = f'{policy_no or policy_id}_{policy_id}.docx'.replace('/', '_')
+                        used_names.add(name)
+                        archive.write(path, name)
+                        manifest_writer.writerow([policy_id, policy_no, 'OK', name, ''])
+                    except OSError as e:
+                        manifest_writer.writerow([policy_id, policy_no, 'ERROR', '', str(e)])
+                else:
+                    manifest_writer.writerow([policy_id, policy_no, 'ERROR', '', error])
+                yield sink.drain()
+        except Exception as e:
+            # Keep the archive usable: everything not rendered yet is listed as failed
+            logger.error(f'Batch document generation stopped: {str(e)}')
+            for policy_id, policy_no in policies:
+                if policy_id not in reported:
+                    manifest_writer.writerow([policy_id, policy_no, 'ERROR', '', f'Not rendered: {_error_text(e)}'])
+        archive.writestr(MANIFEST_NAME, '\ufeff' + manifest.getvalue())
+    yield sink.drain()
+
+
+def batch_zip_filename():
+    return f'policy_documents_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip'
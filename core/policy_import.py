@@ -0,0 +1,513 @@
+"""
+Bulk policy import.
+
+Loads a book of policies - Policy_Main with its products, items, risks,
+questions, payment schedule and files - from JSON or CSV, e.g. when migrating
+a broker's portfolio. Every referenced client, agent, template, currency,
+branch, channel, product, item, risk and question is loaded up front with one
+IN query per table, so rows are validated in memory. Valid policies are then
+inserted chunk by chunk: each chunk is one transaction with one bulk_create
+per table level, instead of one INSERT per row as in policy_create.
+
+Record shape (the same nested payload the policy form posts):
+
+    {"policy_no": "...", "client_id": 1 | "client_code": "00001",
+     "agent_id": 1 | "agent_username": "...", "policy_template_id": 1,
+     "begin_date": "YYYY-MM-DD", "end_date": "YYYY-MM-DD", "currency_id": 1,
+     "currency_exchange": "1", "agent_branch_id": 1, "agent_channel_id": 1,
+     "director_name": "...", "description": "...", "is_active": true,
+     "products": [{"productId": 1, "items": [{"itemId": 1, "beginDate": ...,
+                   "endDate": ..., "valuation": ..., "commPercent": ...,
+                   "commAmount": ..., "risks": [{"riskId": 1, "riskPercent": ...}],
+                   "questions": [{"itemQuestionId": 1, "answer": "..."}]}]}],
+     "schedules": [{"date": "YYYY-MM-DD", "amount": "..."}],
+     "files": [{"fileName": "...", "filePath": "..."}]}
+
+CSV files hold one policy per row with the scalar fields as columns and the
+products / schedules / files lists as JSON encoded columns.
+"""
+import csv
+import io
+import json
+import logging
+import time
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+
+from .db_router import ensure_tenant_database
+from .thread_local import get_current_db
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ('json', 'csv')
+NESTED_COLUMNS = ('products', 'schedules', 'files')
+TRUE_VALUES = ('1', 'true', 'yes', 'on', 'y')
+
+
+def get_import_chunk_size():
+    return max(1, getattr(settings, 'POLICY_IMPORT_CHUNK_SIZE', 500))
+
+
+def detect_import_format(filename):
+    """Return 'json' / 'csv' from a file name, or None."""
+    extension = (filename or '').rsplit('.', 1)[-1].lower()
+    return extension if extension in IMPORT_FORMATS else None
+
+
+def parse_import_file(content, import_format):
+    """
+    Parse an uploaded file (bytes or str) into a list of policy records.
+    Raises ValueError for unreadable files.
+    """
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    elif content.startswith('\ufeff'):
+        content = content[1:]
+
+    if import_format == 'json':
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError as e:
+            raise ValueError(f'Invalid JSON: {str(e)}')
+        if isinstance(data, dict):
+            data = data.get('policies')
+        if not isinstance(data, list):
+            raise ValueError('JSON must be a list of policies or {"policies": [...]}')
+        return data
+
+    if import_format == 'csv':
+        records = []
+        for line_no, row in enumerate(csv.DictReader(io.StringIO(content)), start=2):
+            record = {key.strip(): (value.strip() if isinstance(value, str) else value)
+                      for key, value in row.items() if key}
+            for column in NESTED_COLUMNS:
+                value = record.get(column)
+                if value:
+                    try:
+                        record[column] = json.loads(value)
+                    except json.JSONDecodeError:
+                        raise ValueError(f'Line {line_no}: column "{column}" is not valid JSON')
+                else:
+                    record[column] = []
+            records.append(record)
+        return records
+
+    raise ValueError(f'Unsupported import format: {import_format}')
+
+
+def _text(value):
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def _int(value):
+    value = _text(value)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'"{value}" is not a number')
+
+
+def _decimal(value):
+    value = _text(value)
+    if not value:
+        return None
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f'"{value}" is not a number')
+    if not number.is_finite():
+        raise ValueError(f'"{value}" is not a number')
+    return number
+
+
+@lru_cache(maxsize=None)
+def _decimal_for(model, field_name):
+    """
+    _decimal converter for one model DecimalField: the value is rounded to the
+    field's decimal_places (as the database would store it) and must then fit
+    its max_digits, so an out of range value fails its own record instead of
+    the whole insert chunk.
+    """
+    field = model._meta.get_field(field_name)
+    places = Decimal(1).scaleb(-field.decimal_places)
+
+    def convert(value):
+        number = _decimal(value)
+        if number is None:
+            return None
+        try:
+            number = number.quantize(places)
+            field.run_validators(number)
+        except (InvalidOperation, ValidationError):
+            raise ValueError(
+                f'"{_text(value)}" is out of range '
+                f'(at most {field.max_digits - field.decimal_places} digits before the decimal point)'
+            )
+        return number
+    return convert
+
+
+def _date(value):
+    # Accepts YYYY-MM-DD or the datetime-local form YYYY-MM-DDTHH:MM
+    value = _text(value).split('T')[0]
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f'"{value}" is not a date (YYYY-MM-DD)')
+
+
+def _bool(value, default=True):
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    return _text(value).lower() in TRUE_VALUES
+
+
+def _list(value):
+    return [entry for entry in value if isinstance(entry, dict)] if isinstance(value, list) else []
+
+
+class ReferenceData:
+    """Valid foreign keys for a set of records, loaded with one IN query per table."""
+
+    def __init__(self, db_name, records):
+        from django.contrib.auth.models import User
+        from .models import (
+            Policy_Main, RefClient, Ref_Branch, Ref_Channel, Ref_Currency, Ref_Item,
+            Ref_Item_Question, Ref_Policy_Template, Ref_Product, Ref_Risk
+        )
+
+        wanted = {name: set() for name in (
+            'client_id', 'client_code', 'agent_id', 'agent_username', 'policy_template_id',
+            'currency_id', 'agent_branch_id', 'agent_channel_id', 'policy_no',
+            'productId', 'itemId', 'riskId', 'itemQuestionId',
+        )}
+
+        def collect(name, value):
+            value = _text(value)
+            if value:
+                wanted[name].add(value)
+
+        for record in records:
+            if not isinstance(record, dict):
+                continue
+            for name in ('client_id', 'client_code', 'agent_id', 'agent_username', 'policy_template_id',
+                         'currency_id', 'agent_branch_id', 'agent_channel_id', 'policy_no'):
+                collect(name, record.get(name))
+            for product in _list(record.get('products')):
+                collect('productId', product.get('productId'))
+                for item in _list(product.get('items')):
+                    collect('itemId', item.get('itemId'))
+                    for risk in _list(item.get('risks')):
+                        collect('riskId', risk.get('riskId'))
+                    for question in _list(item.get('questions')):
+                        collect('itemQuestionId', question.get('itemQuestionId'))
+
+        def ids(model, field, name, **filters):
+            values = {int(value) for value in wanted[name] if value.isdigit()}
+            if not values:
+                return set()
+            return set(model.objects.using(db_name).filter(
+                **{f'{field}__in': values}, **filters
+            ).values_list(field, flat=True))
+
+        self.client_ids = ids(RefClient, 'ClientId', 'client_id', IsDelete=False)
+        self.clients_by_code = dict(RefClient.objects.using(db_name).filter(
+            ClientCode__in=wanted['client_code'], IsDelete=False
+        ).values_list('ClientCode', 'ClientId')) if wanted['client_code'] else {}
+        self.user_ids = ids(User, 'id', 'agent_id')
+        self.users_by_name = dict(User.objects.using(db_name).filter(
+            username__in=wanted['agent_username']
+        ).values_list('username', 'id')) if wanted['agent_username'] else {}
+        self.template_ids = ids(Ref_Policy_Template, 'PolicyTemplateId', 'policy_template_id')
+        self.currency_ids = ids(Ref_Currency, 'CurrencyId', 'currency_id')
+        self.branch_ids = ids(Ref_Branch, 'BranchId', 'agent_branch_id')
+        self.channel_ids = ids(Ref_Channel, 'ChannelId', 'agent_channel_id')
+        self.product_ids = ids(Ref_Product, 'ProductId', 'productId')
+        self.item_ids = ids(Ref_Item, 'ItemId', 'itemId')
+        self.risk_ids = ids(Ref_Risk, 'RiskId', 'riskId')
+        self.question_ids = ids(Ref_Item_Question, 'ItemQuestionId', 'itemQuestionId')
+        self.existing_policy_nos = set(Policy_Main.objects.using(db_name).filter(
+            PolicyNo__in=wanted['policy_no']
+        ).values_list('PolicyNo', flat=True)) if wanted['policy_no'] else set()
+
+
+def _reference(errors, label, value, valid_ids, required=True):
+    """Validate one id against a preloaded set; returns the id or None (recording the error)."""
+    try:
+        value = _int(value)
+    except ValueError as e:
+        errors.append(f'{label}: {str(e)}')
+        return None
+    if value is None:
+        if required:
+            errors.append(f'{label} is required')
+        return None
+    if value not in valid_ids:
+        errors.append(f'{label} {value} not found')
+        return None
+    return value
+
+
+def _converted(errors, label, converter, value, required=False):
+    try:
+        value = converter(value)
+    except ValueError as e:
+        errors.append(f'{label}: {str(e)}')
+        return None
+    if value is None and required:
+        errors.append(f'{label} is required')
+    return value
+
+
+def validate_record(record, refs, seen_policy_nos):
+    """
+    Validate one policy record against the preloaded reference data.
+    Returns (plan, errors); plan holds the field values of every row to insert.
+    """
+    from .models import Policy_Main, Policy_Main_Product_Item, Policy_Main_Product_Item_Risk, Policy_Main_Schedule
+
+    if not isinstance(record, dict):
+        return None, ['Record is not an object']
+
+    errors = []
+    policy_no = _text(record.get('policy_no'))
+    if not policy_no:
+        errors.append('policy_no is required')
+    elif len(policy_no) > 25:
+        errors.append('policy_no is longer than 25 characters')
+    elif policy_no in refs.existing_policy_nos:
+        errors.append(f'Policy {policy_no} already exists')
+    elif policy_no in seen_policy_nos:
+        errors.append(f'Policy {policy_no} is repeated in the file')
+
+    if _text(record.get('client_code')) and not _text(record.get('client_id')):
+        client_id = refs.clients_by_code.get(_text(record.get('client_code')))
+        if client_id is None:
+            errors.append(f'client_code {_text(record.get("client_code"))} not found')
+    else:
+        client_id = _reference(errors, 'client_id', record.get('client_id'), refs.client_ids)
+
+    if _text(record.get('agent_username')) and not _text(record.get('agent_id')):
+        agent_id = refs.users_by_name.get(_text(record.get('agent_username')))
+        if agent_id is None:
+            errors.append(f'agent_username {_text(record.get("agent_username"))} not found')
+    else:
+        agent_id = _reference(errors, 'agent_id', record.get('agent_id'), refs.user_ids)
+
+    begin_date = _converted(errors, 'begin_date', _date, record.get('begin_date'), required=True)
+    end_date = _converted(errors, 'end_date', _date, record.get('end_date'), required=True)
+    if begin_date and end_date and end_date < begin_date:
+        errors.append('end_date is before begin_date')
+
+    director_name = _text(record.get('director_name'))
+    description = _text(record.get('description'))
+    policy = {
+        'PolicyNo': policy_no,
+        'ClientId_id': client_id,
+        'AgentId_id': agent_id,
+        'PolicyTemplateId_id': _reference(errors, 'policy_template_id', record.get('policy_template_id'), refs.template_ids),
+        'BeginDate': begin_date,
+        'EndDate': end_date,
+        'CurrencyId_id': _reference(errors, 'currency_id', record.get('currency_id'), refs.currency_ids),
+        'CurrencyExchange': _converted(errors, 'currency_exchange', _decimal_for(Policy_Main, 'CurrencyExchange'), record.get('currency_exchange')) or Decimal('0'),
+        'AgentBranchId_id': _reference(errors, 'agent_branch_id', record.get('agent_branch_id'), refs.branch_ids),
+        'AgentChannelId_id': _reference(errors, 'agent_channel_id', record.get('agent_channel_id'), refs.channel_ids),
+        'DirectorName': director_name[:15] or None,
+        'Description': description[:60] or None,
+        'IsActive': _bool(record.get('is_active')),
+        'IsLock': False,
+        'IsPosted': False,
+    }
+
+    products = []
+    for p, product_data in enumerate(_list(record.get('products')), start=1):
+        label = f'products[{p}]'
+        product = {
+            'ProductId_id': _reference(errors, f'{label}.productId', product_data.get('productId'), refs.product_ids),
+            'items': [],
+        }
+        for i, item_data in enumerate(_list(product_data.get('items')), start=1):
+            item_label = f'{label}.items[{i}]'
+            item = {
+                'ItemId_id': _reference(errors, f'{item_label}.itemId', item_data.get('itemId'), refs.item_ids),
+                'BeginDate': _converted(errors, f'{item_label}.beginDate', _date, item_data.get('beginDate')),
+                'EndDate': _converted(errors, f'{item_label}.endDate', _date, item_data.get('endDate')),
+                'Valuation': _converted(errors, f'{item_label}.valuation', _decimal_for(Policy_Main_Product_Item, 'Valuation'), item_data.get('valuation')),
+                'CommPercent': _converted(errors, f'{item_label}.commPercent', _decimal_for(Policy_Main_Product_Item, 'CommPercent'), item_data.get('commPercent')),
+                'CommAmount': _converted(errors, f'{item_label}.commAmount', _decimal_for(Policy_Main_Product_Item, 'CommAmount'), item_data.get('commAmount')),
+                'risks': [],
+                'questions': [],
+            }
+            for r, risk_data in enumerate(_list(item_data.get('risks')), start=1):
+                if _text(risk_data.get('riskId')):
+                    item['risks'].append({
+                        'RiskId_id': _reference(errors, f'{item_label}.risks[{r}].riskId', risk_data.get('riskId'), refs.risk_ids),
+                        'RiskPercent': _converted(
+                            errors, f'{item_label}.risks[{r}].riskPercent',
+                            _decimal_for(Policy_Main_Product_Item_Risk, 'RiskPercent'), risk_data.get('riskPercent')
+                        ),
+                    })
+            for q, question_data in enumerate(_list(item_data.get('questions')), start=1):
+                if _text(question_data.get('itemQuestionId')):
+                    answer = _text(question_data.get('answer'))
+                    item['questions'].append({
+                        'ItemQuestionId_id': _reference(
+                            errors, f'{item_label}.questions[{q}].itemQuestionId',
+                            question_data.get('itemQuestionId'), refs.question_ids
+                        ),
+                        'Answer': answer[:300] or None,
+                    })
+            product['items'].append(item)
+        products.append(product)
+
+    schedules = []
+    for s, schedule_data in enumerate(_list(record.get('schedules')), start=1):
+        if _text(schedule_data.get('date')) and _text(schedule_data.get('amount')):
+            schedules.append({
+                'DueDate': _converted(errors, f'schedules[{s}].date', _date, schedule_data.get('date')),
+                'Amount': _converted(errors, f'schedules[{s}].amount', _decimal_for(Policy_Main_Schedule, 'Amount'), schedule_data.get('amount')),
+            })
+
+    files = []
+    for file_data in _list(record.get('files')):
+        file_name = _text(file_data.get('fileName'))
+        file_path = _text(file_data.get('filePath'))
+        if file_name or file_path:
+            files.append({'FileName': file_name[:50], 'FilePath': file_path[:100]})
+
+    if errors:
+        return None, errors
+    seen_policy_nos.add(policy_no)
+    return {'policy': policy, 'products': products, 'schedules': schedules, 'files': files}, []
+
+
+def _insert_chunk(db_name, plans, user_id, counts):
+    """Insert a chunk of validated policies: one transaction, one bulk_create per table level."""
+    from .models import (
+        Policy_Main, Policy_Main_Files, Policy_Main_Product, Policy_Main_Product_Item,
+        Policy_Main_Product_Item_Question, Policy_Main_Product_Item_Risk, Policy_Main_Schedule
+    )
+
+    batch_size = get_import_chunk_size()
+    chunk_counts = dict.fromkeys(counts, 0)
+    with transaction.atomic(using=db_name):
+        policies = Policy_Main.objects.using(db_name).bulk_create(
+            [Policy_Main(**plan['policy'], CreatedBy_id=user_id, ModifiedBy_id=user_id) for plan in plans],
+            batch_size=batch_size
+        )
+
+        products, product_plans, schedules, files = [], [], [], []
+        for policy, plan in zip(policies, plans):
+            for product in plan['products']:
+                products.append(Policy_Main_Product(PolicyMainId=policy, ProductId_id=product['ProductId_id']))
+                product_plans.append(product)
+            schedules.extend(Policy_Main_Schedule(PolicyId=policy, **schedule) for schedule in plan['schedules'])
+            files.extend(Policy_Main_Files(PolicyId=policy, **file) for file in plan['files'])
+        Policy_Main_Product.objects.using(db_name).bulk_create(products, batch_size=batch_size)
+
+        items, item_plans = [], []
+        for product, product_plan in zip(products, product_plans):
+            for item in product_plan['items']:
+                fields = {key: value for key, value in item.items() if key not in ('risks', 'questions')}
+                items.append(Policy_Main_Product_Item(PolicyMainProductId=product, **fields))
+                item_plans.append(item)
+        Policy_Main_Product_Item.objects.using(db_name).bulk_create(items, batch_size=batch_size)
+
+        risks, questions = [], []
+        for item, item_plan in zip(items, item_plans):
+            risks.extend(Policy_Main_Product_Item_Risk(PolicyMainProductItemId=item, **risk) for risk in item_plan['risks'])
+            questions.extend(
+                Policy_Main_Product_Item_Question(PolicyMainProductItemId=item, **question)
+                for question in item_plan['questions']
+            )
+        Policy_Main_Product_Item_Risk.objects.using(db_name).bulk_create(risks, batch_size=batch_size)
+        Policy_Main_Product_Item_Question.objects.using(db_name).bulk_create(questions, batch_size=batch_size)
+        Policy_Main_Schedule.objects.using(db_name).bulk_create(schedules, batch_size=batch_size)
+        Policy_Main_Files.objects.using(db_name).bulk_create(files, batch_size=batch_size)
+
+        chunk_counts.update({
+            'Policy_Main': len(policies),
+            'Policy_Main_Product': len(products),
+            'Policy_Main_Product_Item': len(items),
+            'Policy_Main_Product_Item_Risk': len(risks),
+            'Policy_Main_Product_Item_Question': len(questions),
+            'Policy_Main_Schedule': len(schedules),
+            'Policy_Main_Files': len(files),
+        })
+    # Only counted once the chunk is committed
+    for table, count in chunk_counts.items():
+        counts[table] += count
+
+
+def import_policies(records, db_name=None, user_id=None, dry_run=False, progress=None):
+    """
+    Validate and insert policy records. Invalid records are reported and
+    skipped; valid ones are inserted in chunks of POLICY_IMPORT_CHUNK_SIZE
+    policies, each chunk in its own transaction. progress(processed, total),
+    if given, is called after every chunk.
+
+    Returns a summary dict: total / imported / failed counts, per-row errors
+    ({'row', 'policy_no', 'errors'}), rows inserted per table, elapsed seconds
+    and policies per second.
+    """
+    db_name = ensure_tenant_database(db_name or get_current_db())
+    started = time.monotonic()
+    refs = ReferenceData(db_name, records)
+
+    row_errors = []
+    pending = []  # (row number, plan)
+    seen_policy_nos = set()
+    for row, record in enumerate(records, start=1):
+        plan, errors = validate_record(record, refs, seen_policy_nos)
+        if errors:
+            policy_no = _text(record.get('policy_no')) if isinstance(record, dict) else ''
+            row_errors.append({'row': row, 'policy_no': policy_no, 'errors': errors})
+        else:
+            pending.append((row, plan))
+
+    counts = dict.fromkeys((
+        'Policy_Main', 'Policy_Main_Product', 'Policy_Main_Product_Item', 'Policy_Main_Product_Item_Risk',
+        'Policy_Main_Product_Item_Question', 'Policy_Main_Schedule', 'Policy_Main_Files',
+    ), 0)
+    chunk_size = get_import_chunk_size()
+    if not dry_run:
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            try:
+                _insert_chunk(db_name, [plan for _, plan in chunk], user_id, counts)
+            except DatabaseError as e:
+                logger.error(f'Policy import chunk starting at row {chunk[0][0]} failed: {str(e)}')
+                message = ' '.join(str(e).split()) or e.__class__.__name__
+                row_errors.extend(
+                    {'row': row, 'policy_no': plan['policy']['PolicyNo'], 'errors': [f'Database error: {message}']}
+                    for row, plan in chunk
+                )
+            if progress is not None:
+                progress(min(start + chunk_size, len(pending)), len(pending))
+
+    elapsed = time.monotonic() - started
+    imported = len(pending) if dry_run else counts['Policy_Main']
+    row_errors.sort(key=lambda error: error['row'])
+    return {
+        'total': len(records),
+        'imported': imported,
+        'failed': len(row_errors),
+        'dry_run': dry_run,
+        'errors': row_errors,
+        'rows': counts,
+        'elapsed_seconds': round(elapsed, 3),
+        'policies_per_second': round(imported / elapsed, 1) if elapsed > 0 else None,
+    }
@@ -0,0 +1,99 @@
+"""
+Result cache for the ledger reports (trial balance, Y balance, receivable /
+payable balance, currency balance).
+
+The SQL report functions scan every cash, inventory and asset document of a
+tenant, so the same month-end report is recomputed on every view. Results are
+cached per tenant under (function name, parameters, ledger version). The
+ledger version is a per-tenant counter in the shared tenant cache that is
+bumped whenever data feeding the reports changes:
+
+- model saves/deletes of documents, details, beginning balances and the
+  reference rows the reports join (see core.signals)
+- bulk writes and SQL postings that bypass model signals (bulk_create /
+  bulk_update, depreciation, closing, cost adjustment), which call
+  bump_ledger_version() explicitly
+
+Bumping the version makes every older entry unreachable; stale entries simply
+expire through the cache timeout.
+"""
+import hashlib
+import threading
+
+from django.db import connections, transaction
+
+from .cache import tenant_cache
+from .db_router import ensure_tenant_database
+from .thread_local import get_current_db
+
+LEDGER_VERSION_KEY = 'ledger_version'
+REPORT_CACHE_TIMEOUT = 24 * 3600
+
+_on_commit_callbacks = {}
+_callbacks_lock = threading.Lock()
+
+
+def ledger_version(db_name=None):
+    """Return the current ledger version of a tenant database."""
+    return tenant_cache.version(LEDGER_VERSION_KEY, db_name=db_name or get_current_db())
+
+
+def bump_ledger_version(db_name=None):
+    """Invalidate every cached report of a tenant database."""
+    return tenant_cache.bump_version(LEDGER_VERSION_KEY, db_name=db_name or get_current_db())
+
+
+def bump_ledger_version_on_commit(db_name=None):
+    """
+    Bump the ledger version once the current transaction commits (immediately
+    in autocommit mode). Repeated calls inside one transaction, e.g. the
+    post_delete signal of every row of a queryset delete, bump only once.
+    """
+    db_name = db_name or get_current_db()
+    connection = connections[db_name]
+    if not connection.in_atomic_block:
+        bump_ledger_version(db_name)
+        return
+    callback = _on_commit_callback(db_name)
+    if any(entry[1] is callback for entry in connection.run_on_commit):
+        return
+    transaction.on_commit(callback, using=db_name)
+
+
+def _on_commit_callback(db_name):
+    with _callbacks_lock:
+        callback = _on_commit_callbacks.get(db_name)
+        if callback is None:
+            def callback():
+                bump_ledger_version(db_name)
+            _on_commit_callbacks[db_name] = callback
+        return callback
+
+
+def _report_key(function_name, params, version):
+    digest = hashlib.sha1(repr(tuple(params)).encode('utf-8')).hexdigest()
+    return f'report:{function_name}:{version}:{digest}'
+
+
+def get_report(function_name, params, version, db_name=None):
+    """Return the cached result for a report call at a ledger version, or None."""
+    return tenant_cache.get(_report_key(function_name, params, version), db_name=db_name)
+
+
+def set_report(function_name, params, version, result, db_name=None):
+    tenant_cache.set(_report_key(function_name, params, version), result, REPORT_CACHE_TIMEOUT, db_name=db_name)
+
+
+def cached_report(function_name, params, compute, db_name=None):
+    """
+    Return the result of compute() for a report call, served from the cache
+    while the tenant ledger is unchanged. The version is read before computing,
+    so a write that lands during the computation leaves the entry unreachable.
+    """
+    db_name = ensure_tenant_database(db_name or get_current_db())
+    version = ledger_version(db_name)
+    result = get_report(function_name, params, version, db_name=db_name)
+    if result is None:
+        result = compute()
+        set_report(function_name, params, version, result, db_name=db_name)
+    return result
@@ -0,0 +1,59 @@
+"""
+Model signal handlers that keep tenant-scoped caches in sync with the database.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .constants import invalidate_constants
+from .models import (
+    Ast_Beginning_Balance, Ast_Document, Ast_Document_Detail, AstDepreciationExpense,
+    Cash_Document, Cash_DocumentDetail, CashBeginningBalance, Inv_Beginning_Balance,
+    Inv_Document, Inv_Document_Detail, Ref_Account, Ref_Account_Type,
+    Ref_Asset_Depreciation_Account, Ref_Constant, Ref_Currency, Ref_Item,
+    Ref_Policy_Template, Ref_Product, Ref_Risk, Ref_Template_Product,
+    Ref_Template_Product_Item, Ref_Template_Product_Item_Risk, RefClient,
+    St_Balance, St_CashFlow, St_Income,
+)
+from .report_cache import bump_ledger_version_on_commit
+from .template_cache import invalidate_template_tree
+
+# Tables read by the ledger report functions cached in core.report_cache
+LEDGER_MODELS = [
+    Cash_Document, Cash_DocumentDetail, CashBeginningBalance,
+    Inv_Document, Inv_Document_Detail, Inv_Beginning_Balance,
+    Ast_Document, Ast_Document_Detail, Ast_Beginning_Balance, AstDepreciationExpense,
+    Ref_Account, Ref_Account_Type, Ref_Asset_Depreciation_Account, RefClient, Ref_Currency,
+    St_Balance, St_Income, St_CashFlow,
+]
+
+# Tables serialized into the template tree cached in core.template_cache
+TEMPLATE_TREE_MODELS = [
+    Ref_Policy_Template, Ref_Template_Product, Ref_Template_Product_Item, Ref_Template_Product_Item_Risk,
+    Ref_Product, Ref_Item, Ref_Risk,
+]
+
+
+@receiver([post_save, post_delete], sender=Ref_Constant)
+def ref_constant_changed(sender, instance, using, **kwargs):
+    """Invalidate cached constants of the database the row was written to."""
+    invalidate_constants(using)
+
+
+def ledger_changed(sender, instance, using, **kwargs):
+    """Invalidate cached report results of the database the row was written to."""
+    bump_ledger_version_on_commit(using)
+
+
+for ledger_model in LEDGER_MODELS:
+    post_save.connect(ledger_changed, sender=ledger_model, dispatch_uid=f'ledger_changed_{ledger_model.__name__}')
+    post_delete.connect(ledger_changed, sender=ledger_model, dispatch_uid=f'ledger_changed_{ledger_model.__name__}')
+
+
+def template_tree_changed(sender, instance, using, **kwargs):
+    """Invalidate the cached template tree of the database the row was written to."""
+    invalidate_template_tree(using)
+
+
+for tree_model in TEMPLATE_TREE_MODELS:
+    post_save.connect(template_tree_changed, sender=tree_model, dispatch_uid=f'template_tree_changed_{tree_model.__name__}')
+    post_delete.connect(template_tree_changed, sender=tree_model, dispatch_uid=f'template_tree_changed_{tree_model.__name__}')
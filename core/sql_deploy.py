@@ -0,0 +1,142 @@
+"""
+Versioned deployment of the report / calculation SQL functions.
+
+Every core/management/sql/*.sql file is hashed (sha256 of its content) and
+installed on a tenant database only when that hash differs from the one
+recorded in the tenant's sql_function_version table. Each file runs in its
+own transaction together with its version row, so a tenant never records a
+version it did not fully install. Tenants are processed concurrently by a
+bounded thread pool (see the deploy_sql_functions command).
+
+Files are installed in name order; balance_snapshot.sql therefore precedes
+the calculate_* functions that read its tables.
+"""
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from .db_router import ensure_tenant_database
+
+SQL_DIR = os.path.join(settings.BASE_DIR, 'core', 'management', 'sql')
+VERSION_TABLE = 'sql_function_version'
+
+CREATE_VERSION_TABLE = f'''
+    CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (
+        "FileName" VARCHAR(100) PRIMARY KEY,
+        "Sha256" CHAR(64) NOT NULL,
+        "InstalledDate" TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+    )
+'''
+
+UPSERT_VERSION = f'''
+    INSERT INTO {VERSION_TABLE} ("FileName", "Sha256", "InstalledDate")
+    VALUES (%s, %s, NOW())
+    ON CONFLICT ("FileName") DO UPDATE
+    SET "Sha256" = EXCLUDED."Sha256", "InstalledDate" = EXCLUDED."InstalledDate"
+'''
+
+
+def get_deploy_workers():
+    return max(1, getattr(settings, 'SQL_DEPLOY_WORKERS', 8))
+
+
+def load_sql_files(names=None, sql_dir=None):
+    """
+    Return [{'name', 'sha256', 'sql'}, ...] for the SQL files in name order,
+    optionally limited to the given file names. Raises ValueError for unknown names.
+    """
+    sql_dir = sql_dir or SQL_DIR
+    available = sorted(name for name in os.listdir(sql_dir) if name.endswith('.sql'))
+    if names:
+        unknown = sorted(set(names) - set(available))
+        if unknown:
+            raise ValueError(f'Unknown SQL file(s): {", ".join(unknown)}')
+        available = [name for name in available if name in set(names)]
+
+    files = []
+    for name in available:
+        with open(os.path.join(sql_dir, name), 'rb') as source:
+            content = source.read()
+        files.append({
+            'name': name,
+            'sha256': hashlib.sha256(content).hexdigest(),
+            'sql': content.decode('utf-8'),
+        })
+    return files
+
+
+def installed_versions(db_name, create=True):
+    """Return {file name: sha256} recorded on a tenant database."""
+    with connections[db_name].cursor() as cursor:
+        if create:
+            cursor.execute(CREATE_VERSION_TABLE)
+        else:
+            cursor.execute('SELECT to_regclass(%s)', [VERSION_TABLE])
+            if cursor.fetchone()[0] is None:
+                return {}
+        cursor.execute(f'SELECT "FileName", "Sha256" FROM {VERSION_TABLE}')
+        return dict(cursor.fetchall())
+
+
+def deploy_tenant(db_name, files, force=False, dry_run=False):
+    """
+    Install the changed SQL files on one tenant database.
+
+    Stops at the first failing file (later files may depend on it) and returns
+    {'db_name', 'installed', 'unchanged', 'failed', 'error', 'elapsed_seconds'}.
+    """
+    started = time.perf_counter()
+    result = {'db_name': db_name, 'installed': [], 'unchanged': 0, 'failed': None, 'error': None}
+    ensure_tenant_database(db_name)
+    try:
+        versions = installed_versions(db_name, create=not dry_run)
+        for sql_file in files:
+            if not force and versions.get(sql_file['name']) == sql_file['sha256']:
+                result['unchanged'] += 1
+                continue
+            if not dry_run:
+                try:
+                    with transaction.atomic(using=db_name):
+                        with connections[db_name].cursor() as cursor:
+                            # No parameters: the file is sent as-is, '%' needs no escaping
+                            cursor.execute(sql_file['sql'])
+                            cursor.execute(UPSERT_VERSION, [sql_file['name'], sql_file['sha256']])
+                except Exception as e:
+                    result['failed'] = sql_file['name']
+                    result['error'] = str(e).strip()
+                    break
+            result['installed'].append(sql_file['name'])
+    except Exception as e:
+        result['error'] = str(e).strip()
+    finally:
+        connections[db_name].close()
+    result['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def deploy_tenants(db_names, files, workers=None, force=False, dry_run=False, progress=None):
+    """
+    Run deploy_tenant for every database with at most `workers` tenants in
+    flight. progress(result) is called as each tenant finishes; the results are
+    returned in db_names order.
+    """
+    workers = min(workers or get_deploy_workers(), max(1, len(db_names)))
+    # Register the connection aliases up front instead of from the worker threads
+    for db_name in db_names:
+        ensure_tenant_database(db_name)
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sql-deploy') as executor:
+        futures = {
+            executor.submit(deploy_tenant, db_name, files, force, dry_run): db_name
+            for db_name in db_names
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            if progress:
+                progress(result)
+    return [results[db_name] for db_name in db_names]
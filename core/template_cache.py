@@ -0,0 +1,45 @@
+"""
+Tenant cache for the policy template tree (template -> product -> item -> risk).
+
+The policy entry UI requests the full tree repeatedly while it only changes
+when templates are edited. The serialized tree is cached per tenant under a
+tree version that is bumped (on commit) whenever a template table or one of
+the product / item / risk rows whose names the tree shows is saved or deleted
+(see core.signals). The version doubles as the ETag of the tree endpoint, so a
+conditional request is answered from the cache counter alone.
+"""
+from functools import partial
+
+from django.db import transaction
+
+from .cache import tenant_cache
+from .thread_local import get_current_db
+
+TEMPLATE_TREE_VERSION_KEY = 'template_tree_version'
+TEMPLATE_TREE_TIMEOUT = 24 * 3600
+
+
+def template_tree_version(db_name=None):
+    return tenant_cache.version(TEMPLATE_TREE_VERSION_KEY, db_name=db_name or get_current_db())
+
+
+def template_tree_etag(version):
+    return f'"template-tree-{version}"'
+
+
+def get_template_tree(version, db_name=None):
+    """Return the cached serialized tree for a tree version, or None."""
+    return tenant_cache.get(f'template_tree:{version}', db_name=db_name)
+
+
+def set_template_tree(version, tree, db_name=None):
+    tenant_cache.set(f'template_tree:{version}', tree, TEMPLATE_TREE_TIMEOUT, db_name=db_name)
+
+
+def invalidate_template_tree(db_name=None):
+    """Bump the tree version of a tenant once the current transaction commits."""
+    db_name = db_name or get_current_db()
+    transaction.on_commit(
+        partial(tenant_cache.bump_version, TEMPLATE_TREE_VERSION_KEY, db_name=db_name),
+        using=db_name
+    )
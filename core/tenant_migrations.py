@@ -0,0 +1,91 @@
+"""
+Concurrent core migrations across the tenant databases of databases.txt.
+
+Each tenant is migrated in its own spawned worker process (the migration
+executor and the connection handler are not meant to be shared between
+threads), with at most `workers` tenants in flight. pending_migrations() is
+the plan / dry-run view: the core migrations a tenant has not applied yet.
+"""
+import io
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
+
+from .db_router import ensure_tenant_database
+
+APP_LABEL = 'core'
+
+
+def get_migrate_workers():
+    return max(1, getattr(settings, 'MIGRATE_TENANTS_WORKERS', 4))
+
+
+def pending_migrations(db_name):
+    """Return the names of the core migrations not yet applied on a tenant database."""
+    ensure_tenant_database(db_name)
+    executor = MigrationExecutor(connections[db_name])
+    targets = [key for key in executor.loader.graph.leaf_nodes() if key[0] == APP_LABEL]
+    return [migration.name for migration, backwards in executor.migration_plan(targets) if not backwards]
+
+
+def migrate_tenant(db_name, plan=False):
+    """
+    Apply (or with plan=True only list) the pending core migrations of one
+    tenant. Returns {'db_name', 'migrations', 'error', 'output', 'elapsed_seconds'}.
+    """
+    started = time.perf_counter()
+    result = {'db_name': db_name, 'migrations': [], 'error': None, 'output': ''}
+    output = io.StringIO()
+    try:
+        result['migrations'] = pending_migrations(db_name)
+        if result['migrations'] and not plan:
+            call_command(
+                'migrate', APP_LABEL, database=db_name, interactive=False,
+                verbosity=1, stdout=output, stderr=output
+            )
+    except Exception as e:
+        result['error'] = str(e).strip()
+    finally:
+        connections[db_name].close()
+    result['output'] = output.getvalue()
+    result['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def _init_worker():
+    # Spawned workers start from a clean interpreter without inherited connections
+    import django
+    django.setup()
+
+
+def migrate_tenants(db_names, workers=None, plan=False, progress=None):
+    """
+    Run migrate_tenant for every database in a bounded process pool.
+    progress(result) is called as each tenant finishes; the results are
+    returned in db_names order.
+    """
+    workers = min(workers or get_migrate_workers(), max(1, len(db_names)))
+    results = {}
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+    ) as executor:
+        futures = {executor.submit(migrate_tenant, db_name, plan): db_name for db_name in db_names}
+        for future in as_completed(futures):
+            db_name = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker process itself died (e.g. killed); the tenant state is unknown
+                result = {'db_name': db_name, 'migrations': [], 'error': f'Worker failed: {e}',
+                          'output': '', 'elapsed_seconds': None}
+            results[db_name] = result
+            if progress:
+                progress(result)
+    return [results[db_name] for db_name in db_names]
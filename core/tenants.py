@@ -0,0 +1,109 @@
+"""
+Tenant registry backed by databases.txt.
+
+The file is parsed once per process and re-parsed only when its mtime changes,
+so lookups by company code or database name are plain dictionary hits instead
+of re-reading the file on every request.
+"""
+import os
+import threading
+
+from django.conf import settings
+
+DEFAULT_DATABASES = [
+    {'db_name': 'silicon4', 'description': 'Default Database', 'company_code': 'default'}
+]
+
+
+class TenantRegistry:
+    """In-memory index of databases.txt, hot-reloaded on file change."""
+
+    def __init__(self, path=None):
+        self._path = path
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._mtime = None
+        self._databases = []
+        self._by_company = {}
+        self._by_db_name = {}
+        self._by_company_db = {}
+
+    @property
+    def path(self):
+        return self._path or os.path.join(settings.BASE_DIR, 'databases.txt')
+
+    def all(self):
+        """Return every registered database entry."""
+        self._refresh()
+        return list(self._databases)
+
+    def for_company(self, company_code):
+        """Return the database entries registered for a company code."""
+        self._refresh()
+        return list(self._by_company.get(company_code, []))
+
+    def get(self, db_name, company_code=None):
+        """Return the entry for a database name (optionally scoped to a company) or None."""
+        self._refresh()
+        if company_code is None:
+            return self._by_db_name.get(db_name)
+        return self._by_company_db.get((company_code, db_name))
+
+    def db_names(self):
+        """Return the distinct tenant database names in file order."""
+        self._refresh()
+        return list(self._by_db_name.keys())
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self._loaded and mtime == self._mtime:
+            return
+        with self._lock:
+            if self._loaded and mtime == self._mtime:
+                return
+            databases = self._load() if mtime is not None else [dict(db) for db in DEFAULT_DATABASES]
+            self._index(databases)
+            self._mtime = mtime
+            self._loaded = True
+
+    def _load(self):
+        databases = []
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    line = line.strip()
+                    if line and not line.startswith('#'):
+                        # Parse CSV format: company_code,database_name,description
+                        parts = line.split(',')
+                        if len(parts) >= 2:
+                            db_company_code = parts[0].strip()
+                            db_name = parts[1].strip()
+                            description = parts[2].strip().strip('"') if len(parts) > 2 else db_name
+                            databases.append({
+                                'db_name': db_name,
+                                'description': description,
+                                'company_code': db_company_code
+                            })
+        except FileNotFoundError:
+            databases = [dict(db) for db in DEFAULT_DATABASES]
+        return databases
+
+    def _index(self, databases):
+        by_company = {}
+        by_db_name = {}
+        by_company_db = {}
+        for db in databases:
+            by_company.setdefault(db['company_code'], []).append(db)
+            by_db_name.setdefault(db['db_name'], db)
+            by_company_db[(db['company_code'], db['db_name'])] = db
+        # Swap in complete indexes so lock-free readers never see a partial state
+        self._by_company = by_company
+        self._by_db_name = by_db_name
+        self._by_company_db = by_company_db
+        self._databases = databases
+
+
+tenant_registry = TenantRegistry()
@@ -0,0 +1,208 @@
+import io
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from django.db import connections, models
+from django.test import SimpleTestCase, TestCase
+
+from core.ledger_indexes import LEDGERS, explain_index_names, ledger_checks
+from core.document_sequence import document_sequences
+from core.models import Ref_Account, Ref_Document_Counter, Ref_Document_Type
+from core.policy_batch import MANIFEST_NAME, iter_batch_zip
+from core.policy_import import validate_record
+from core.thread_local import clear_current_db, get_current_db, set_current_db
+
+DB = 'insurance'
+
+
+class Fixtures:
+    """
+    Minimal valid rows for the test database: required fields get a filler
+    value and required foreign keys point at rows created the same way.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.counter = 0
+        self.instances = {}
+
+    def values(self, model):
+        values = {}
+        for field in model._meta.concrete_fields:
+            if field.null or field.has_default() or getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                continue
+            if isinstance(field, models.AutoField):
+                continue
+            self.counter += 1
+            if field.is_relation:
+                values[field.attname] = self.instance(field.related_model).pk
+            elif isinstance(field, (models.CharField, models.TextField)):
+                values[field.attname] = str(self.counter)[-(field.max_length or 20):]
+            elif isinstance(field, models.BooleanField):
+                values[field.attname] = False
+            elif isinstance(field, (models.DecimalField, models.FloatField)):
+                values[field.attname] = Decimal('0')
+            elif isinstance(field, models.IntegerField):
+                values[field.attname] = self.counter
+            elif isinstance(field, models.DateTimeField):
+                values[field.attname] = datetime(2000, 1, 1)
+            elif isinstance(field, models.DateField):
+                values[field.attname] = date(2000, 1, 1)
+            else:
+                raise TypeError(f'No filler value for {model.__name__}.{field.name}')
+        return values
+
+    def instance(self, model):
+        """One shared row per referenced model."""
+        if model not in self.instances:
+            self.instances[model] = model.objects.using(self.db).create(**self.values(model))
+        return self.instances[model]
+
+
+class LedgerIndexPlanTests(TestCase):
+    """
+    The account statement and period total query shapes must keep using the
+    ledger indexes of migration 0040 (see the check_ledger_indexes command).
+    """
+    databases = {DB}
+
+    DOCUMENTS = 3000
+    ACCOUNTS = 40
+    START = date(2000, 1, 1)
+
+    @classmethod
+    def setUpTestData(cls):
+        fixtures = Fixtures(DB)
+        cls.account_ids = [
+            fixtures.instance(Ref_Account).pk
+        ] + [
+            Ref_Account.objects.using(DB).create(**fixtures.values(Ref_Account)).pk
+            for _ in range(cls.ACCOUNTS - 1)
+        ]
+        for header_model, detail_model, _, _ in LEDGERS:
+            header_values = fixtures.values(header_model)
+            headers = header_model.objects.using(DB).bulk_create([
+                header_model(**dict(header_values, DocumentDate=cls.START + timedelta(days=offset)))
+                for offset in range(cls.DOCUMENTS)
+            ], batch_size=1000)
+            detail_values = fixtures.values(detail_model)
+            detail_model.objects.using(DB).bulk_create([
+                detail_model(**dict(
+                    detail_values,
+                    DocumentId_id=header.pk,
+                    AccountId_id=cls.account_ids[(offset * 2 + line) % cls.ACCOUNTS],
+                    DebitAmount=Decimal('1'),
+                    CreditAmount=Decimal('0'),
+                ))
+                for offset, header in enumerate(headers)
+                for line in range(2)
+            ], batch_size=1000)
+        with connections[DB].cursor() as cursor:
+            for header_model, detail_model, _, _ in LEDGERS:
+                cursor.execute(f'ANALYZE {header_model._meta.db_table}')
+                cursor.execute(f'ANALYZE {detail_model._meta.db_table}')
+
+    def test_ledger_query_shapes_use_their_indexes(self):
+        date_to = self.START + timedelta(days=self.DOCUMENTS - 1)
+        with connections[DB].cursor() as cursor:
+            for ledger in LEDGERS:
+                for label, sql, params, expected_index in ledger_checks(ledger, self.account_ids[0], self.START, date_to):
+                    with self.subTest(table=ledger[1]._meta.db_table, shape=label):
+                        _, used = explain_index_names(cursor, sql, params)
+                        self.assertIn(expected_index, used)
+
+
+class PolicyBatchTenantTests(SimpleTestCase):
+    """
+    The batch ZIP is streamed after DatabaseSelectionMiddleware has cleared
+    the request's tenant; documents must still render in that tenant.
+    """
+    TENANT = 'tenant_batch_test'
+
+    def render(self, policy_id):
+        self.rendered_in.append((policy_id, get_current_db()))
+        raise FileNotFoundError('no template')
+
+    def consume_after_request(self, **kwargs):
+        set_current_db(self.TENANT)
+        stream = iter_batch_zip([(1, 'P-1'), (2, 'P-2')], self.TENANT, **kwargs)
+        clear_current_db()
+        data = b''.join(stream)
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            return archive.read(MANIFEST_NAME).decode('utf-8-sig')
+
+    def setUp(self):
+        self.rendered_in = []
+        patches = [
+            mock.patch('core.word_generator.render_policy_word_document', self.render),
+            mock.patch('core.policy_batch.ensure_tenant_database', lambda db_name: db_name),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(clear_current_db)
+
+    def test_pool_renders_in_request_tenant(self):
+        # Threads instead of spawned processes, so the render stub is visible to the workers
+        with mock.patch('core.policy_batch._new_executor', lambda workers: ThreadPoolExecutor(workers)):
+            manifest = self.consume_after_request(workers=2)
+        self.assertEqual(sorted(self.rendered_in), [(1, self.TENANT), (2, self.TENANT)])
+        self.assertEqual(manifest.count('no template'), 2)
+
+    def test_in_process_renders_in_request_tenant(self):
+        manifest = self.consume_after_request(in_process=True)
+        self.assertEqual(self.rendered_in, [(1, self.TENANT), (2, self.TENANT)])
+        self.assertEqual(manifest.count('no template'), 2)
+        self.assertEqual(get_current_db(), 'insurance')
+
+
+class PolicyImportDecimalTests(SimpleTestCase):
+    """Decimals that the database would reject fail their own record, not the insert chunk."""
+
+    refs = SimpleNamespace(
+        client_ids={1}, user_ids={1}, template_ids={1}, currency_ids={1}, branch_ids={1}, channel_ids={1},
+        product_ids={1}, item_ids={1}, risk_ids={1}, question_ids=set(), existing_policy_nos=set(),
+    )
+
+    def record(self, risk_percent):
+        return {
+            'policy_no': 'P-1', 'client_id': 1, 'agent_id': 1, 'policy_template_id': 1,
+            'begin_date': '2024-01-01', 'end_date': '2024-12-31', 'currency_id': 1,
+            'agent_branch_id': 1, 'agent_channel_id': 1,
+            'products': [{'productId': 1, 'items': [{'itemId': 1, 'risks': [{'riskId': 1, 'riskPercent': risk_percent}]}]}],
+        }
+
+    def risk_percent_errors(self, value):
+        _, errors = validate_record(self.record(value), self.refs, set())
+        return errors
+
+    def test_in_range_value_is_rounded_to_the_field(self):
+        plan, errors = validate_record(self.record('12.34567'), self.refs, set())
+        self.assertEqual(errors, [])
+        self.assertEqual(plan['products'][0]['items'][0]['risks'][0]['RiskPercent'], Decimal('12.346'))
+
+    def test_out_of_range_values_are_rejected(self):
+        # RiskPercent is max_digits=6, decimal_places=3
+        for value in ('1234', '999.9999', '1e30', 'NaN', 'Infinity', '-inf'):
+            with self.subTest(value=value):
+                errors = self.risk_percent_errors(value)
+                self.assertEqual(len(errors), 1)
+                self.assertIn('riskPercent', errors[0])
+
+
+class DocumentSequenceSeedTests(TestCase):
+    databases = {DB}
+
+    def test_seed_keeps_a_long_legacy_prefix(self):
+        fixtures = Fixtures(DB)
+        document_type = fixtures.instance(Ref_Document_Type)
+        # DocumentNo is max_length=10, so a legacy prefix can be 9 characters
+        Ref_Document_Counter.objects.using(DB).create(
+            **dict(fixtures.values(Ref_Document_Counter), DocumentTypeId=document_type, DocumentNo='INVOICEAB7')
+        )
+        self.assertEqual(document_sequences.peek(document_type.pk, DB), 'INVOICEAB0008')
+        self.assertEqual(document_sequences.reserve(document_type.pk, 2, DB), ['INVOICEAB0008', 'INVOICEAB0009'])
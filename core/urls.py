@@ -277,6 +277,7 @@ urlpatterns = [
     
     # Insurance Policy List
     path('policies/', views.policy_list, name='policy_list'),
+    path('api/policy/<int:policy_id>/details/', views.api_policy_details, name='api_policy_details'),
     path('policies/<int:policy_id>/update/', views.policy_update, name='policy_update'),
     path('policies/<int:policy_id>/delete/', views.policy_delete, name='policy_delete'),
     path('api/templates/upload-file/', views.api_template_upload_file, name='api_template_upload_file'),
@@ -290,6 +291,8 @@ urlpatterns = [
     # Insurance Policy
     path('policies/create/', views.policy_create, name='policy_create'),
     path('policies/<int:policy_id>/generate-word/', views.policy_generate_word, name='policy_generate_word'),
+    path('policies/generate-word/batch/', views.policy_generate_word_batch, name='policy_generate_word_batch'),
+    path('api/policies/import/', views.api_policy_import, name='api_policy_import'),
     path('api/policy-item/<int:policy_main_product_item_id>/questions/', views.api_policy_item_questions, name='api_policy_item_questions'),
     path('api/policy-item/<int:policy_main_product_item_id>/risks/', views.api_policy_item_risks, name='api_policy_item_risks'),
     path('api/policy/<int:policy_id>/edit-data/', views.api_policy_edit_data, name='api_policy_edit_data'),
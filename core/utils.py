@@ -2,39 +2,16 @@ import os
 from django.conf import settings
 from django.utils import timezone
 from datetime import date
+from .tenants import tenant_registry
 
 def get_available_databases(company_code=None):
     """
-    Read available databases from databases.txt file
+    Return available databases from databases.txt (via the cached tenant registry)
     If company_code is provided, return only databases for that company
     """
-    databases = []
-    db_file_path = os.path.join(settings.BASE_DIR, 'databases.txt')
-    
-    try:
-        with open(db_file_path, 'r') as file:
-            for line in file:
-                line = line.strip()
-                if line and not line.startswith('#'):
-                    # Parse CSV format: company_code,database_name,description
-                    parts = line.split(',')
-                    if len(parts) >= 2:
-                        db_company_code = parts[0].strip()
-                        db_name = parts[1].strip()
-                        description = parts[2].strip().strip('"') if len(parts) > 2 else db_name
-                        
-                        # If company_code is specified, filter by it
-                        if company_code is None or db_company_code == company_code:
-                            databases.append({
-                                'db_name': db_name,
-                                'description': description,
-                                'company_code': db_company_code
-                            })
-    except FileNotFoundError:
-        # If file doesn't exist, return default database
-        databases = [{'db_name': 'silicon4', 'description': 'Default Database', 'company_code': 'default'}]
-    
-    return databases
+    if company_code is None:
+        return tenant_registry.all()
+    return tenant_registry.for_company(company_code)
 
 def set_database(db_name):
     """
@@ -49,10 +26,9 @@ def get_database_description(company_code, db_name):
     """
     Get the description for a specific database and company code
     """
-    databases = get_available_databases(company_code)
-    for db in databases:
-        if db['db_name'] == db_name:
-            return db['description']
+    db = tenant_registry.get(db_name, company_code)
+    if db is not None:
+        return db['description']
     return db_name  # Fallback to database name if not found
 
 def check_dep_expense_after_date(document_date):
@@ -3,7 +3,7 @@ from django.template.loader import render_to_string
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib import messages
 from django.urls import reverse
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
@@ -20,9 +20,15 @@ from django.conf import settings
 from .models import Ref_Account_Type, Ref_Account, RefClientType, RefClient, Ref_Client_Bank, Ref_Currency, RefInventory, Ref_Document_Type, Ref_Document_Counter, Ref_CashFlow, Ref_Contract, Ref_Warehouse, Cash_Document, Cash_DocumentDetail, Inv_Document, Inv_Document_Item, Inv_Document_Detail, Ref_Asset_Type, RefAsset, Ref_Asset_Card, CashBeginningBalance, Inv_Beginning_Balance, Ast_Beginning_Balance, Ast_Document, Ast_Document_Detail, Ast_Document_Item, Ref_Asset_Depreciation_Account, Ref_Period, Ref_Template, Ref_Template_Detail, AstDepreciationExpense, St_Balance, St_Income, St_CashFlow, Ref_Product_Group, Ref_Product_Type, Ref_Product, Ref_Risk_Type, Ref_Risk, Ref_Item_Type, Ref_Item, Ref_Item_Question, Ref_Policy_Template, Ref_Template_Product, Ref_Template_Product_Item, Ref_Template_Product_Item_Risk, Ref_Template_Account, Ref_Template_Design, Ref_Branch, Ref_Channel, Ref_Branch_User, Ref_Ins_Client, Policy_Main, Policy_Main_Product, Policy_Main_Product_Item, Policy_Main_Product_Item_Risk, Policy_Main_Product_Item_Question, Policy_Main_Files, Policy_Main_Schedule, Policy_Main_Coinsurance
 
 logger = logging.getLogger(__name__)
-from django.db import connection, connections, transaction
+from django.db import connection, connections, transaction, ProgrammingError
 from .forms import Ref_AccountForm, RefClientForm, Ref_Client_BankForm, RefInventoryForm, CashDocumentForm, InvDocumentForm, RefAssetForm, Ref_Asset_CardForm, InvBeginningBalanceForm, AstDocumentForm, Ref_Asset_Depreciation_AccountForm, Ref_TemplateForm, Ref_Template_DetailForm, RefInsClientForm
 from .utils import get_available_databases, set_database, check_dep_expense_after_date
+from .tenants import tenant_registry
+from .constants import get_constant
+from .document_sequence import document_sequences
+from .balance_snapshot import refresh_balance_snapshot
+from .report_cache import bump_ledger_version, bump_ledger_version_on_commit, cached_report, get_report, ledger_version, set_report
+from .report_export import get_export_format, iter_export_rows, streaming_export_response
 from .thread_local import get_current_db
 from .error_handling import (
     handle_errors, handle_ajax_errors, handle_form_errors, 
@@ -77,10 +83,7 @@ def custom_login(request):
             password = form.cleaned_data.get('password')
             
             # Validate that the selected database belongs to the company code
-            available_databases = get_available_databases(company_code)
-            db_names = [db['db_name'] for db in available_databases]
-            
-            if selected_db not in db_names:
+            if tenant_registry.get(selected_db, company_code) is None:
                 form.add_error(None, 'Selected database is not valid for this company')
             else:
                 # Store selected database and company code in session
@@ -1886,6 +1889,12 @@ def cashdocument_create(request):
                     if hasattr(cash_document, 'Description') and cash_document.Description:
                         cash_document.Description = cash_document.Description.encode('utf-8').decode('utf-8')
                     
+                    # Confirm the previewed DocumentNo atomically (re-allocated if taken meanwhile)
+                    if cash_document.DocumentTypeId_id:
+                        cash_document.DocumentNo = document_sequences.claim(
+                            cash_document.DocumentTypeId_id, cash_document.DocumentNo
+                        )
+                    
                     cash_document.save()
                     
                     # Save DocumentNo to Ref_Document_Counter table
@@ -1928,8 +1937,8 @@ def cashdocument_create(request):
     vat_accounts = {}
     try:
         from .models import Ref_Constant, Ref_Account
-        vat_constant_9 = Ref_Constant.objects.get(ConstantID=9)   # Receivable VAT
-        vat_constant_10 = Ref_Constant.objects.get(ConstantID=10) # Payable VAT
+        vat_constant_9 = get_constant(9)   # Receivable VAT
+        vat_constant_10 = get_constant(10) # Payable VAT
         
         # Convert ConstantName to integer to get AccountId
         receivable_vat_account_id = int(vat_constant_9.ConstantName)   # Receivable (ConstantID=9)
@@ -2057,8 +2066,8 @@ def cashdocument_update(request, pk):
     vat_accounts = {}
     try:
         from .models import Ref_Constant, Ref_Account
-        vat_constant_9 = Ref_Constant.objects.get(ConstantID=9)   # Receivable VAT
-        vat_constant_10 = Ref_Constant.objects.get(ConstantID=10) # Payable VAT
+        vat_constant_9 = get_constant(9)   # Receivable VAT
+        vat_constant_10 = get_constant(10) # Payable VAT
         
         # Convert ConstantName to integer to get AccountId
         receivable_vat_account_id = int(vat_constant_9.ConstantName)   # Receivable (ConstantID=9)
@@ -2254,6 +2263,58 @@ def cashdocumentdetail_delete(request, pk):
 
 
 
+# Columns written by bulk_update when a cash document detail row changes
+CASH_DETAIL_BULK_FIELDS = [
+    'AccountId', 'ClientId', 'CurrencyId', 'CurrencyExchange', 'CurrencyAmount',
+    'IsDebit', 'DebitAmount', 'CreditAmount', 'CashFlowId', 'ContractId',
+]
+
+
+def _cash_detail_values_from_post(post, prefix, suffix):
+    """
+    Read one cash document detail row from the bulk manage form.
+    Returns field values keyed for Cash_DocumentDetail (FKs by _id), or None
+    if a required field is empty.
+    """
+    account_id = post.get(f'{prefix}account_id_{suffix}')
+    client_id = post.get(f'{prefix}client_id_{suffix}')
+    currency_id = post.get(f'{prefix}currency_id_{suffix}')
+    currency_exchange = post.get(f'{prefix}currency_exchange_{suffix}')
+    currency_amount = post.get(f'{prefix}currency_amount_{suffix}')
+    is_debit = post.get(f'{prefix}is_debit_{suffix}')
+    cashflow_id = post.get(f'{prefix}cashflow_id_{suffix}')
+    contract_id = post.get(f'{prefix}contract_id_{suffix}')
+    
+    if not account_id or not client_id or not currency_id or not currency_amount or not currency_exchange or not is_debit:
+        return None
+    
+    return {
+        'AccountId_id': int(account_id),
+        'ClientId_id': int(client_id),
+        'CurrencyId_id': int(currency_id),
+        # Always use the exchange rate from the form - don't override with document rate
+        'CurrencyExchange': Decimal(currency_exchange).quantize(Decimal('0.0001')),
+        'CurrencyAmount': Decimal(currency_amount).quantize(Decimal('0.000001')),
+        'IsDebit': is_debit == 'true',
+        'CashFlowId_id': int(cashflow_id) if cashflow_id else None,
+        'ContractId_id': int(contract_id) if contract_id else None,
+        # Amount calculations are done in frontend - DebitAmount/CreditAmount are
+        # kept for historical data but not calculated here
+        'DebitAmount': Decimal('0'),
+        'CreditAmount': Decimal('0'),
+    }
+
+
+def _apply_cash_detail_values(detail, values):
+    """Set values on an existing detail; return True if anything changed."""
+    changed = False
+    for field_name, value in values.items():
+        if getattr(detail, field_name) != value:
+            setattr(detail, field_name, value)
+            changed = True
+    return changed
+
+
 @login_required
 @permission_required('core.add_cash_documentdetail', raise_exception=True)
 def bulk_manage_details(request, document_id):
@@ -2292,7 +2353,7 @@ def bulk_manage_details(request, document_id):
             try:
                 from core.models import Ref_Constant
                 from decimal import Decimal
-                vat_constant = Ref_Constant.objects.get(ConstantID=2)
+                vat_constant = get_constant(2)
                 # Convert to Decimal(10,4) format
                 vat_percentage = Decimal(vat_constant.ConstantName).quantize(Decimal('0.0001'))
             except (Ref_Constant.DoesNotExist, ValueError):
@@ -2321,149 +2382,67 @@ def bulk_manage_details(request, document_id):
                 document_details.append(vat_detail)
     
     if request.method == 'POST':
-        print("=== POST REQUEST RECEIVED IN BULK MANAGE ===")
-        print(f"Request method: {request.method}")
-        print(f"Request path: {request.path}")
-        print(f"Request POST keys count: {len(request.POST.keys())}")
         try:
-            # Debug: Print all POST data
-            print("=== CASH DOCUMENT BULK MANAGE POST DATA ===")
-            for key, value in request.POST.items():
-                if 'currency_exchange' in key or 'currency_amount' in key:
-                    print(f"{key}: {value}")
-            print("=== END POST DATA ===")
-            
-            # Debug: Print document exchange rate
-            print(f"=== DOCUMENT EXCHANGE RATE DEBUG ===")
-            print(f"Document ID: {document.DocumentId}")
-            print(f"Document Exchange Rate: {document.CurrencyExchange}")
-            print(f"Document Exchange Rate Type: {type(document.CurrencyExchange)}")
-            print("=== END DOCUMENT DEBUG ===")
-            
             created_count = 0
+            updated_count = 0
             deleted_count = 0
             
-            # STEP 1: Delete ALL existing details for this document first
-            existing_details = Cash_DocumentDetail.objects.filter(DocumentId=document)
-            deleted_count = existing_details.count()
-            print(f"=== DELETING ALL EXISTING DETAILS ===")
-            print(f"Deleting {deleted_count} existing detail records for document {document.DocumentId}")
-            existing_details.delete()
-            print(f"Successfully deleted {deleted_count} existing detail records")
-            print("=== END DELETE OPERATION ===")
-            
-            # STEP 2: Create new detail records from form data
-            print(f"=== CREATING NEW DETAIL RECORDS ===")
-            
-            # Process existing rows (those with actual detail IDs from the form)
-            detail_ids_processed = set()
+            # Diff submitted rows against the stored ones: update changed rows,
+            # create new rows and delete only the rows that were removed
+            existing_by_id = {
+                detail.DocumentDetailId: detail
+                for detail in Cash_DocumentDetail.objects.filter(DocumentId=document)
+            }
+            kept_ids = set()
+            details_to_create = []
+            details_to_update = []
             
             # First, process existing rows that have detail IDs
             for key, value in request.POST.items():
                 if key.startswith('account_id_') and value and not key.endswith('_None'):
                     detail_id = key.replace('account_id_', '')
                     if detail_id.startswith('new_'):
-                        continue  # Skip new rows for now
+                        continue  # New rows are handled below
                     
-                    detail_ids_processed.add(detail_id)
-                    
-                    # Get form data for this detail
-                    account_id = request.POST.get(f'account_id_{detail_id}')
-                    client_id = request.POST.get(f'client_id_{detail_id}')
-                    currency_id = request.POST.get(f'currency_id_{detail_id}')
-                    currency_exchange = request.POST.get(f'currency_exchange_{detail_id}')
-                    currency_amount = request.POST.get(f'currency_amount_{detail_id}')
-                    is_debit = request.POST.get(f'is_debit_{detail_id}')
-                    cashflow_id = request.POST.get(f'cashflow_id_{detail_id}')
-                    contract_id = request.POST.get(f'contract_id_{detail_id}')
-                    
-                    # Skip if required fields are empty
-                    if not account_id or not client_id or not currency_id or not currency_amount or not currency_exchange or not is_debit:
-                        print(f"Skipping detail {detail_id} - missing required fields")
+                    # Skip if required fields are empty (the stored row is then removed)
+                    values = _cash_detail_values_from_post(request.POST, '', detail_id)
+                    if values is None:
                         continue
                     
-                    # Create new detail object
-                    detail = Cash_DocumentDetail()
-                    detail.DocumentId = document
-                    detail.AccountId = Ref_Account.objects.get(AccountId=account_id)
-                    detail.ClientId = RefClient.objects.get(ClientId=client_id)
-                    detail.CurrencyId = Ref_Currency.objects.get(CurrencyId=currency_id)
-                    
-                    # Use the exchange rate from the form (user input)
-                    print(f"=== EXCHANGE RATE PROCESSING DEBUG ===")
-                    print(f"Detail ID: {detail_id}")
-                    print(f"Form currency_exchange value: '{currency_exchange}'")
-                    print(f"Form currency_exchange as float: {float(currency_exchange)}")
-                    print(f"Document exchange rate: {document.CurrencyExchange}")
-                    
-                    # Always use the form value - don't override with document rate
-                    detail.CurrencyExchange = float(currency_exchange)
-                    print(f"USING: Form exchange rate: {float(currency_exchange)}")
-                    print(f"Final detail.CurrencyExchange: {detail.CurrencyExchange}")
-                    print("=== END EXCHANGE RATE DEBUG ===")
-                    
-                    detail.CurrencyAmount = float(currency_amount)
-                    detail.IsDebit = is_debit == 'true'
-                    
-                    # Update CashFlowId and ContractId using ForeignKey assignment
-                    if cashflow_id:
-                        detail.CashFlowId_id = int(cashflow_id)
-                    else:
-                        detail.CashFlowId = None
-                        
-                    if contract_id:
-                        detail.ContractId_id = int(contract_id)
-                    else:
-                        detail.ContractId = None
-                    
-                    # Amount calculations are now done in frontend - store raw values
-                    # DebitAmount and CreditAmount are kept for historical data but not calculated here
-                    detail.DebitAmount = 0.0
-                    detail.CreditAmount = 0.0
-                    
-                    print(f"=== SAVING NEW DETAIL (from existing row) ===")
-                    print(f"Detail before save - CurrencyExchange: {detail.CurrencyExchange}")
-                    print(f"Detail before save - CurrencyAmount: {detail.CurrencyAmount}")
-                    print(f"Detail before save - DebitAmount: {detail.DebitAmount}")
-                    print(f"Detail before save - CreditAmount: {detail.CreditAmount}")
+                    existing = existing_by_id.get(_to_int_or_none(detail_id))
+                    if existing is None or existing.DocumentDetailId in kept_ids:
+                        details_to_create.append(Cash_DocumentDetail(DocumentId=document, **values))
+                        continue
                     
-                    detail.save()
-                    print(f"Detail saved successfully with new ID: {detail.DocumentDetailId}")
-                    created_count += 1
+                    kept_ids.add(existing.DocumentDetailId)
+                    if _apply_cash_detail_values(existing, values):
+                        details_to_update.append(existing)
             
             # Handle prepopulated data (when DocumentDetailId is None)
             # This happens when no existing details exist and data is prepopulated from master document
-            # Since multiple prepopulated rows can have the same field names, we need to handle them differently
-            
-            # Check if we have prepopulated data by looking for account_id_None
             if request.POST.get('account_id_None'):
-                # For prepopulated data, we need to recreate the same logic that was used to create the prepopulated rows
-                # This ensures we save all the rows that were displayed
+                # Recreate the same rows that were prepopulated from the master document
                 
-                # First, create the main detail record (from master document)
-                if document.AccountId and document.ClientId and document.CurrencyId and document.CurrencyAmount:
-                    detail = Cash_DocumentDetail()
-                    detail.DocumentId = document
-                    detail.AccountId = document.AccountId
-                    detail.ClientId = document.ClientId
-                    detail.CurrencyId = document.CurrencyId
-                    detail.CurrencyExchange = document.CurrencyExchange
-                    detail.CurrencyAmount = document.CurrencyAmount
-                    detail.IsDebit = True  # Main entry is typically debit
-                    
-                    # Amount calculations are now done in frontend - store raw values
-                    detail.DebitAmount = 0.0
-                    detail.CreditAmount = 0.0
-                    
-                    detail.save()
-                    created_count += 1
+                # First, the main detail record (from master document)
+                if document.AccountId_id and document.ClientId_id and document.CurrencyId_id and document.CurrencyAmount:
+                    details_to_create.append(Cash_DocumentDetail(
+                        DocumentId=document,
+                        AccountId_id=document.AccountId_id,
+                        ClientId_id=document.ClientId_id,
+                        CurrencyId_id=document.CurrencyId_id,
+                        CurrencyExchange=document.CurrencyExchange,
+                        CurrencyAmount=document.CurrencyAmount,
+                        IsDebit=True,  # Main entry is typically debit
+                        # Amount calculations are done in frontend - store raw values
+                        DebitAmount=0,
+                        CreditAmount=0,
+                    ))
                 
-                # Second, create VAT detail record if IsVat is True
-                if document.IsVat and document.VatAccountId:
+                # Second, the VAT detail record if IsVat is True
+                if document.IsVat and document.VatAccountId_id:
                     try:
                         from core.models import Ref_Constant
-                        from decimal import Decimal
-                        vat_constant = Ref_Constant.objects.get(ConstantID=2)
+                        vat_constant = get_constant(2)
                         vat_percentage = Decimal(vat_constant.ConstantName).quantize(Decimal('0.0001'))
                     except (Ref_Constant.DoesNotExist, ValueError):
                         vat_percentage = Decimal('10.0000')  # Default fallback
@@ -2473,86 +2452,46 @@ def bulk_manage_details(request, document_id):
                     if mnt_amount > 0:
                         # Calculate VAT amount: VAT = MNT - (MNT / (1 + VAT% / 100))
                         vat_amount = mnt_amount - (mnt_amount / (Decimal('1') + vat_percentage / Decimal('100')))
-                        
-                        # Create VAT detail row
-                        vat_detail = Cash_DocumentDetail()
-                        vat_detail.DocumentId = document
-                        vat_detail.AccountId = document.VatAccountId
-                        vat_detail.ClientId = document.ClientId
-                        vat_detail.CurrencyId = document.CurrencyId
-                        vat_detail.CurrencyAmount = vat_amount / document.CurrencyExchange if document.CurrencyExchange else 0
-                        vat_detail.CurrencyExchange = document.CurrencyExchange
-                        vat_detail.IsDebit = False  # VAT is typically credit
-                        vat_detail.DebitAmount = 0
-                        vat_detail.CreditAmount = vat_amount
-                        
-                        vat_detail.save()
-                        created_count += 1
+                        details_to_create.append(Cash_DocumentDetail(
+                            DocumentId=document,
+                            AccountId_id=document.VatAccountId_id,
+                            ClientId_id=document.ClientId_id,
+                            CurrencyId_id=document.CurrencyId_id,
+                            CurrencyAmount=vat_amount / document.CurrencyExchange if document.CurrencyExchange else 0,
+                            CurrencyExchange=document.CurrencyExchange,
+                            IsDebit=False,  # VAT is typically credit
+                            DebitAmount=0,
+                            CreditAmount=vat_amount,
+                        ))
             
-            # Handle new rows (create)
-            # STEP 3: Process new rows (created by user clicking "Add New Row")
+            # Process new rows (created by user clicking "Add New Row")
             new_row_count = int(request.POST.get('new_row_count', 0))
-            print(f"Processing {new_row_count} new rows")
-            
             for i in range(new_row_count):
-                # Get form data for each new row
-                account_id = request.POST.get(f'new_account_id_{i}')
-                client_id = request.POST.get(f'new_client_id_{i}')
-                currency_id = request.POST.get(f'new_currency_id_{i}')
-                currency_exchange = request.POST.get(f'new_currency_exchange_{i}')
-                currency_amount = request.POST.get(f'new_currency_amount_{i}')
-                is_debit = request.POST.get(f'new_is_debit_{i}')
-                cashflow_id = request.POST.get(f'new_cashflow_id_{i}')
-                contract_id = request.POST.get(f'new_contract_id_{i}')
-                
-                # Skip empty rows
-                if not account_id or not client_id or not currency_id or not currency_amount or not currency_exchange or not is_debit:
-                    print(f"Skipping new row {i} - missing required fields")
-                    continue
-                
-                # Create detail object
-                detail = Cash_DocumentDetail()
-                detail.DocumentId = document
-                detail.AccountId = Ref_Account.objects.get(AccountId=account_id)
-                detail.ClientId = RefClient.objects.get(ClientId=client_id)
-                detail.CurrencyId = Ref_Currency.objects.get(CurrencyId=currency_id)
-                
-                # Use the exchange rate from the form (user input)
-                detail.CurrencyExchange = float(currency_exchange)
-                print(f"New detail using form exchange rate: {float(currency_exchange)}")
-                
-                detail.CurrencyAmount = float(currency_amount)
-                detail.IsDebit = is_debit == 'true'
-                
-                # Handle CashFlowId and ContractId using ForeignKey assignment
-                if cashflow_id:
-                    detail.CashFlowId_id = int(cashflow_id)
-                else:
-                    detail.CashFlowId = None
-                    
-                if contract_id:
-                    detail.ContractId_id = int(contract_id)
-                else:
-                    detail.ContractId = None
-                
-                # Amount calculations are now done in frontend - store raw values
-                detail.DebitAmount = 0.0
-                detail.CreditAmount = 0.0
-                
-                print(f"=== SAVING NEW DETAIL (from new row) ===")
-                print(f"New detail before save - CurrencyExchange: {detail.CurrencyExchange}")
-                print(f"New detail before save - CurrencyAmount: {detail.CurrencyAmount}")
-                print(f"New detail before save - DebitAmount: {detail.DebitAmount}")
-                print(f"New detail before save - CreditAmount: {detail.CreditAmount}")
-                
-                detail.save()
-                print(f"New detail saved successfully with ID: {detail.DocumentDetailId}")
-                created_count += 1
+                values = _cash_detail_values_from_post(request.POST, 'new_', i)
+                if values is None:
+                    continue  # Skip empty rows
+                details_to_create.append(Cash_DocumentDetail(DocumentId=document, **values))
+            
+            removed_ids = set(existing_by_id) - kept_ids
+            with transaction.atomic():
+                if removed_ids:
+                    deleted_count, _ = Cash_DocumentDetail.objects.filter(DocumentDetailId__in=removed_ids).delete()
+                if details_to_update:
+                    Cash_DocumentDetail.objects.bulk_update(details_to_update, CASH_DETAIL_BULK_FIELDS)
+                    updated_count = len(details_to_update)
+                if details_to_create:
+                    Cash_DocumentDetail.objects.bulk_create(details_to_create)
+                    created_count = len(details_to_create)
+                if details_to_update or details_to_create:
+                    # bulk_update/bulk_create do not send model signals
+                    bump_ledger_version_on_commit()
             
             # Prepare success message
             message_parts = []
             if deleted_count > 0:
                 message_parts.append(f'deleted {deleted_count}')
+            if updated_count > 0:
+                message_parts.append(f'updated {updated_count}')
             if created_count > 0:
                 message_parts.append(f'created {created_count}')
             
@@ -2561,10 +2500,6 @@ def bulk_manage_details(request, document_id):
             else:
                 message = 'No changes were made.'
             
-            print(f"=== SAVE OPERATION COMPLETE ===")
-            print(f"Created: {created_count}, Deleted: {deleted_count}")
-            print(f"Success message: {message}")
-            
             messages.success(request, message)
             return redirect(f'/core/cashdocuments/?selected_document={document_id}')
             
@@ -2594,7 +2529,7 @@ def bulk_manage_details(request, document_id):
         try:
             from core.models import Ref_Constant
             from decimal import Decimal
-            vat_constant = Ref_Constant.objects.get(ConstantID=2)
+            vat_constant = get_constant(2)
             vat_percent = float(vat_constant.ConstantName)
             
             # Calculate VatAmount using the same formula as the form
@@ -2721,6 +2656,7 @@ def api_bulk_manage_details(request, document_id):
                 if new_details_to_create:
                     Cash_DocumentDetail.objects.bulk_create(new_details_to_create)
                     created_count = len(new_details_to_create)
+                    bump_ledger_version_on_commit()
                     print(f"Successfully created {created_count} new details")
                 
                 # Prepare response
@@ -2839,8 +2775,8 @@ def invdocument_create(request, parentid=None):
                     vat_accounts = {}
                     try:
                         from .models import Ref_Constant, Ref_Account
-                        vat_constant_9 = Ref_Constant.objects.get(ConstantID=9)   # Receivable VAT
-                        vat_constant_10 = Ref_Constant.objects.get(ConstantID=10) # Payable VAT
+                        vat_constant_9 = get_constant(9)   # Receivable VAT
+                        vat_constant_10 = get_constant(10) # Payable VAT
                         
                         # Convert ConstantName to integer to get AccountId
                         receivable_vat_account_id = int(vat_constant_9.ConstantName)   # Receivable (ConstantID=9)
@@ -2873,6 +2809,12 @@ def invdocument_create(request, parentid=None):
                         'timestamp': int(time.time())
                     })
             
+            # Confirm the previewed DocumentNo atomically (re-allocated if taken meanwhile)
+            if document.DocumentTypeId_id:
+                document.DocumentNo = document_sequences.claim(
+                    document.DocumentTypeId_id, document.DocumentNo
+                )
+            
             document.save()
             
             # Save DocumentNo to Ref_Document_Counter table
@@ -2905,8 +2847,8 @@ def invdocument_create(request, parentid=None):
     vat_accounts = {}
     try:
         from .models import Ref_Constant, Ref_Account
-        vat_constant_9 = Ref_Constant.objects.get(ConstantID=9)   # Receivable VAT
-        vat_constant_10 = Ref_Constant.objects.get(ConstantID=10) # Payable VAT
+        vat_constant_9 = get_constant(9)   # Receivable VAT
+        vat_constant_10 = get_constant(10) # Payable VAT
         
         # Convert ConstantName to integer to get AccountId
         receivable_vat_account_id = int(vat_constant_9.ConstantName)   # Receivable (ConstantID=9)
@@ -2973,8 +2915,8 @@ def invdocument_update(request, pk, parentid=None):
                     vat_accounts = {}
                     try:
                         from .models import Ref_Constant, Ref_Account
-                        vat_constant_9 = Ref_Constant.objects.get(ConstantID=9)   # Receivable VAT
-                        vat_constant_10 = Ref_Constant.objects.get(ConstantID=10) # Payable VAT
+                        vat_constant_9 = get_constant(9)   # Receivable VAT
+                        vat_constant_10 = get_constant(10) # Payable VAT
                         
                         # Convert ConstantName to integer to get AccountId
                         receivable_vat_account_id = int(vat_constant_9.ConstantName)   # Receivable (ConstantID=9)
@@ -3047,8 +2989,8 @@ def invdocument_update(request, pk, parentid=None):
     vat_accounts = {}
     try:
         from .models import Ref_Constant, Ref_Account
-        vat_constant_9 = Ref_Constant.objects.get(ConstantID=9)   # Receivable VAT
-        vat_constant_10 = Ref_Constant.objects.get(ConstantID=10) # Payable VAT
+        vat_constant_9 = get_constant(9)   # Receivable VAT
+        vat_constant_10 = get_constant(10) # Payable VAT
         
         # Convert ConstantName to integer to get AccountId
         receivable_vat_account_id = int(vat_constant_9.ConstantName)   # Receivable (ConstantID=9)
@@ -3685,38 +3627,11 @@ def get_next_document_number(request):
         return JsonResponse({'error': 'DocumentTypeId is required'}, status=400)
     
     try:
-        # Get the highest DocumentNo for this DocumentTypeId
-        last_counter = Ref_Document_Counter.objects.filter(
-            DocumentTypeId=document_type_id
-        ).order_by('-DocumentNo').first()
-        
-        if last_counter:
-            # Extract numeric part and increment
-            try:
-                # Assuming DocumentNo format is like "CASH0001", "INV0001", etc.
-                import re
-                match = re.search(r'(\d+)$', last_counter.DocumentNo)
-                if match:
-                    next_number = int(match.group(1)) + 1
-                    # Get the prefix (non-numeric part)
-                    prefix = last_counter.DocumentNo[:match.start()]
-                    next_document_no = f"{prefix}{next_number:04d}"
-                else:
-                    # If no numeric part found, start with 1
-                    next_document_no = f"{last_counter.DocumentNo}001"
-            except (ValueError, AttributeError):
-                # Fallback: append 001
-                next_document_no = f"{last_counter.DocumentNo}001"
-        else:
-            # No previous documents, start with 1
-            # Get document type to determine prefix
-            try:
-                doc_type = Ref_Document_Type.objects.get(DocumentTypeId=document_type_id)
-                # Use first 4 characters of DocumentTypeCode as prefix, or "DOC" as fallback
-                prefix = doc_type.DocumentTypeCode[:4] if doc_type.DocumentTypeCode else "DOC"
-                next_document_no = f"{prefix}0001"
-            except Ref_Document_Type.DoesNotExist:
-                next_document_no = "DOC0001"
+        # Preview the next number from the per-type sequence (O(1), see core.document_sequence)
+        try:
+            next_document_no = document_sequences.peek(document_type_id)
+        except Ref_Document_Type.DoesNotExist:
+            next_document_no = "DOC0001"
         
         return JsonResponse({
             'next_document_no': next_document_no,
@@ -4180,6 +4095,16 @@ def period_lock_toggle(request, period_id):
         period.IsLock = not period.IsLock
         period.save()
         
+        if period.IsLock:
+            # Locked periods get a period-end balance snapshot for the ledger reports
+            db_alias = get_current_db()
+            try:
+                refresh_balance_snapshot(period.PeriodId, db_alias)
+            except Exception as e:
+                logger.warning('Unable to write balance snapshot for period %s: %s', period.PeriodId, e)
+            finally:
+                connections[db_alias].close()
+        
         return JsonResponse({
             'success': True,
             'isLock': period.IsLock,
@@ -4354,113 +4279,204 @@ def cash_documents(request):
 def cash_import(request):
     """View for cash import page"""
     return render(request, 'core/cash_import.html', {})
-def get_cash_documents_filtered(request):
-    """API endpoint to get ALL cash documents and details for all tabs in one call"""
-    if request.method != 'GET':
-        return JsonResponse({'error': 'Only GET method allowed'}, status=405)
+
+
+CASH_DOCUMENT_VIEWS = ('documents', 'deleted', 'unlinked', 'details')
+CASH_DOCUMENTS_PAGE_SIZE = 500
+CASH_DOCUMENTS_MAX_PAGE_SIZE = 2000
+
+
+def _cash_document_row(doc):
+    """Row of the БАРИМТ / УСТГАСАН БАРИМТ tabs"""
+    return {
+        'DocumentId': doc.DocumentId,
+        'DocumentNo': doc.DocumentNo,
+        'DocumentDate': doc.DocumentDate.strftime('%Y-%m-%d'),
+        'DocumentTypeCode': doc.DocumentTypeId.DocumentTypeCode if doc.DocumentTypeId else '',
+        'ClientName': doc.ClientId.ClientName if doc.ClientId else '',
+        'Description': doc.Description,
+        'IsVat': doc.IsVat,
+        'AccountCode': doc.AccountId.AccountCode if doc.AccountId else '',
+        'CurrencyId': doc.CurrencyId.CurrencyId if doc.CurrencyId else '',
+        'CurrencyName': doc.CurrencyId.Currency_name if doc.CurrencyId else '',
+        'CurrencyAmount': float(doc.CurrencyAmount) if doc.CurrencyAmount else 0.0,
+        'CurrencyExchange': float(doc.CurrencyExchange) if doc.CurrencyExchange else 0.0,
+        'CurrencyMNT': float(doc.CurrencyMNT) if doc.CurrencyMNT else 0.0,
+        'UserName': doc.CreatedBy.username if doc.CreatedBy else '',
+        'IsDelete': doc.IsDelete,  # Include delete status for frontend filtering
+    }
+
+
+def _cash_detail_row(detail):
+    """Row of the ЖУРНАЛ tab"""
+    return {
+        'document_id': detail.DocumentId.DocumentId,  # Add document_id for navigation
+        'document_detail_id': detail.DocumentDetailId,
+        'document_no': detail.DocumentId.DocumentNo,
+        'document_date': detail.DocumentId.DocumentDate.strftime('%Y-%m-%d'),
+        'account_code': detail.AccountId.AccountCode if detail.AccountId else '',
+        'account_name': detail.AccountId.AccountName if detail.AccountId else '',
+        'client_name': detail.ClientId.ClientName if detail.ClientId else '',
+        'description': detail.DocumentId.Description,
+        'currency_code': detail.CurrencyId.CurrencyId if detail.CurrencyId else '',
+        'currency_name': detail.CurrencyId.Currency_name if detail.CurrencyId else '',
+        'currency_amount': float(detail.CurrencyAmount) if detail.CurrencyAmount else 0.0,
+        'currency_exchange': float(detail.CurrencyExchange) if detail.CurrencyExchange else 0.0,
+        'debit_amount': float(detail.DebitAmount) if detail.DebitAmount else 0.0,
+        'credit_amount': float(detail.CreditAmount) if detail.CreditAmount else 0.0,
+        'cash_flow_name': detail.CashFlowId.Description if detail.CashFlowId else '',
+        'user_name': detail.DocumentId.CreatedBy.username if detail.DocumentId.CreatedBy else '',
+    }
+
+
+def _cash_document_filter(params, prefix=''):
+    """
+    Q for the cash journal filters, relative to Cash_Document (prefix='') or
+    Cash_DocumentDetail (prefix='DocumentId__'):
+    start_date / end_date, document_type_id (default excludes depreciation 13
+    and closing 14 entries), and the server-side search: q (any of DocumentNo,
+    client, account, description) plus document_no / client / account /
+    description. Client and account match the detail row in the ЖУРНАЛ view.
+    """
+    is_detail = bool(prefix)
+    condition = Q()
+    if params.get('start_date'):
+        condition &= Q(**{f'{prefix}DocumentDate__gte': params['start_date']})
+    if params.get('end_date'):
+        condition &= Q(**{f'{prefix}DocumentDate__lte': params['end_date']})
+    if params.get('document_type_id'):
+        condition &= Q(**{f'{prefix}DocumentTypeId': params['document_type_id']})
+    else:
+        condition &= ~Q(**{f'{prefix}DocumentTypeId__in': [13, 14]})
+    
+    def document_no_q(value):
+        return Q(**{f'{prefix}DocumentNo__icontains': value})
+    
+    def client_q(value):
+        client = 'ClientId__' if is_detail else f'{prefix}ClientId__'
+        return Q(**{f'{client}ClientName__icontains': value}) | Q(**{f'{client}ClientCode__icontains': value})
+    
+    def account_q(value):
+        account = 'AccountId__' if is_detail else f'{prefix}AccountId__'
+        return Q(**{f'{account}AccountCode__startswith': value}) | Q(**{f'{account}AccountName__icontains': value})
+    
+    def description_q(value):
+        return Q(**{f'{prefix}Description__icontains': value})
+    
+    searches = {'document_no': document_no_q, 'client': client_q, 'account': account_q, 'description': description_q}
+    for param, search in searches.items():
+        value = (params.get(param) or '').strip()
+        if value:
+            condition &= search(value)
+    query = (params.get('q') or '').strip()
+    if query:
+        any_field = Q()
+        for search in searches.values():
+            any_field |= search(query)
+        condition &= any_field
+    return condition
+
+
+def _cash_documents_page(params, view, page_size):
+    """
+    One keyset page of a cash journal view, newest DocumentId first.
+    The cursor ('after') is the last DocumentId of the previous page, or
+    'DocumentId:DocumentDetailId' for the details view.
+    Returns (rows, next_cursor or None).
+    """
+    from django.db.models import Exists, OuterRef
     
+    after = (params.get('after') or '').strip()
+    if view == 'details':
+        details = Cash_DocumentDetail.objects.select_related(
+            'DocumentId__DocumentTypeId', 'AccountId', 'ClientId', 'CurrencyId', 'DocumentId__CreatedBy', 'CashFlowId'
+        ).filter(DocumentId__IsDelete=False).filter(_cash_document_filter(params, 'DocumentId__'))
+        if after:
+            document_id, _, detail_id = after.partition(':')
+            if not document_id.isdigit() or not detail_id.isdigit():
+                raise ValueError(f'Invalid cursor: {after}')
+            details = details.filter(
+                Q(DocumentId__lt=int(document_id)) |
+                Q(DocumentId=int(document_id), DocumentDetailId__lt=int(detail_id))
+            )
+        page = list(details.order_by('-DocumentId', '-DocumentDetailId')[:page_size + 1])
+        rows = [_cash_detail_row(detail) for detail in page[:page_size]]
+        next_cursor = f'{page[page_size - 1].DocumentId_id}:{page[page_size - 1].DocumentDetailId}' if len(page) > page_size else None
+        return rows, next_cursor
+    
+    has_details = Exists(Cash_DocumentDetail.objects.filter(DocumentId=OuterRef('DocumentId')))
+    documents = Cash_Document.objects.select_related(
+        'DocumentTypeId', 'AccountId', 'ClientId', 'CurrencyId', 'CreatedBy'
+    ).filter(_cash_document_filter(params), IsDelete=(view == 'deleted'))
+    if view == 'unlinked':
+        documents = documents.filter(~has_details)
+    else:
+        documents = documents.annotate(HasDetails=has_details)
+    if after:
+        if not after.isdigit():
+            raise ValueError(f'Invalid cursor: {after}')
+        documents = documents.filter(DocumentId__lt=int(after))
+    page = list(documents.order_by('-DocumentId')[:page_size + 1])
+    rows = []
+    for doc in page[:page_size]:
+        row = _cash_document_row(doc)
+        row['HasDetails'] = getattr(doc, 'HasDetails', False)
+        rows.append(row)
+    next_cursor = str(page[page_size - 1].DocumentId) if len(page) > page_size else None
+    return rows, next_cursor
+
+
+@login_required
+@require_http_methods(["GET"])
+def get_cash_documents_filtered(request):
+    """
+    API endpoint for the cash journal
+    With ?view=documents|deleted|unlinked|details: one keyset page of that view
+    (page_size up to 2000, cursor in 'after', next page cursor in 'next_cursor')
+    filtered and searched server-side, see _cash_document_filter.
+    Without view: all documents and details of the range in one call (used by
+    the depreciation and closing entry screens for one document type).
+    """
+    view = request.GET.get('view')
     try:
-        # Get filter parameters
+        if view:
+            if view not in CASH_DOCUMENT_VIEWS:
+                return JsonResponse({
+                    'success': False,
+                    'error': f'Unknown view: {view} (expected one of {", ".join(CASH_DOCUMENT_VIEWS)})'
+                }, status=400)
+            try:
+                page_size = min(max(int(request.GET.get('page_size', CASH_DOCUMENTS_PAGE_SIZE)), 1), CASH_DOCUMENTS_MAX_PAGE_SIZE)
+                rows, next_cursor = _cash_documents_page(request.GET, view, page_size)
+            except ValueError as e:
+                return JsonResponse({'success': False, 'error': str(e)}, status=400)
+            return JsonResponse({
+                'success': True,
+                'view': view,
+                'results': rows,
+                'count': len(rows),
+                'page_size': page_size,
+                'has_more': next_cursor is not None,
+                'next_cursor': next_cursor,
+            })
+        
         start_date = request.GET.get('start_date')
         end_date = request.GET.get('end_date')
-        document_type_id = request.GET.get('document_type_id')  # NEW PARAMETER for filtering by DocumentTypeId
-        page = int(request.GET.get('page', 1))
-        page_size = int(request.GET.get('page_size', 1000))  # Large page size to get all records
         
-        # Limit page size to prevent abuse
-        if page_size > 2000:
-            page_size = 2000
-        
-        # Get ALL cash documents (both active and deleted) with related data
+        # All cash documents (both active and deleted) with related data
         all_documents = Cash_Document.objects.select_related(
             'DocumentTypeId', 'AccountId', 'ClientId', 'CurrencyId', 'TemplateId', 'CreatedBy'
-        ).order_by('-DocumentId').distinct()
-        
-        # Apply date filtering if provided
-        if start_date:
-            all_documents = all_documents.filter(DocumentDate__gte=start_date)
-        if end_date:
-            all_documents = all_documents.filter(DocumentDate__lte=end_date)
-        
-        # Apply DocumentTypeId filter if provided
-        if document_type_id:
-            all_documents = all_documents.filter(DocumentTypeId=document_type_id)
-        else:
-            # Default behavior: exclude depreciation (13) and closing (14) entries
-            all_documents = all_documents.exclude(DocumentTypeId__in=[13, 14])
+        ).filter(_cash_document_filter(request.GET)).order_by('-DocumentId')
         
-        # Get ALL cash document details for ЖУРНАЛ tab (only from non-deleted documents)
+        # All cash document details for ЖУРНАЛ tab (only from non-deleted documents)
         all_details = Cash_DocumentDetail.objects.select_related(
             'DocumentId__DocumentTypeId', 'AccountId', 'ClientId', 'CurrencyId', 'DocumentId__CreatedBy', 'CashFlowId'
-        ).filter(DocumentId__IsDelete=False).order_by('-DocumentId__DocumentId')
-        
-        # Apply date filtering to details if provided
-        if start_date:
-            all_details = all_details.filter(DocumentId__DocumentDate__gte=start_date)
-        if end_date:
-            all_details = all_details.filter(DocumentId__DocumentDate__lte=end_date)
-        
-        # Apply DocumentTypeId filter to details if provided
-        if document_type_id:
-            all_details = all_details.filter(DocumentId__DocumentTypeId=document_type_id)
-        else:
-            # Default behavior: exclude depreciation (13) and closing (14) entries
-            all_details = all_details.exclude(DocumentId__DocumentTypeId__in=[13, 14])
-        
-        # Format documents data for БАРИМТ and УСТГАСАН БАРИМТ tabs
-        documents_data = []
-        seen_documents = set()
-        
-        for doc in all_documents:
-            # Create a unique key for this document
-            doc_key = f"{doc.DocumentId}_{doc.DocumentNo}_{doc.DocumentDate}"
-            
-            # Skip if we've already seen this document
-            if doc_key in seen_documents:
-                continue
-                
-            seen_documents.add(doc_key)
-            
-            documents_data.append({
-                'DocumentId': doc.DocumentId,
-                'DocumentNo': doc.DocumentNo,
-                'DocumentDate': doc.DocumentDate.strftime('%Y-%m-%d'),
-                'DocumentTypeCode': doc.DocumentTypeId.DocumentTypeCode if doc.DocumentTypeId else '',
-                'ClientName': doc.ClientId.ClientName if doc.ClientId else '',
-                'Description': doc.Description,
-                'IsVat': doc.IsVat,
-                'AccountCode': doc.AccountId.AccountCode if doc.AccountId else '',
-                'CurrencyId': doc.CurrencyId.CurrencyId if doc.CurrencyId else '',
-                'CurrencyName': doc.CurrencyId.Currency_name if doc.CurrencyId else '',
-                'CurrencyAmount': float(doc.CurrencyAmount) if doc.CurrencyAmount else 0.0,
-                'CurrencyExchange': float(doc.CurrencyExchange) if doc.CurrencyExchange else 0.0,
-                'CurrencyMNT': float(doc.CurrencyMNT) if doc.CurrencyMNT else 0.0,
-                'UserName': doc.CreatedBy.username if doc.CreatedBy else '',
-                'IsDelete': doc.IsDelete,  # Include delete status for frontend filtering
-            })
-        
-        # Format details data for ЖУРНАЛ tab
-        details_data = []
-        for detail in all_details:
-            details_data.append({
-                'document_id': detail.DocumentId.DocumentId,  # Add document_id for navigation
-                'document_no': detail.DocumentId.DocumentNo,
-                'document_date': detail.DocumentId.DocumentDate.strftime('%Y-%m-%d'),
-                'document_id': detail.DocumentId.DocumentId,
-                'account_code': detail.AccountId.AccountCode if detail.AccountId else '',
-                'account_name': detail.AccountId.AccountName if detail.AccountId else '',
-                'client_name': detail.ClientId.ClientName if detail.ClientId else '',
-                'description': detail.DocumentId.Description,
-                'currency_code': detail.CurrencyId.CurrencyId if detail.CurrencyId else '',
-                'currency_name': detail.CurrencyId.Currency_name if detail.CurrencyId else '',
-                'currency_amount': float(detail.CurrencyAmount) if detail.CurrencyAmount else 0.0,
-                'currency_exchange': float(detail.CurrencyExchange) if detail.CurrencyExchange else 0.0,
-                'debit_amount': float(detail.DebitAmount) if detail.DebitAmount else 0.0,
-                'credit_amount': float(detail.CreditAmount) if detail.CreditAmount else 0.0,
-                'cash_flow_name': detail.CashFlowId.Description if detail.CashFlowId else '',
-                'user_name': detail.DocumentId.CreatedBy.username if detail.DocumentId.CreatedBy else '',
-            })
+        ).filter(DocumentId__IsDelete=False).filter(
+            _cash_document_filter(request.GET, 'DocumentId__')
+        ).order_by('-DocumentId__DocumentId')
         
+        documents_data = [_cash_document_row(doc) for doc in all_documents]
+        details_data = [_cash_detail_row(detail) for detail in all_details]
         
         return JsonResponse({
             'success': True,
@@ -4510,34 +4526,22 @@ def currency_journal(request):
     currency_data = []
     if start_date and end_date:
         try:
-            db_alias = get_current_db()
-            try:
+            def calculate_currency_balance():
                 # Execute the currency balance function
-                with connections[db_alias].cursor() as cursor:
-                    cursor.execute(
-                        "SELECT * FROM calculate_currency_balance(%s, %s)",
-                        [start_date, end_date]
-                    )
-                    
-                    # Get column names
-                    columns = [col[0] for col in cursor.description]
-                    
-                    # Fetch all results
-                    results = cursor.fetchall()
-                    
-                    # Convert to list of dictionaries
-                    currency_data = [
-                        dict(zip(columns, row)) for row in results
-                    ]
-                    
-                    # Convert Decimal values to float for JSON serialization
-                    from decimal import Decimal
-                    for item in currency_data:
-                        for key, value in item.items():
-                            if isinstance(value, Decimal):
-                                item[key] = float(value)
-            finally:
-                connections[db_alias].close()
+                rows = _run_report_function(
+                    "SELECT * FROM calculate_currency_balance(%s, %s)",
+                    [start_date, end_date]
+                )
+                
+                # Convert Decimal values to float for JSON serialization
+                from decimal import Decimal
+                for item in rows:
+                    for key, value in item.items():
+                        if isinstance(value, Decimal):
+                            item[key] = float(value)
+                return rows
+            
+            currency_data = cached_report('calculate_currency_balance', (start_date, end_date), calculate_currency_balance)
         except Exception as e:
             currency_data = []
     
@@ -6198,6 +6202,8 @@ def api_calculate_depreciation(request):
                 ]
         finally:
             connections[db_alias].close()
+        # Depreciation posts cash documents directly in SQL
+        bump_ledger_version(db_alias)
         
         return JsonResponse({
             'success': True,
@@ -6265,6 +6271,8 @@ def api_calculate_closing_record(request):
                 # Function returns VOID, so no need to fetch results
         finally:
             connections[db_alias].close()
+        # Closing entries are posted directly in SQL
+        bump_ledger_version(db_alias)
         
         return JsonResponse({
             'success': True,
@@ -6639,6 +6647,8 @@ def api_calculate_cost_adjustment(request):
                 # Function returns VOID, so no need to fetch results
         finally:
             connections[db_alias].close()
+        # Cost adjustment rewrites inventory detail amounts directly in SQL
+        bump_ledger_version(db_alias)
         
         return JsonResponse({
             'success': True,
@@ -6786,6 +6796,12 @@ def astdocument_create(request, parentid=None):
                             'vat_accounts': {}
                         })
             
+            # Confirm the previewed DocumentNo atomically (re-allocated if taken meanwhile)
+            if document.DocumentTypeId_id:
+                document.DocumentNo = document_sequences.claim(
+                    document.DocumentTypeId_id, document.DocumentNo
+                )
+            
             document.save()
             
             # Save DocumentNo to Ref_Document_Counter table
@@ -6804,8 +6820,8 @@ def astdocument_create(request, parentid=None):
     vat_accounts = {}
     try:
         from .models import Ref_Constant, Ref_Account
-        vat_constant_9 = Ref_Constant.objects.get(ConstantID=9)   # Receivable VAT
-        vat_constant_10 = Ref_Constant.objects.get(ConstantID=10) # Payable VAT
+        vat_constant_9 = get_constant(9)   # Receivable VAT
+        vat_constant_10 = get_constant(10) # Payable VAT
         
         # Convert ConstantName to integer to get AccountId
         receivable_vat_account_id = int(vat_constant_9.ConstantName)   # Receivable (ConstantID=9)
@@ -6868,8 +6884,8 @@ def astdocument_update(request, pk, parentid=None):
                     vat_accounts = {}
                     try:
                         from .models import Ref_Constant, Ref_Account
-                        vat_constant_9 = Ref_Constant.objects.get(ConstantID=9)   # Receivable VAT
-                        vat_constant_10 = Ref_Constant.objects.get(ConstantID=10) # Payable VAT
+                        vat_constant_9 = get_constant(9)   # Receivable VAT
+                        vat_constant_10 = get_constant(10) # Payable VAT
                         
                         # Convert ConstantName to integer to get AccountId
                         receivable_vat_account_id = int(vat_constant_9.ConstantName)   # Receivable (ConstantID=9)
@@ -6942,8 +6958,8 @@ def astdocument_update(request, pk, parentid=None):
     vat_accounts = {}
     try:
         from .models import Ref_Constant, Ref_Account
-        vat_constant_9 = Ref_Constant.objects.get(ConstantID=9)   # Receivable VAT
-        vat_constant_10 = Ref_Constant.objects.get(ConstantID=10) # Payable VAT
+        vat_constant_9 = get_constant(9)   # Receivable VAT
+        vat_constant_10 = get_constant(10) # Payable VAT
         
         # Convert ConstantName to integer to get AccountId
         receivable_vat_account_id = int(vat_constant_9.ConstantName)   # Receivable (ConstantID=9)
@@ -7080,6 +7096,7 @@ def bulk_manage_ast_details(request, document_id):
 
     # Prefetch cumulative depreciation + depreciation expense per asset card as of document date
     asset_depreciation_lookup = {}
+    asset_card_ids = sorted({item.AssetCardId_id for item in document_items if item.AssetCardId_id})
     if document.DocumentDate and document.AccountId_id:
         db_alias = get_current_db()
         try:
@@ -7147,19 +7164,28 @@ def bulk_manage_ast_details(request, document_id):
                             asset_depreciation_lookup[asset_card_id_int] = asset_info
                         elif current is None:
                             asset_depreciation_lookup[asset_card_id_int] = asset_info
-                else:
-                    cursor.execute(
-                        """
+                elif asset_card_ids:
+                    # Only the asset cards of this document are computed; all of
+                    # their accounts are kept for the account preference below
+                    balance_columns = """
                         SELECT accountid,
                                assetcardid,
                                COALESCE(cumulateddepreciation, 0) AS cumulated_depreciation,
                                COALESCE(depreciationexpense, 0) AS depreciation_expense,
                                    0 AS predicted_depreciation,
                                totalexpense
-                        FROM report_assetcard_balance(%s)
-                        """,
-                        [document.DocumentDate]
-                    )
+                    """
+                    try:
+                        cursor.execute(
+                            balance_columns + "FROM report_assetcard_balance(%s, %s::integer[], NULL)",
+                            [document.DocumentDate, asset_card_ids]
+                        )
+                    except ProgrammingError:
+                        # Tenant without the asset-card filtered overload yet
+                        cursor.execute(
+                            balance_columns + "FROM report_assetcard_balance(%s) WHERE assetcardid = ANY(%s::integer[])",
+                            [document.DocumentDate, asset_card_ids]
+                        )
                     records = cursor.fetchall()
                     for record in records:
                         account_id, asset_card_id, cumulated_depreciation, depreciation_expense, predicted_depreciation, total_expense = record
@@ -7747,6 +7773,28 @@ def refmeasurements_json(request):
         }, status=500)
 
 
+def _run_report_function(sql, params):
+    """Execute a report function on the current tenant database and return rows as dicts."""
+    db_alias = get_current_db()
+    try:
+        with connections[db_alias].cursor() as cursor:
+            cursor.execute(sql, params)
+            columns = [col[0] for col in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    finally:
+        # Force-close the tenant database connection so next request gets a fresh connection
+        connections[db_alias].close()
+
+
+def _calculate_trial_balance(begin_date, end_date):
+    """calculate_trial_balance rows for a date range, cached per ledger version"""
+    return cached_report(
+        'calculate_trial_balance',
+        (begin_date, end_date),
+        lambda: _run_report_function("SELECT * FROM calculate_trial_balance(%s, %s)", [begin_date, end_date]),
+    )
+
+
 @login_required
 def trial_balance(request):
     """Trial Balance Report View"""
@@ -7758,32 +7806,22 @@ def trial_balance(request):
         trial_balance_data = []
         error_message = None
         
+        export_format = get_export_format(request)
+        if begin_date and end_date and export_format:
+            rows = iter_export_rows(
+                get_current_db(),
+                "SELECT * FROM calculate_trial_balance(%s, %s)",
+                [begin_date, end_date],
+                TRIAL_BALANCE_EXPORT_FIELDS
+            )
+            return streaming_export_response(
+                export_format, f'trial_balance_{begin_date}_{end_date}',
+                [header for header, _ in TRIAL_BALANCE_EXPORT_FIELDS], rows, sheet_name='Trial balance'
+            )
+        
         if begin_date and end_date:
-            # Execute the trial balance function
-            import time
-            cache_buster = int(time.time() * 1000)  # Current timestamp in milliseconds
-            db_alias = get_current_db()
-            try:
-                with connections[db_alias].cursor() as cursor:
-                    # Add cache-busting comment to force PostgreSQL to treat each query as unique
-                    cursor.execute(
-                        f"SELECT * FROM calculate_trial_balance(%s, %s) /* cache_bust: {cache_buster} */",
-                        [begin_date, end_date]
-                    )
-                    
-                    # Get column names
-                    columns = [col[0] for col in cursor.description]
-                    
-                    # Fetch all results
-                    results = cursor.fetchall()
-                    
-                    # Convert to list of dictionaries
-                    trial_balance_data = [
-                        dict(zip(columns, row)) for row in results
-                    ]
-            finally:
-                # Force-close the tenant database connection so next request gets a fresh connection
-                connections[db_alias].close()
+            # Served from the report cache until the tenant ledger changes
+            trial_balance_data = _calculate_trial_balance(begin_date, end_date)
         
         context = {
             'trial_balance_data': trial_balance_data,
@@ -7844,117 +7882,126 @@ def y_balance(request):
         if begin_date and end_date and calculate:
             # Execute stored procedures only when "ТООЦООЛОХ" button is clicked (form submitted)
             # Functions now return data sets directly
-            import time
-            cache_buster = int(time.time() * 1000)  # Current timestamp in milliseconds
-            db_alias = get_current_db()
-            try:
-                with connections[db_alias].cursor() as cursor:
-                    # Column name mapping for St_Balance (PostgreSQL returns column names as defined in RETURNS TABLE)
-                    # Since we use quoted identifiers, they preserve case, but we'll map to be safe
-                    balance_column_mapping = {
-                        'stbalanceid': 'StbalanceId',
-                        'stbalancecode': 'StbalanceCode',
-                        'stbalancename': 'StbalanceName',
-                        'beginbalance': 'BeginBalance',
-                        'endbalance': 'EndBalance',
-                        'order': 'Order',
-                        # Also handle exact case matches
-                        'StbalanceId': 'StbalanceId',
-                        'StbalanceCode': 'StbalanceCode',
-                        'StbalanceName': 'StbalanceName',
-                        'BeginBalance': 'BeginBalance',
-                        'EndBalance': 'EndBalance',
-                        'Order': 'Order'
-                    }
-                    
-                    # Calculate St_Balance and get data
-                    # Add cache-busting comment to force PostgreSQL to treat each query as unique
-                    cursor.execute(
-                        f"SELECT * FROM calculate_st_balance(%s, %s) /* cache_bust: {cache_buster} */",
-                        [begin_date, end_date]
-                    )
-                    columns = [col[0] for col in cursor.description]
-                    st_balance_data = []
-                    for row in cursor.fetchall():
-                        row_dict = {}
-                        for i, col_name in enumerate(columns):
-                            # Remove quotes if present and normalize
-                            clean_col_name = col_name.strip('"').strip("'")
-                            # Map column names to expected format (try exact match first, then lowercase)
-                            mapped_name = balance_column_mapping.get(clean_col_name, balance_column_mapping.get(clean_col_name.lower(), clean_col_name))
-                            row_dict[mapped_name] = row[i]
-                        st_balance_data.append(row_dict)
-                    
-                    # Column name mapping for St_Income
-                    income_column_mapping = {
-                        'stincomeid': 'StIncomeId',
-                        'stincome': 'StIncome',
-                        'stincomename': 'StIncomeName',
-                        'endbalance': 'EndBalance',
-                        'order': 'Order',
-                        # Also handle exact case matches
-                        'StIncomeId': 'StIncomeId',
-                        'StIncome': 'StIncome',
-                        'StIncomeName': 'StIncomeName',
-                        'EndBalance': 'EndBalance',
-                        'Order': 'Order'
-                    }
-                    
-                    # Calculate St_Income and get data
-                    # Add cache-busting comment to force PostgreSQL to treat each query as unique
-                    cursor.execute(
-                        f"SELECT * FROM calculate_st_income(%s, %s) /* cache_bust: {cache_buster} */",
-                        [begin_date, end_date]
-                    )
-                    columns = [col[0] for col in cursor.description]
-                    st_income_data = []
-                    for row in cursor.fetchall():
-                        row_dict = {}
-                        for i, col_name in enumerate(columns):
-                            # Remove quotes if present and normalize
-                            clean_col_name = col_name.strip('"').strip("'")
-                            # Map column names to expected format
-                            mapped_name = income_column_mapping.get(clean_col_name, income_column_mapping.get(clean_col_name.lower(), clean_col_name))
-                            row_dict[mapped_name] = row[i]
-                        st_income_data.append(row_dict)
-                    
-                    # Column name mapping for St_CashFlow
-                    cashflow_column_mapping = {
-                        'stcashflowid': 'StCashFlowId',
-                        'stcashflowcode': 'StCashFlowCode',
-                        'stcashflowname': 'StCashFlowName',
-                        'endbalance': 'EndBalance',
-                        'order': 'Order',
-                        'isvisible': 'IsVisible',
-                        # Also handle exact case matches
-                        'StCashFlowId': 'StCashFlowId',
-                        'StCashFlowCode': 'StCashFlowCode',
-                        'StCashFlowName': 'StCashFlowName',
-                        'EndBalance': 'EndBalance',
-                        'Order': 'Order',
-                        'IsVisible': 'IsVisible'
-                    }
-                    
-                    # Calculate St_CashFlow and get data
-                    # Add cache-busting comment to force PostgreSQL to treat each query as unique
-                    cursor.execute(
-                        f"SELECT * FROM calculate_st_cash_flow(%s, %s) /* cache_bust: {cache_buster} */",
-                        [begin_date, end_date]
-                    )
-                    columns = [col[0] for col in cursor.description]
-                    st_cashflow_data = []
-                    for row in cursor.fetchall():
-                        row_dict = {}
-                        for i, col_name in enumerate(columns):
-                            # Remove quotes if present and normalize
-                            clean_col_name = col_name.strip('"').strip("'")
-                            # Map column names to expected format
-                            mapped_name = cashflow_column_mapping.get(clean_col_name, cashflow_column_mapping.get(clean_col_name.lower(), clean_col_name))
-                            row_dict[mapped_name] = row[i]
-                        st_cashflow_data.append(row_dict)
-            finally:
-                # Force-close the tenant database connection so next request gets a fresh connection
-                connections[db_alias].close()
+            # The functions also rewrite st_balance/st_income/st_cashflow, which tab
+            # switching reads back, so a cached result is only reused while those
+            # tables still hold this date range at the current ledger version.
+            report_params = (begin_date, end_date)
+            version = ledger_version()
+            cached_statements = None
+            if get_report('st_tables', (), version) == report_params:
+                cached_statements = get_report('y_balance', report_params, version)
+            
+            if cached_statements is not None:
+                st_balance_data, st_income_data, st_cashflow_data = cached_statements
+            else:
+                db_alias = get_current_db()
+                try:
+                    with connections[db_alias].cursor() as cursor:
+                        # Column name mapping for St_Balance (PostgreSQL returns column names as defined in RETURNS TABLE)
+                        # Since we use quoted identifiers, they preserve case, but we'll map to be safe
+                        balance_column_mapping = {
+                            'stbalanceid': 'StbalanceId',
+                            'stbalancecode': 'StbalanceCode',
+                            'stbalancename': 'StbalanceName',
+                            'beginbalance': 'BeginBalance',
+                            'endbalance': 'EndBalance',
+                            'order': 'Order',
+                            # Also handle exact case matches
+                            'StbalanceId': 'StbalanceId',
+                            'StbalanceCode': 'StbalanceCode',
+                            'StbalanceName': 'StbalanceName',
+                            'BeginBalance': 'BeginBalance',
+                            'EndBalance': 'EndBalance',
+                            'Order': 'Order'
+                        }
+                        
+                        # Calculate St_Balance and get data
+                        cursor.execute(
+                            "SELECT * FROM calculate_st_balance(%s, %s)",
+                            [begin_date, end_date]
+                        )
+                        columns = [col[0] for col in cursor.description]
+                        st_balance_data = []
+                        for row in cursor.fetchall():
+                            row_dict = {}
+                            for i, col_name in enumerate(columns):
+                                # Remove quotes if present and normalize
+                                clean_col_name = col_name.strip('"').strip("'")
+                                # Map column names to expected format (try exact match first, then lowercase)
+                                mapped_name = balance_column_mapping.get(clean_col_name, balance_column_mapping.get(clean_col_name.lower(), clean_col_name))
+                                row_dict[mapped_name] = row[i]
+                            st_balance_data.append(row_dict)
+                        
+                        # Column name mapping for St_Income
+                        income_column_mapping = {
+                            'stincomeid': 'StIncomeId',
+                            'stincome': 'StIncome',
+                            'stincomename': 'StIncomeName',
+                            'endbalance': 'EndBalance',
+                            'order': 'Order',
+                            # Also handle exact case matches
+                            'StIncomeId': 'StIncomeId',
+                            'StIncome': 'StIncome',
+                            'StIncomeName': 'StIncomeName',
+                            'EndBalance': 'EndBalance',
+                            'Order': 'Order'
+                        }
+                        
+                        # Calculate St_Income and get data
+                        cursor.execute(
+                            "SELECT * FROM calculate_st_income(%s, %s)",
+                            [begin_date, end_date]
+                        )
+                        columns = [col[0] for col in cursor.description]
+                        st_income_data = []
+                        for row in cursor.fetchall():
+                            row_dict = {}
+                            for i, col_name in enumerate(columns):
+                                # Remove quotes if present and normalize
+                                clean_col_name = col_name.strip('"').strip("'")
+                                # Map column names to expected format
+                                mapped_name = income_column_mapping.get(clean_col_name, income_column_mapping.get(clean_col_name.lower(), clean_col_name))
+                                row_dict[mapped_name] = row[i]
+                            st_income_data.append(row_dict)
+                        
+                        # Column name mapping for St_CashFlow
+                        cashflow_column_mapping = {
+                            'stcashflowid': 'StCashFlowId',
+                            'stcashflowcode': 'StCashFlowCode',
+                            'stcashflowname': 'StCashFlowName',
+                            'endbalance': 'EndBalance',
+                            'order': 'Order',
+                            'isvisible': 'IsVisible',
+                            # Also handle exact case matches
+                            'StCashFlowId': 'StCashFlowId',
+                            'StCashFlowCode': 'StCashFlowCode',
+                            'StCashFlowName': 'StCashFlowName',
+                            'EndBalance': 'EndBalance',
+                            'Order': 'Order',
+                            'IsVisible': 'IsVisible'
+                        }
+                        
+                        # Calculate St_CashFlow and get data
+                        cursor.execute(
+                            "SELECT * FROM calculate_st_cash_flow(%s, %s)",
+                            [begin_date, end_date]
+                        )
+                        columns = [col[0] for col in cursor.description]
+                        st_cashflow_data = []
+                        for row in cursor.fetchall():
+                            row_dict = {}
+                            for i, col_name in enumerate(columns):
+                                # Remove quotes if present and normalize
+                                clean_col_name = col_name.strip('"').strip("'")
+                                # Map column names to expected format
+                                mapped_name = cashflow_column_mapping.get(clean_col_name, cashflow_column_mapping.get(clean_col_name.lower(), clean_col_name))
+                                row_dict[mapped_name] = row[i]
+                            st_cashflow_data.append(row_dict)
+                finally:
+                    # Force-close the tenant database connection so next request gets a fresh connection
+                    connections[db_alias].close()
+                set_report('y_balance', report_params, version, (st_balance_data, st_income_data, st_cashflow_data))
+                set_report('st_tables', (), version, report_params)
         elif begin_date and end_date:
             # If just switching tabs, query existing data from models
             # Convert QuerySet to list of dictionaries with proper field names
@@ -8051,28 +8098,14 @@ def api_trial_balance_by_stbalance(request):
                 'error': 'Missing required parameters: stbalance_id, begin_date, end_date'
             }, status=400)
         
+        # Shares the cached calculate_trial_balance result with the trial balance report
+        all_trial_balance = _calculate_trial_balance(begin_date, end_date)
+        
         db_alias = get_current_db()
         trial_balance_data = []
         
         try:
             with connections[db_alias].cursor() as cursor:
-                import time
-                cache_buster = int(time.time() * 1000)
-                
-                # Call calculate_trial_balance function
-                cursor.execute(
-                    f"SELECT * FROM calculate_trial_balance(%s, %s) /* cache_bust: {cache_buster} */",
-                    [begin_date, end_date]
-                )
-                
-                columns = [col[0] for col in cursor.description]
-                results = cursor.fetchall()
-                
-                # Convert to list of dictionaries
-                all_trial_balance = [
-                    dict(zip(columns, row)) for row in results
-                ]
-                
                 # Filter by StBalanceId: Join with ref_account_type to get StBalanceId
                 cursor.execute("""
                     SELECT DISTINCT ra."AccountId", rat."StBalanceId"
@@ -8115,27 +8148,12 @@ def recpay_balance(request):
         error_message = None
         
         if begin_date and end_date:
-            # Execute the recpay balance function
-            db_alias = get_current_db()
-            try:
-                with connections[db_alias].cursor() as cursor:
-                    cursor.execute(
-                        "SELECT * FROM calculate_recpay_balance(%s, %s)",
-                        [begin_date, end_date]
-                    )
-                    
-                    # Get column names
-                    columns = [col[0] for col in cursor.description]
-                    
-                    # Fetch all results
-                    results = cursor.fetchall()
-                    
-                    # Convert to list of dictionaries
-                    recpay_balance_data = [
-                        dict(zip(columns, row)) for row in results
-                    ]
-            finally:
-                connections[db_alias].close()
+            # Execute the recpay balance function (cached per ledger version)
+            recpay_balance_data = cached_report(
+                'calculate_recpay_balance',
+                (begin_date, end_date),
+                lambda: _run_report_function("SELECT * FROM calculate_recpay_balance(%s, %s)", [begin_date, end_date]),
+            )
         
         context = {
             'recpay_balance_data': recpay_balance_data,
@@ -8307,6 +8325,61 @@ def account_statement(request):
         return render(request, 'core/trial_edit_account_and_sub_ledger.html', context)
 
 
+# (header, column) pairs written by the CSV/XLSX ledger export
+LEDGER_EXPORT_FIELDS = [
+    ('Огноо', 'DocumentDate'),
+    ('Баримтын дугаар', 'DocumentNo'),
+    ('Баримтын төрөл', 'DocumentType'),
+    ('Гүйлгээний утга', 'Description'),
+    ('Дансны код', 'AccountCode'),
+    ('Дансны нэр', 'AccountName'),
+    ('Харилцагчийн код', 'ClientCode'),
+    ('Харилцагч', 'ClientName'),
+    ('Валют', 'CurrencyName'),
+    ('Ханш', 'CurrencyExchange'),
+    ('Валютын дүн', 'CurrencyAmount'),
+    ('Дт дүн', 'DebitAmount'),
+    ('Кт дүн', 'CreditAmount'),
+]
+
+TRIAL_BALANCE_EXPORT_FIELDS = [
+    ('Дансны код', 'accountcode'),
+    ('Дансны нэр', 'accountname'),
+    ('Эхний үлдэгдэл (Дт)', 'beginningbalancedebit'),
+    ('Эхний үлдэгдэл (Кт)', 'beginningbalancecredit'),
+    ('Дт гүйлгээ', 'debitamount'),
+    ('Кт гүйлгээ', 'creditamount'),
+    ('Эцсийн үлдэгдэл (Дт)', 'endingbalancedebit'),
+    ('Эцсийн үлдэгдэл (Кт)', 'endingbalancecredit'),
+]
+
+
+def _ledger_lines_query(account_id, begin_date, end_date, client_id=None):
+    """
+    SQL and params for every detail line of the cash, inventory and asset
+    documents in a date range that post to an account (and client, if given),
+    see core/management/sql/report_ledger_lines.sql.
+    """
+    return (
+        "SELECT * FROM report_ledger_lines(%s, %s::DATE, %s::DATE, %s)",
+        [account_id, begin_date, end_date, client_id]
+    )
+
+
+def _ledger_export_response(export_format, filename, account_id, begin_date, end_date, client_id=None, matching_only=False):
+    """
+    Stream ledger lines as CSV/XLSX through a server-side cursor. With
+    matching_only, only the lines posted to the account itself are exported.
+    """
+    row_filter = None
+    if matching_only:
+        row_filter = lambda row: row['IsMatchingAccount']
+    sql, params = _ledger_lines_query(account_id, begin_date, end_date, client_id)
+    rows = iter_export_rows(get_current_db(), sql, params, LEDGER_EXPORT_FIELDS, row_filter)
+    headers = [header for header, _ in LEDGER_EXPORT_FIELDS]
+    return streaming_export_response(export_format, filename, headers, rows, sheet_name='Ledger')
+
+
 @csrf_exempt
 @login_required
 def account_statement_detail(request):
@@ -8342,118 +8415,20 @@ def account_statement_detail(request):
                 'error': 'Account not found'
             }, status=404)
         
+        export_format = get_export_format(request)
+        if export_format:
+            return _ledger_export_response(
+                export_format, f'account_statement_{account.AccountCode}_{begin_date}_{end_date}',
+                account_id, begin_date, end_date
+            )
+        
         # Get documents with all their details where at least one detail matches the account
         try:
             db_alias = get_current_db()
             try:
                 with connections[db_alias].cursor() as cursor:
-                    # First, get all cash documents with their details
-                    cursor.execute("""
-                SELECT 
-                    cd."DocumentId",
-                    cd."DocumentDate",
-                    cd."DocumentNo",
-                    dt."Description" as DocumentType,
-                    COALESCE(cd."Description", '') as DocumentDescription,
-                    cdd."DocumentDetailId",
-                    a."AccountCode",
-                    a."AccountName",
-                    COALESCE(c."ClientCode", '') as ClientCode,
-                    COALESCE(c."ClientName", '') as ClientName,
-                    COALESCE(cur."Currency_name", '') as currencyname,
-                    COALESCE(cdd."CurrencyExchange", 1.0) as currencyexchange,
-                    cdd."CurrencyAmount",
-                    cdd."DebitAmount",
-                    cdd."CreditAmount",
-                    cdd."IsDebit",
-                    'Cash' as DocumentCategory
-                FROM cash_document cd
-                INNER JOIN cash_document_detail cdd ON cd."DocumentId" = cdd."DocumentId"
-                INNER JOIN ref_account a ON cdd."AccountId" = a."AccountId"
-                LEFT JOIN ref_client c ON cdd."ClientId" = c."ClientId"
-                LEFT JOIN ref_currency cur ON cdd."CurrencyId" = cur."CurrencyId"
-                INNER JOIN ref_document_type dt ON cd."DocumentTypeId" = dt."DocumentTypeId"
-                WHERE cd."DocumentId" IN (
-                    SELECT DISTINCT "DocumentId" 
-                    FROM cash_document_detail 
-                    WHERE "AccountId" = %s
-                )
-                AND cd."DocumentDate" >= %s 
-                AND cd."DocumentDate" <= %s 
-                AND cd."IsDelete" = false
-                
-                UNION ALL
-                
-                SELECT 
-                    id."DocumentId",
-                    id."DocumentDate",
-                    id."DocumentNo",
-                    dt."Description" as DocumentType,
-                    COALESCE(id."Description", '') as DocumentDescription,
-                    idd."DocumentDetailId",
-                    a."AccountCode",
-                    a."AccountName",
-                    COALESCE(c."ClientCode", '') as ClientCode,
-                    COALESCE(c."ClientName", '') as ClientName,
-                    COALESCE(cur."Currency_name", '') as currencyname,
-                    COALESCE(idd."CurrencyExchange", 1.0) as currencyexchange,
-                    idd."CurrencyAmount",
-                    idd."DebitAmount",
-                    idd."CreditAmount",
-                    idd."IsDebit",
-                    'Inventory' as DocumentCategory
-                FROM inv_document id
-                INNER JOIN inv_document_detail idd ON id."DocumentId" = idd."DocumentId"
-                INNER JOIN ref_account a ON idd."AccountId" = a."AccountId"
-                LEFT JOIN ref_client c ON idd."ClientId" = c."ClientId"
-                LEFT JOIN ref_currency cur ON idd."CurrencyId" = cur."CurrencyId"
-                INNER JOIN ref_document_type dt ON id."DocumentTypeId" = dt."DocumentTypeId"
-                WHERE id."DocumentId" IN (
-                    SELECT DISTINCT "DocumentId" 
-                    FROM inv_document_detail 
-                    WHERE "AccountId" = %s
-                )
-                AND id."DocumentDate" >= %s 
-                AND id."DocumentDate" <= %s 
-                AND id."IsDelete" = false
-                
-                UNION ALL
-                
-                SELECT 
-                    ad."DocumentId",
-                    ad."DocumentDate",
-                    ad."DocumentNo",
-                    dt."Description" as DocumentType,
-                    COALESCE(ad."Description", '') as DocumentDescription,
-                    add."DocumentDetailId",
-                    a."AccountCode",
-                    a."AccountName",
-                    COALESCE(c."ClientCode", '') as ClientCode,
-                    COALESCE(c."ClientName", '') as ClientName,
-                    COALESCE(cur."Currency_name", '') as currencyname,
-                    COALESCE(add."CurrencyExchange", 1.0) as currencyexchange,
-                    add."CurrencyAmount",
-                    add."DebitAmount",
-                    add."CreditAmount",
-                    add."IsDebit",
-                    'Asset' as DocumentCategory
-                FROM ast_document ad
-                INNER JOIN ast_document_detail add ON ad."DocumentId" = add."DocumentId"
-                INNER JOIN ref_account a ON add."AccountId" = a."AccountId"
-                LEFT JOIN ref_client c ON add."ClientId" = c."ClientId"
-                LEFT JOIN ref_currency cur ON add."CurrencyId" = cur."CurrencyId"
-                INNER JOIN ref_document_type dt ON ad."DocumentTypeId" = dt."DocumentTypeId"
-                WHERE ad."DocumentId" IN (
-                    SELECT DISTINCT "DocumentId" 
-                    FROM ast_document_detail 
-                    WHERE "AccountId" = %s
-                )
-                AND ad."DocumentDate" >= %s 
-                AND ad."DocumentDate" <= %s 
-                AND ad."IsDelete" = false
-                
-                ORDER BY "DocumentDate", "DocumentNo", "DocumentDetailId"
-                """, [account_id, begin_date, end_date, account_id, begin_date, end_date, account_id, begin_date, end_date])
+                    # All lines of the documents that post to the account
+                    cursor.execute(*_ledger_lines_query(account_id, begin_date, end_date))
                     
                     # Get column names
                     columns = [col[0] for col in cursor.description]
@@ -8481,9 +8456,9 @@ def account_statement_detail(request):
                             'DocumentId': doc_id,
                             'DocumentNo': detail['DocumentNo'],
                             'DocumentDate': detail['DocumentDate'],
-                            'DocumentType': detail['documenttype'],
-                            'DocumentDescription': detail['documentdescription'],
-                            'DocumentCategory': detail['documentcategory'],
+                            'DocumentType': detail['DocumentType'],
+                            'DocumentDescription': detail['Description'],
+                            'DocumentCategory': detail['DocumentCategory'],
                             'TotalAmount': 0,
                             'details': []
                         }
@@ -8493,15 +8468,15 @@ def account_statement_detail(request):
                         'DetailId': detail['DocumentDetailId'],
                         'AccountCode': detail['AccountCode'],
                         'AccountName': detail['AccountName'],
-                        'ClientCode': detail['clientcode'],
-                        'ClientName': detail['clientname'],
-                        'CurrencyName': detail.get('currencyname') or '',
-                        'CurrencyExchange': float(detail.get('currencyexchange') or 1.0),
-                        'CurrencyAmount': float(detail['CurrencyAmount'] or 0),
-                        'DebitAmount': float(detail['DebitAmount'] or 0),
-                        'CreditAmount': float(detail['CreditAmount'] or 0),
+                        'ClientCode': detail['ClientCode'],
+                        'ClientName': detail['ClientName'],
+                        'CurrencyName': detail['CurrencyName'],
+                        'CurrencyExchange': detail['CurrencyExchange'],
+                        'CurrencyAmount': detail['CurrencyAmount'],
+                        'DebitAmount': detail['DebitAmount'],
+                        'CreditAmount': detail['CreditAmount'],
                         'IsDebit': detail['IsDebit'],
-                        'IsMatchingAccount': detail['AccountCode'] == account.AccountCode
+                        'IsMatchingAccount': detail['IsMatchingAccount']
                     }
                     
                     documents[doc_id]['details'].append(detail_info)
@@ -8622,6 +8597,13 @@ def subsidiary_ledger(request):
                     except RefClient.DoesNotExist:
                         client_info = None
                 
+                export_format = get_export_format(request)
+                if export_format and not error_message:
+                    return _ledger_export_response(
+                        export_format, f'subsidiary_ledger_{account_info.AccountCode}_{begin_date}_{end_date}',
+                        account_id, begin_date, end_date, client_id
+                    )
+                
                 # Execute the subsidiary ledger query
                 if not error_message:
                     try:
@@ -8629,231 +8611,7 @@ def subsidiary_ledger(request):
                         try:
                             with connections[db_alias].cursor() as cursor:
                                 # Use the same SQL query pattern as subsidiary_ledger_detail API
-                                if client_id:
-                                    # With client filter
-                                    cursor.execute("""
-                                    SELECT 
-                                        cd."DocumentId",
-                                        cd."DocumentDate",
-                                        cd."DocumentNo",
-                                        dt."Description" as DocumentType,
-                                        COALESCE(cd."Description", '') as DocumentDescription,
-                                        cdd."DocumentDetailId",
-                                        a."AccountCode",
-                                        a."AccountName",
-                                        COALESCE(c."ClientCode", '') as ClientCode,
-                                        COALESCE(c."ClientName", '') as ClientName,
-                                        COALESCE(cur."Currency_name", '') as currencyname,
-                                        COALESCE(cdd."CurrencyExchange", 1.0) as currencyexchange,
-                                        cdd."CurrencyAmount",
-                                        cdd."DebitAmount",
-                                        cdd."CreditAmount",
-                                        cdd."IsDebit",
-                                        'Cash' as DocumentCategory
-                                    FROM cash_document cd
-                                    INNER JOIN cash_document_detail cdd ON cd."DocumentId" = cdd."DocumentId"
-                                    INNER JOIN ref_account a ON cdd."AccountId" = a."AccountId"
-                                    LEFT JOIN ref_client c ON cdd."ClientId" = c."ClientId"
-                                    LEFT JOIN ref_currency cur ON cdd."CurrencyId" = cur."CurrencyId"
-                                    INNER JOIN ref_document_type dt ON cd."DocumentTypeId" = dt."DocumentTypeId"
-                                    WHERE cd."DocumentId" IN (
-                                        SELECT DISTINCT "DocumentId" 
-                                        FROM cash_document_detail 
-                                        WHERE "AccountId" = %s AND "ClientId" = %s
-                                    )
-                                    AND cd."DocumentDate" >= %s 
-                                    AND cd."DocumentDate" <= %s 
-                                    AND cd."IsDelete" = false
-                                    AND cdd."ClientId" = %s
-                                    
-                                    UNION ALL
-                                    
-                                    SELECT 
-                                        id."DocumentId",
-                                        id."DocumentDate",
-                                        id."DocumentNo",
-                                        dt."Description" as DocumentType,
-                                        COALESCE(id."Description", '') as DocumentDescription,
-                                        idd."DocumentDetailId",
-                                        a."AccountCode",
-                                        a."AccountName",
-                                        COALESCE(c."ClientCode", '') as ClientCode,
-                                        COALESCE(c."ClientName", '') as ClientName,
-                                        COALESCE(cur."Currency_name", '') as currencyname,
-                                        COALESCE(idd."CurrencyExchange", 1.0) as currencyexchange,
-                                        idd."CurrencyAmount",
-                                        idd."DebitAmount",
-                                        idd."CreditAmount",
-                                        idd."IsDebit",
-                                        'Inventory' as DocumentCategory
-                                    FROM inv_document id
-                                    INNER JOIN inv_document_detail idd ON id."DocumentId" = idd."DocumentId"
-                                    INNER JOIN ref_account a ON idd."AccountId" = a."AccountId"
-                                    LEFT JOIN ref_client c ON idd."ClientId" = c."ClientId"
-                                    LEFT JOIN ref_currency cur ON idd."CurrencyId" = cur."CurrencyId"
-                                    INNER JOIN ref_document_type dt ON id."DocumentTypeId" = dt."DocumentTypeId"
-                                    WHERE id."DocumentId" IN (
-                                        SELECT DISTINCT "DocumentId" 
-                                        FROM inv_document_detail 
-                                        WHERE "AccountId" = %s AND "ClientId" = %s
-                                    )
-                                    AND id."DocumentDate" >= %s 
-                                    AND id."DocumentDate" <= %s 
-                                    AND id."IsDelete" = false
-                                    AND idd."ClientId" = %s
-                                    
-                                    UNION ALL
-                                    
-                                    SELECT 
-                                        ad."DocumentId",
-                                        ad."DocumentDate",
-                                        ad."DocumentNo",
-                                        dt."Description" as DocumentType,
-                                        COALESCE(ad."Description", '') as DocumentDescription,
-                                        add."DocumentDetailId",
-                                        a."AccountCode",
-                                        a."AccountName",
-                                        COALESCE(c."ClientCode", '') as ClientCode,
-                                        COALESCE(c."ClientName", '') as ClientName,
-                                        COALESCE(cur."Currency_name", '') as currencyname,
-                                        COALESCE(add."CurrencyExchange", 1.0) as currencyexchange,
-                                        add."CurrencyAmount",
-                                        add."DebitAmount",
-                                        add."CreditAmount",
-                                        add."IsDebit",
-                                        'Asset' as DocumentCategory
-                                    FROM ast_document ad
-                                    INNER JOIN ast_document_detail add ON ad."DocumentId" = add."DocumentId"
-                                    INNER JOIN ref_account a ON add."AccountId" = a."AccountId"
-                                    LEFT JOIN ref_client c ON add."ClientId" = c."ClientId"
-                                    LEFT JOIN ref_currency cur ON add."CurrencyId" = cur."CurrencyId"
-                                    INNER JOIN ref_document_type dt ON ad."DocumentTypeId" = dt."DocumentTypeId"
-                                    WHERE ad."DocumentId" IN (
-                                        SELECT DISTINCT "DocumentId" 
-                                        FROM ast_document_detail 
-                                        WHERE "AccountId" = %s AND "ClientId" = %s
-                                    )
-                                    AND ad."DocumentDate" >= %s 
-                                    AND ad."DocumentDate" <= %s 
-                                    AND ad."IsDelete" = false
-                                    AND add."ClientId" = %s
-                                    
-                                    ORDER BY "DocumentDate", "DocumentNo", "DocumentDetailId"
-                                    """, 
-                                    [account_id, client_id, begin_date, end_date, client_id,
-                                     account_id, client_id, begin_date, end_date, client_id,
-                                     account_id, client_id, begin_date, end_date, client_id])
-                                else:
-                                    # Without client filter
-                                    cursor.execute("""
-                                    SELECT 
-                                        cd."DocumentId",
-                                        cd."DocumentDate",
-                                        cd."DocumentNo",
-                                        dt."Description" as DocumentType,
-                                        COALESCE(cd."Description", '') as DocumentDescription,
-                                        cdd."DocumentDetailId",
-                                        a."AccountCode",
-                                        a."AccountName",
-                                        COALESCE(c."ClientCode", '') as ClientCode,
-                                        COALESCE(c."ClientName", '') as ClientName,
-                                        COALESCE(cur."Currency_name", '') as currencyname,
-                                        COALESCE(cdd."CurrencyExchange", 1.0) as currencyexchange,
-                                        cdd."CurrencyAmount",
-                                        cdd."DebitAmount",
-                                        cdd."CreditAmount",
-                                        cdd."IsDebit",
-                                        'Cash' as DocumentCategory
-                                    FROM cash_document cd
-                                    INNER JOIN cash_document_detail cdd ON cd."DocumentId" = cdd."DocumentId"
-                                    INNER JOIN ref_account a ON cdd."AccountId" = a."AccountId"
-                                    LEFT JOIN ref_client c ON cdd."ClientId" = c."ClientId"
-                                    LEFT JOIN ref_currency cur ON cdd."CurrencyId" = cur."CurrencyId"
-                                    INNER JOIN ref_document_type dt ON cd."DocumentTypeId" = dt."DocumentTypeId"
-                                    WHERE cd."DocumentId" IN (
-                                        SELECT DISTINCT "DocumentId" 
-                                        FROM cash_document_detail 
-                                        WHERE "AccountId" = %s
-                                    )
-                                    AND cd."DocumentDate" >= %s 
-                                    AND cd."DocumentDate" <= %s 
-                                    AND cd."IsDelete" = false
-                                    
-                                    UNION ALL
-                                    
-                                    SELECT 
-                                        id."DocumentId",
-                                        id."DocumentDate",
-                                        id."DocumentNo",
-                                        dt."Description" as DocumentType,
-                                        COALESCE(id."Description", '') as DocumentDescription,
-                                        idd."DocumentDetailId",
-                                        a."AccountCode",
-                                        a."AccountName",
-                                        COALESCE(c."ClientCode", '') as ClientCode,
-                                        COALESCE(c."ClientName", '') as ClientName,
-                                        COALESCE(cur."Currency_name", '') as currencyname,
-                                        COALESCE(idd."CurrencyExchange", 1.0) as currencyexchange,
-                                        idd."CurrencyAmount",
-                                        idd."DebitAmount",
-                                        idd."CreditAmount",
-                                        idd."IsDebit",
-                                        'Inventory' as DocumentCategory
-                                    FROM inv_document id
-                                    INNER JOIN inv_document_detail idd ON id."DocumentId" = idd."DocumentId"
-                                    INNER JOIN ref_account a ON idd."AccountId" = a."AccountId"
-                                    LEFT JOIN ref_client c ON idd."ClientId" = c."ClientId"
-                                    LEFT JOIN ref_currency cur ON idd."CurrencyId" = cur."CurrencyId"
-                                    INNER JOIN ref_document_type dt ON id."DocumentTypeId" = dt."DocumentTypeId"
-                                    WHERE id."DocumentId" IN (
-                                        SELECT DISTINCT "DocumentId" 
-                                        FROM inv_document_detail 
-                                        WHERE "AccountId" = %s
-                                    )
-                                    AND id."DocumentDate" >= %s 
-                                    AND id."DocumentDate" <= %s 
-                                    AND id."IsDelete" = false
-                                    
-                                    UNION ALL
-                                    
-                                    SELECT 
-                                        ad."DocumentId",
-                                        ad."DocumentDate",
-                                        ad."DocumentNo",
-                                        dt."Description" as DocumentType,
-                                        COALESCE(ad."Description", '') as DocumentDescription,
-                                        add."DocumentDetailId",
-                                        a."AccountCode",
-                                        a."AccountName",
-                                        COALESCE(c."ClientCode", '') as ClientCode,
-                                        COALESCE(c."ClientName", '') as ClientName,
-                                        COALESCE(cur."Currency_name", '') as currencyname,
-                                        COALESCE(add."CurrencyExchange", 1.0) as currencyexchange,
-                                        add."CurrencyAmount",
-                                        add."DebitAmount",
-                                        add."CreditAmount",
-                                        add."IsDebit",
-                                        'Asset' as DocumentCategory
-                                    FROM ast_document ad
-                                    INNER JOIN ast_document_detail add ON ad."DocumentId" = add."DocumentId"
-                                    INNER JOIN ref_account a ON add."AccountId" = a."AccountId"
-                                    LEFT JOIN ref_client c ON add."ClientId" = c."ClientId"
-                                    LEFT JOIN ref_currency cur ON add."CurrencyId" = cur."CurrencyId"
-                                    INNER JOIN ref_document_type dt ON ad."DocumentTypeId" = dt."DocumentTypeId"
-                                    WHERE ad."DocumentId" IN (
-                                        SELECT DISTINCT "DocumentId" 
-                                        FROM ast_document_detail 
-                                        WHERE "AccountId" = %s
-                                    )
-                                    AND ad."DocumentDate" >= %s 
-                                    AND ad."DocumentDate" <= %s 
-                                    AND ad."IsDelete" = false
-                                    
-                                    ORDER BY "DocumentDate", "DocumentNo", "DocumentDetailId"
-                                    """, 
-                                    [account_id, begin_date, end_date,
-                                     account_id, begin_date, end_date,
-                                     account_id, begin_date, end_date])
+                                cursor.execute(*_ledger_lines_query(account_id, begin_date, end_date, client_id))
                                 
                                 # Get column names
                                 columns = [col[0] for col in cursor.description]
@@ -8861,55 +8619,8 @@ def subsidiary_ledger(request):
                                 # Fetch all results
                                 results = cursor.fetchall()
                                 
-                                # Convert to list of dictionaries with proper column name mapping
-                                column_mapping = {
-                                    'documentdate': 'DocumentDate',
-                                    'documentno': 'DocumentNo',
-                                    'documentid': 'DocumentId',
-                                    'documenttype': 'DocumentType',
-                                    'documentdescription': 'Description',
-                                    'documentcategory': 'DocumentCategory',
-                                    'clientname': 'ClientName',
-                                    'currencyname': 'CurrencyName',
-                                    'currencyexchange': 'CurrencyExchange',
-                                    'currencyamount': 'CurrencyAmount',
-                                    'debitamount': 'DebitAmount',
-                                    'creditamount': 'CreditAmount'
-                                }
-                                
-                                # Map DocumentCategory to DocumentSource
-                                for row in results:
-                                    row_dict = {}
-                                    document_category = None
-                                    for i, col_name in enumerate(columns):
-                                        mapped_name = column_mapping.get(col_name.lower(), col_name)
-                                        value = row[i]
-                                        
-                                        if mapped_name == 'DocumentCategory':
-                                            document_category = value
-                                            # Map category to source
-                                            if value == 'Cash':
-                                                row_dict['DocumentSource'] = 'cash'
-                                            elif value == 'Inventory':
-                                                row_dict['DocumentSource'] = 'inv'
-                                            elif value == 'Asset':
-                                                row_dict['DocumentSource'] = 'ast'
-                                            else:
-                                                row_dict['DocumentSource'] = value.lower() if value else 'cash'
-                                        else:
-                                            row_dict[mapped_name] = value
-                                    
-                                    # Add DocumentTypeId (not available in query, set to None)
-                                    row_dict['DocumentTypeId'] = None
-                                    
-                                    subsidiary_ledger_data.append(row_dict)
-                                
-                                # Convert Decimal values to float for JSON serialization
-                                from decimal import Decimal
-                                for item in subsidiary_ledger_data:
-                                    for key, value in item.items():
-                                        if isinstance(value, Decimal):
-                                            item[key] = float(value)
+                                # The report function already returns the template's column names and float amounts
+                                subsidiary_ledger_data = [dict(zip(columns, row)) for row in results]
                                         
                         finally:
                             connections[db_alias].close()
@@ -8927,6 +8638,7 @@ def subsidiary_ledger(request):
             'end_date': end_date,
             'error_message': error_message,
             'report_title': 'АВЛАГА ӨГЛӨГИЙН ТУСЛАХ ДЭВТЭР',
+            'export_enabled': True,
         }
         
         return render(request, 'core/trial_edit_account_and_sub_ledger.html', context)
@@ -9012,237 +8724,21 @@ def subsidiary_ledger_detail(request):
             except RefClient.DoesNotExist:
                 client_info = None
         
+        export_format = get_export_format(request)
+        if export_format:
+            # Same rows as the JSON response: only the lines posted to the account
+            return _ledger_export_response(
+                export_format, f'subsidiary_ledger_{account.AccountCode}_{begin_date}_{end_date}',
+                account_id, begin_date, end_date, client_id, matching_only=True
+            )
+        
         # Get documents with all their details where at least one detail matches the account and client (if provided)
         try:
             db_alias = get_current_db()
             try:
                 with connections[db_alias].cursor() as cursor:
                     # Build the SQL query with proper client filtering
-                    if client_id:
-                        # With client filter
-                        cursor.execute("""
-                        SELECT 
-                            cd."DocumentId",
-                            cd."DocumentDate",
-                            cd."DocumentNo",
-                            dt."Description" as DocumentType,
-                            COALESCE(cd."Description", '') as DocumentDescription,
-                            cdd."DocumentDetailId",
-                            a."AccountCode",
-                            a."AccountName",
-                            COALESCE(c."ClientCode", '') as ClientCode,
-                            COALESCE(c."ClientName", '') as ClientName,
-                            COALESCE(cur."Currency_name", '') as currencyname,
-                            COALESCE(cdd."CurrencyExchange", 1.0) as currencyexchange,
-                            cdd."CurrencyAmount",
-                            cdd."DebitAmount",
-                            cdd."CreditAmount",
-                            cdd."IsDebit",
-                            'Cash' as DocumentCategory
-                        FROM cash_document cd
-                        INNER JOIN cash_document_detail cdd ON cd."DocumentId" = cdd."DocumentId"
-                        INNER JOIN ref_account a ON cdd."AccountId" = a."AccountId"
-                        LEFT JOIN ref_client c ON cdd."ClientId" = c."ClientId"
-                        LEFT JOIN ref_currency cur ON cdd."CurrencyId" = cur."CurrencyId"
-                        INNER JOIN ref_document_type dt ON cd."DocumentTypeId" = dt."DocumentTypeId"
-                        WHERE cd."DocumentId" IN (
-                            SELECT DISTINCT "DocumentId" 
-                            FROM cash_document_detail 
-                            WHERE "AccountId" = %s AND "ClientId" = %s
-                        )
-                        AND cd."DocumentDate" >= %s 
-                        AND cd."DocumentDate" <= %s 
-                        AND cd."IsDelete" = false
-                        AND cdd."ClientId" = %s
-                        
-                        UNION ALL
-                        
-                        SELECT 
-                            id."DocumentId",
-                            id."DocumentDate",
-                            id."DocumentNo",
-                            dt."Description" as DocumentType,
-                            COALESCE(id."Description", '') as DocumentDescription,
-                            idd."DocumentDetailId",
-                            a."AccountCode",
-                            a."AccountName",
-                            COALESCE(c."ClientCode", '') as ClientCode,
-                            COALESCE(c."ClientName", '') as ClientName,
-                            COALESCE(cur."Currency_name", '') as currencyname,
-                            COALESCE(idd."CurrencyExchange", 1.0) as currencyexchange,
-                            idd."CurrencyAmount",
-                            idd."DebitAmount",
-                            idd."CreditAmount",
-                            idd."IsDebit",
-                            'Inventory' as DocumentCategory
-                        FROM inv_document id
-                        INNER JOIN inv_document_detail idd ON id."DocumentId" = idd."DocumentId"
-                        INNER JOIN ref_account a ON idd."AccountId" = a."AccountId"
-                        LEFT JOIN ref_client c ON idd."ClientId" = c."ClientId"
-                        LEFT JOIN ref_currency cur ON idd."CurrencyId" = cur."CurrencyId"
-                        INNER JOIN ref_document_type dt ON id."DocumentTypeId" = dt."DocumentTypeId"
-                        WHERE id."DocumentId" IN (
-                            SELECT DISTINCT "DocumentId" 
-                            FROM inv_document_detail 
-                            WHERE "AccountId" = %s AND "ClientId" = %s
-                        )
-                        AND id."DocumentDate" >= %s 
-                        AND id."DocumentDate" <= %s 
-                        AND id."IsDelete" = false
-                        AND idd."ClientId" = %s
-                        
-                        UNION ALL
-                        
-                        SELECT 
-                            ad."DocumentId",
-                            ad."DocumentDate",
-                            ad."DocumentNo",
-                            dt."Description" as DocumentType,
-                            COALESCE(ad."Description", '') as DocumentDescription,
-                            add."DocumentDetailId",
-                            a."AccountCode",
-                            a."AccountName",
-                            COALESCE(c."ClientCode", '') as ClientCode,
-                            COALESCE(c."ClientName", '') as ClientName,
-                            COALESCE(cur."Currency_name", '') as currencyname,
-                            COALESCE(add."CurrencyExchange", 1.0) as currencyexchange,
-                            add."CurrencyAmount",
-                            add."DebitAmount",
-                            add."CreditAmount",
-                            add."IsDebit",
-                            'Asset' as DocumentCategory
-                        FROM ast_document ad
-                        INNER JOIN ast_document_detail add ON ad."DocumentId" = add."DocumentId"
-                        INNER JOIN ref_account a ON add."AccountId" = a."AccountId"
-                        LEFT JOIN ref_client c ON add."ClientId" = c."ClientId"
-                        LEFT JOIN ref_currency cur ON add."CurrencyId" = cur."CurrencyId"
-                        INNER JOIN ref_document_type dt ON ad."DocumentTypeId" = dt."DocumentTypeId"
-                        WHERE ad."DocumentId" IN (
-                            SELECT DISTINCT "DocumentId" 
-                            FROM ast_document_detail 
-                            WHERE "AccountId" = %s AND "ClientId" = %s
-                        )
-                        AND ad."DocumentDate" >= %s 
-                        AND ad."DocumentDate" <= %s 
-                        AND ad."IsDelete" = false
-                        AND add."ClientId" = %s
-                        
-                        ORDER BY "DocumentDate", "DocumentNo", "DocumentDetailId"
-                        """, 
-                        [account_id, client_id, begin_date, end_date, client_id,
-                         account_id, client_id, begin_date, end_date, client_id,
-                         account_id, client_id, begin_date, end_date, client_id])
-                    else:
-                        # Without client filter
-                        cursor.execute("""
-                        SELECT 
-                            cd."DocumentId",
-                            cd."DocumentDate",
-                            cd."DocumentNo",
-                            dt."Description" as DocumentType,
-                            COALESCE(cd."Description", '') as DocumentDescription,
-                            cdd."DocumentDetailId",
-                            a."AccountCode",
-                            a."AccountName",
-                            COALESCE(c."ClientCode", '') as ClientCode,
-                            COALESCE(c."ClientName", '') as ClientName,
-                            COALESCE(cur."Currency_name", '') as currencyname,
-                            COALESCE(cdd."CurrencyExchange", 1.0) as currencyexchange,
-                            cdd."CurrencyAmount",
-                            cdd."DebitAmount",
-                            cdd."CreditAmount",
-                            cdd."IsDebit",
-                            'Cash' as DocumentCategory
-                        FROM cash_document cd
-                        INNER JOIN cash_document_detail cdd ON cd."DocumentId" = cdd."DocumentId"
-                        INNER JOIN ref_account a ON cdd."AccountId" = a."AccountId"
-                        LEFT JOIN ref_client c ON cdd."ClientId" = c."ClientId"
-                        LEFT JOIN ref_currency cur ON cdd."CurrencyId" = cur."CurrencyId"
-                        INNER JOIN ref_document_type dt ON cd."DocumentTypeId" = dt."DocumentTypeId"
-                        WHERE cd."DocumentId" IN (
-                            SELECT DISTINCT "DocumentId" 
-                            FROM cash_document_detail 
-                            WHERE "AccountId" = %s
-                        )
-                        AND cd."DocumentDate" >= %s 
-                        AND cd."DocumentDate" <= %s 
-                        AND cd."IsDelete" = false
-                        
-                        UNION ALL
-                        
-                        SELECT 
-                            id."DocumentId",
-                            id."DocumentDate",
-                            id."DocumentNo",
-                            dt."Description" as DocumentType,
-                            COALESCE(id."Description", '') as DocumentDescription,
-                            idd."DocumentDetailId",
-                            a."AccountCode",
-                            a."AccountName",
-                            COALESCE(c."ClientCode", '') as ClientCode,
-                            COALESCE(c."ClientName", '') as ClientName,
-                            COALESCE(cur."Currency_name", '') as currencyname,
-                            COALESCE(idd."CurrencyExchange", 1.0) as currencyexchange,
-                            idd."CurrencyAmount",
-                            idd."DebitAmount",
-                            idd."CreditAmount",
-                            idd."IsDebit",
-                            'Inventory' as DocumentCategory
-                        FROM inv_document id
-                        INNER JOIN inv_document_detail idd ON id."DocumentId" = idd."DocumentId"
-                        INNER JOIN ref_account a ON idd."AccountId" = a."AccountId"
-                        LEFT JOIN ref_client c ON idd."ClientId" = c."ClientId"
-                        LEFT JOIN ref_currency cur ON idd."CurrencyId" = cur."CurrencyId"
-                        INNER JOIN ref_document_type dt ON id."DocumentTypeId" = dt."DocumentTypeId"
-                        WHERE id."DocumentId" IN (
-                            SELECT DISTINCT "DocumentId" 
-                            FROM inv_document_detail 
-                            WHERE "AccountId" = %s
-                        )
-                        AND id."DocumentDate" >= %s 
-                        AND id."DocumentDate" <= %s 
-                        AND id."IsDelete" = false
-                        
-                        UNION ALL
-                        
-                        SELECT 
-                            ad."DocumentId",
-                            ad."DocumentDate",
-                            ad."DocumentNo",
-                            dt."Description" as DocumentType,
-                            COALESCE(ad."Description", '') as DocumentDescription,
-                            add."DocumentDetailId",
-                            a."AccountCode",
-                            a."AccountName",
-                            COALESCE(c."ClientCode", '') as ClientCode,
-                            COALESCE(c."ClientName", '') as ClientName,
-                            COALESCE(cur."Currency_name", '') as currencyname,
-                            COALESCE(add."CurrencyExchange", 1.0) as currencyexchange,
-                            add."CurrencyAmount",
-                            add."DebitAmount",
-                            add."CreditAmount",
-                            add."IsDebit",
-                            'Asset' as DocumentCategory
-                        FROM ast_document ad
-                        INNER JOIN ast_document_detail add ON ad."DocumentId" = add."DocumentId"
-                        INNER JOIN ref_account a ON add."AccountId" = a."AccountId"
-                        LEFT JOIN ref_client c ON add."ClientId" = c."ClientId"
-                        LEFT JOIN ref_currency cur ON add."CurrencyId" = cur."CurrencyId"
-                        INNER JOIN ref_document_type dt ON ad."DocumentTypeId" = dt."DocumentTypeId"
-                        WHERE ad."DocumentId" IN (
-                            SELECT DISTINCT "DocumentId" 
-                            FROM ast_document_detail 
-                            WHERE "AccountId" = %s
-                        )
-                        AND ad."DocumentDate" >= %s 
-                        AND ad."DocumentDate" <= %s 
-                        AND ad."IsDelete" = false
-                        
-                        ORDER BY "DocumentDate", "DocumentNo", "DocumentDetailId"
-                        """, 
-                        [account_id, begin_date, end_date,
-                         account_id, begin_date, end_date,
-                         account_id, begin_date, end_date])
+                    cursor.execute(*_ledger_lines_query(account_id, begin_date, end_date, client_id))
                     
                     # Get column names
                     columns = [col[0] for col in cursor.description]
@@ -9268,28 +8764,28 @@ def subsidiary_ledger_detail(request):
                                 'DocumentId': doc_id,
                                 'DocumentNo': detail['DocumentNo'],
                                 'DocumentDate': detail['DocumentDate'],
-                                'DocumentType': detail['documenttype'],
-                                'DocumentDescription': detail['documentdescription'],
-                                'DocumentCategory': detail['documentcategory'],
+                                'DocumentType': detail['DocumentType'],
+                                'DocumentDescription': detail['Description'],
+                                'DocumentCategory': detail['DocumentCategory'],
                                 'TotalAmount': 0,
                                 'details': []
                             }
                         
                         # Add detail to document (only include details that match the account)
-                        if detail['AccountCode'] == account.AccountCode:
+                        if detail['IsMatchingAccount']:
                             detail_info = {
                                 'DetailId': detail['DocumentDetailId'],
                                 'AccountCode': detail['AccountCode'],
                                 'AccountName': detail['AccountName'],
-                                'ClientCode': detail['clientcode'],
-                                'ClientName': detail['clientname'],
-                                'CurrencyName': detail.get('currencyname') or '',
-                                'CurrencyExchange': float(detail.get('currencyexchange') or 1.0),
-                                'CurrencyAmount': float(detail['CurrencyAmount'] or 0),
-                                'DebitAmount': float(detail['DebitAmount'] or 0),
-                                'CreditAmount': float(detail['CreditAmount'] or 0),
+                                'ClientCode': detail['ClientCode'],
+                                'ClientName': detail['ClientName'],
+                                'CurrencyName': detail['CurrencyName'],
+                                'CurrencyExchange': detail['CurrencyExchange'],
+                                'CurrencyAmount': detail['CurrencyAmount'],
+                                'DebitAmount': detail['DebitAmount'],
+                                'CreditAmount': detail['CreditAmount'],
                                 'IsDebit': detail['IsDebit'],
-                                'IsMatchingAccount': detail['AccountCode'] == account.AccountCode
+                                'IsMatchingAccount': detail['IsMatchingAccount']
                             }
                             
                             documents[doc_id]['details'].append(detail_info)
@@ -9575,6 +9071,16 @@ def api_template_details(request, template_id):
         }, status=500)
 
 
+def _to_int_or_none(value):
+    """Coerce a JSON id value (int or numeric string) to int; None if missing or invalid."""
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
 def generate_cash_document_details(document, template_details, total_amount, vat_amount, net_amount):
     """
     Generate cash document detail records based on template logic.
@@ -9582,7 +9088,7 @@ def generate_cash_document_details(document, template_details, total_amount, vat
     
     Args:
         document: Cash_Document instance
-        template_details: QuerySet of Ref_Template_Detail objects
+        template_details: QuerySet or list of Ref_Template_Detail objects
         total_amount: Total amount in MNT (Decimal)
         vat_amount: VAT amount in MNT (Decimal)
         net_amount: Net amount in MNT (Decimal)
@@ -9600,7 +9106,7 @@ def generate_cash_document_details(document, template_details, total_amount, vat
     currency_exchange = Decimal('1.0')
     
     # If no template details, create a single detail row
-    if template_details is None or (template_details and template_details.count() == 0):
+    if template_details is None or (template_details and len(template_details) == 0):
         # Determine if debit or credit based on document type
         # Income documents (1,3,15,18): Debit main account
         # Expense documents (2,4,16,17): Credit main account
@@ -9730,6 +9236,29 @@ def api_cash_import_bulk(request):
                 'message': 'No rows provided for import'
             }, status=400)
         
+        # Resolve all referenced accounts, document types, clients and templates
+        # up front with one IN query each, so rows are validated in memory
+        account_codes = {str(row['AccountCode']) for row in rows if row.get('AccountCode')}
+        document_type_ids = {_to_int_or_none(row.get('DocumentTypeId')) for row in rows} - {None}
+        client_ids = {_to_int_or_none(row.get('ClientId')) for row in rows} - {None}
+        template_ids = {_to_int_or_none(row.get('TemplateId')) for row in rows} - {None}
+        
+        accounts_by_code = {
+            account.AccountCode: account
+            for account in Ref_Account.objects.filter(AccountCode__in=account_codes, IsDelete=False).only('AccountId', 'AccountCode')
+        }
+        doc_types_by_id = {
+            doc_type.DocumentTypeId: doc_type
+            for doc_type in Ref_Document_Type.objects.filter(DocumentTypeId__in=document_type_ids)
+        }
+        valid_client_ids = set(
+            RefClient.objects.filter(ClientId__in=client_ids, IsDelete=False).values_list('ClientId', flat=True)
+        )
+        templates_by_id = {
+            template.TemplateId: template
+            for template in Ref_Template.objects.filter(TemplateId__in=template_ids, IsDelete=False)
+        }
+        
         # Pre-validation: Check all required fields before starting transaction
         errors = []
         validated_rows = []
@@ -9753,24 +9282,19 @@ def api_cash_import_bulk(request):
                 continue
             
             # Lookup AccountId from AccountCode
-            try:
-                account = Ref_Account.objects.get(AccountCode=row['AccountCode'], IsDelete=False)
-                row['AccountId'] = account.AccountId
-            except Ref_Account.DoesNotExist:
+            account = accounts_by_code.get(str(row['AccountCode']))
+            if account is None:
                 errors.append(f'Row {i + 1}: AccountCode "{row["AccountCode"]}" not found')
                 continue
+            row['AccountId'] = account.AccountId
             
             # Validate DocumentTypeId exists
-            try:
-                doc_type = Ref_Document_Type.objects.get(DocumentTypeId=row['DocumentTypeId'])
-            except Ref_Document_Type.DoesNotExist:
+            if _to_int_or_none(row['DocumentTypeId']) not in doc_types_by_id:
                 errors.append(f'Row {i + 1}: DocumentTypeId {row["DocumentTypeId"]} not found')
                 continue
             
             # Validate ClientId exists
-            try:
-                client = RefClient.objects.get(ClientId=row['ClientId'], IsDelete=False)
-            except RefClient.DoesNotExist:
+            if _to_int_or_none(row['ClientId']) not in valid_client_ids:
                 errors.append(f'Row {i + 1}: ClientId {row["ClientId"]} not found')
                 continue
             
@@ -9780,15 +9304,9 @@ def api_cash_import_bulk(request):
             currency_amount = debit_amount + credit_amount
             currency_mnt = debit_amount + credit_amount
             
-            # Get TemplateId (can be null)
-            template_id = row.get('TemplateId') if row.get('TemplateId') else None
-            template = None
-            if template_id:
-                try:
-                    template = Ref_Template.objects.get(TemplateId=template_id, IsDelete=False)
-                except Ref_Template.DoesNotExist:
-                    template_id = None  # Ignore invalid TemplateId
-                    template = None
+            # Get TemplateId (can be null); invalid TemplateIds are ignored
+            template = templates_by_id.get(_to_int_or_none(row.get('TemplateId')))
+            template_id = template.TemplateId if template else None
             
             validated_rows.append({
                 'row_index': i,
@@ -9815,29 +9333,25 @@ def api_cash_import_bulk(request):
         # All rows validated, proceed with transaction
         imported_count = 0
         document_numbers = []
+        template_details_by_id = {}
         
         try:
             with transaction.atomic():
+                # Reserve DocumentNos for every document type with one atomic
+                # sequence update per type (released again if the import rolls back)
+                rows_per_type = {}
+                for validated_row in validated_rows:
+                    type_id = _to_int_or_none(validated_row['DocumentTypeId'])
+                    rows_per_type[type_id] = rows_per_type.get(type_id, 0) + 1
+                reserved_numbers = {
+                    type_id: iter(document_sequences.reserve(type_id, count))
+                    for type_id, count in rows_per_type.items()
+                }
+                
                 for validated_row in validated_rows:
                     # Generate DocumentNo
                     document_type_id = validated_row['DocumentTypeId']
-                    last_counter = Ref_Document_Counter.objects.filter(
-                        DocumentTypeId=document_type_id
-                    ).order_by('-DocumentNo').first()
-                    
-                    if last_counter:
-                        import re
-                        match = re.search(r'(\d+)$', last_counter.DocumentNo)
-                        if match:
-                            next_number = int(match.group(1)) + 1
-                            prefix = last_counter.DocumentNo[:match.start()]
-                            next_document_no = f"{prefix}{next_number:04d}"
-                        else:
-                            next_document_no = f"{last_counter.DocumentNo}001"
-                    else:
-                        doc_type = Ref_Document_Type.objects.get(DocumentTypeId=document_type_id)
-                        prefix = doc_type.DocumentTypeCode[:4] if doc_type.DocumentTypeCode else "DOC"
-                        next_document_no = f"{prefix}0001"
+                    next_document_no = next(reserved_numbers[_to_int_or_none(document_type_id)])
                     
                     document_numbers.append(next_document_no)
                     
@@ -9849,9 +9363,9 @@ def api_cash_import_bulk(request):
                             # Document types 1, 3, 15, 18 (Income) -> Payable VAT (ConstantID=10)
                             # Document types 2, 4, 16, 17 (Expense) -> Receivable VAT (ConstantID=9)
                             if validated_row['DocumentTypeId'] in [1, 3, 15, 18]:
-                                vat_constant = Ref_Constant.objects.get(ConstantID=10)  # Payable VAT
+                                vat_constant = get_constant(10)  # Payable VAT
                             else:
-                                vat_constant = Ref_Constant.objects.get(ConstantID=9)  # Receivable VAT
+                                vat_constant = get_constant(9)  # Receivable VAT
                             vat_account_id = int(vat_constant.ConstantName)
                         except (Ref_Constant.DoesNotExist, ValueError, TypeError):
                             # If VAT account cannot be determined, continue without VAT
@@ -9865,7 +9379,7 @@ def api_cash_import_bulk(request):
                     if validated_row['IsVat'] and vat_account_id:
                         try:
                             from .models import Ref_Constant
-                            vat_constant = Ref_Constant.objects.get(ConstantID=2)
+                            vat_constant = get_constant(2)
                             vat_percentage = Decimal(str(vat_constant.ConstantName))
                             # Calculate VAT: VAT = MNT - (MNT / (1 + VAT% / 100))
                             vat_amount = total_amount - (total_amount / (Decimal('1') + vat_percentage / Decimal('100')))
@@ -9900,12 +9414,15 @@ def api_cash_import_bulk(request):
                     )
                     cash_document.save()
                     
-                    # Fetch template details if template exists
+                    # Fetch template details if template exists (once per distinct template)
                     template_details = None
                     if validated_row['Template']:
-                        template_details = Ref_Template_Detail.objects.filter(
-                            TemplateId=validated_row['Template']
-                        ).select_related('AccountId', 'CashFlowId').order_by('TemplateDetailId')
+                        template_details = template_details_by_id.get(validated_row['TemplateId'])
+                        if template_details is None:
+                            template_details = list(Ref_Template_Detail.objects.filter(
+                                TemplateId=validated_row['Template']
+                            ).select_related('AccountId', 'CashFlowId').order_by('TemplateDetailId'))
+                            template_details_by_id[validated_row['TemplateId']] = template_details
                     
                     # Generate and save detail records
                     detail_records = generate_cash_document_details(
@@ -9989,8 +9506,8 @@ def api_exchange_rate_adjustment_bulk(request):
         
         # Get exchange gain/loss accounts from ref_constant
         try:
-            gain_constant = Ref_Constant.objects.get(ConstantID=11)
-            loss_constant = Ref_Constant.objects.get(ConstantID=12)
+            gain_constant = get_constant(11)
+            loss_constant = get_constant(12)
             gain_account_id = int(gain_constant.ConstantName)  # Convert ConstantName to integer
             loss_account_id = int(loss_constant.ConstantName)  # Convert ConstantName to integer
         except (Ref_Constant.DoesNotExist, ValueError) as e:
@@ -10100,29 +9617,12 @@ def api_exchange_rate_adjustment_bulk(request):
                     # Hard delete Cash_Document records
                     existing_documents.delete()
                 
-                # Get document counter for this document type
-                last_counter = Ref_Document_Counter.objects.filter(
-                    DocumentTypeId=document_type_id
-                ).order_by('-DocumentNo').first()
+                # Reserve all DocumentNos for this document type in one atomic sequence update
+                reserved_numbers = document_sequences.reserve(document_type_id, len(validated_rows))
                 
                 for idx, validated_row in enumerate(validated_rows):
                     # Generate DocumentNo
-                    if last_counter:
-                        match = re.search(r'(\d+)$', last_counter.DocumentNo)
-                        if match:
-                            next_number = int(match.group(1)) + 1 + idx
-                            prefix = last_counter.DocumentNo[:match.start()]
-                            next_document_no = f"{prefix}{next_number:04d}"
-                        else:
-                            next_document_no = f"{last_counter.DocumentNo}{idx+1:03d}"
-                    else:
-                        # Get document type for prefix
-                        try:
-                            doc_type = Ref_Document_Type.objects.get(DocumentTypeId=document_type_id)
-                            prefix = doc_type.DocumentTypeCode[:4] if doc_type.DocumentTypeCode else "EXCH"
-                        except:
-                            prefix = "EXCH"
-                        next_document_no = f"{prefix}{idx+1:04d}"
+                    next_document_no = reserved_numbers[idx]
                     
                     # Determine if profit or loss
                     is_profit = validated_row['Profit'] > 0
@@ -10238,6 +9738,7 @@ def api_exchange_rate_adjustment_bulk(request):
                     # Bulk create document details
                     if details_to_create:
                         Cash_DocumentDetail.objects.bulk_create(details_to_create)
+                        bump_ledger_version_on_commit()
                     
                     created_count += 1
                     document_numbers.append(next_document_no)
@@ -12318,89 +11819,188 @@ def template_management(request):
     return render(request, 'insurance/template.html')
 
 
+POLICY_LIST_PAGE_SIZE = 50
+POLICY_LIST_MAX_PAGE_SIZE = 200
+
+
+def _encode_policy_cursor(policy):
+    """Keyset cursor for policy_list: '<CreatedDate ISO>|<PolicyId>'"""
+    return f"{policy.CreatedDate.isoformat()}|{policy.PolicyId}"
+
+
+def _decode_policy_cursor(value):
+    """Parse a policy_list cursor into (CreatedDate, PolicyId); None if missing or invalid."""
+    from datetime import datetime
+    
+    if not value or '|' not in value:
+        return None
+    created_date, policy_id = value.rsplit('|', 1)
+    try:
+        return datetime.fromisoformat(created_date), int(policy_id)
+    except ValueError:
+        return None
+
+
 @login_required
 @permission_required('core.view_policy_main', raise_exception=True)
 def policy_list(request):
     """
     Display policy list with master-detail tables
-    Master: Policy information
-    Detail: Product/Item information for selected policy (from ins_policy_main_product_item)
+    Master: One keyset page of policies ordered by (CreatedDate, PolicyId) descending,
+            filtered server-side by PolicyNo, client, branch, channel and BeginDate range
+    Detail: Product/Item information for the selected policy is loaded on demand
+            from api_policy_details (ins_policy_main_product_item)
     """
-    from django.db.models import Q, Prefetch
+    from datetime import datetime
     
-    # Get selected policy ID from request
-    selected_policy_id = request.GET.get('policy_id')
-    selected_policy = None
-    detail_data = []
+    page_size = POLICY_LIST_PAGE_SIZE
+    try:
+        page_size = min(max(int(request.GET.get('page_size', page_size)), 1), POLICY_LIST_MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        pass
+    
+    filters = {
+        'policy_no': request.GET.get('policy_no', '').strip(),
+        'client': request.GET.get('client', '').strip(),
+        'branch_id': request.GET.get('branch_id', '').strip(),
+        'channel_id': request.GET.get('channel_id', '').strip(),
+        'date_from': request.GET.get('date_from', '').strip(),
+        'date_to': request.GET.get('date_to', '').strip(),
+    }
     
-    # Get all policies with related data
     policies = Policy_Main.objects.select_related(
-        'ClientId', 'PolicyTemplateId', 'CurrencyId', 
+        'ClientId', 'PolicyTemplateId', 'CurrencyId',
         'AgentBranchId', 'AgentChannelId', 'CreatedBy'
-    ).prefetch_related(
-        Prefetch(
-            'policy_products',
-            queryset=Policy_Main_Product.objects.select_related(
-                'ProductId__ProductTypeId__ProductGroupId'
-            ).prefetch_related(
-                Prefetch(
-                    'product_items',
-                    queryset=Policy_Main_Product_Item.objects.select_related(
-                        'ItemId'
-                    )
-                )
-            )
-        )
-    ).order_by('-CreatedDate')
+    )
     
-    # If a policy is selected, get its detail data
-    total_valuation = Decimal('0')
-    total_comm_amount = Decimal('0')
+    if filters['policy_no']:
+        policies = policies.filter(PolicyNo__icontains=filters['policy_no'])
+    if filters['client']:
+        policies = policies.filter(
+            Q(ClientId__ClientName__icontains=filters['client']) |
+            Q(ClientId__ClientCode__icontains=filters['client'])
+        )
+    if filters['branch_id'].isdigit():
+        policies = policies.filter(AgentBranchId_id=int(filters['branch_id']))
+    if filters['channel_id'].isdigit():
+        policies = policies.filter(AgentChannelId_id=int(filters['channel_id']))
+    for param, lookup in (('date_from', 'BeginDate__gte'), ('date_to', 'BeginDate__lte')):
+        if filters[param]:
+            try:
+                policies = policies.filter(**{lookup: datetime.strptime(filters[param], '%Y-%m-%d').date()})
+            except ValueError:
+                filters[param] = ''
+    
+    # Keyset pagination: 'after' moves to older policies, 'before' back to newer ones
+    after = _decode_policy_cursor(request.GET.get('after'))
+    before = _decode_policy_cursor(request.GET.get('before')) if after is None else None
+    
+    if before is not None:
+        created_date, policy_id = before
+        page = list(policies.filter(
+            Q(CreatedDate__gt=created_date) | Q(CreatedDate=created_date, PolicyId__gt=policy_id)
+        ).order_by('CreatedDate', 'PolicyId')[:page_size + 1])
+        has_newer = len(page) > page_size
+        page = page[:page_size][::-1]
+        has_older = True
+    else:
+        if after is not None:
+            created_date, policy_id = after
+            policies = policies.filter(
+                Q(CreatedDate__lt=created_date) | Q(CreatedDate=created_date, PolicyId__lt=policy_id)
+            )
+        page = list(policies.order_by('-CreatedDate', '-PolicyId')[:page_size + 1])
+        has_older = len(page) > page_size
+        page = page[:page_size]
+        has_newer = after is not None
     
-    if selected_policy_id:
-        try:
-            selected_policy = policies.get(PolicyId=selected_policy_id)
-            
-            # Build detail data - only product items, no risks
-            for policy_product in selected_policy.policy_products.all():
-                product = policy_product.ProductId
-                product_group = product.ProductTypeId.ProductGroupId if product and product.ProductTypeId else None
-                
-                for product_item in policy_product.product_items.all():
-                    item = product_item.ItemId
-                    valuation = product_item.Valuation or Decimal('0')
-                    comm_amount = product_item.CommAmount or Decimal('0')
-                    
-                    total_valuation += valuation
-                    total_comm_amount += comm_amount
-                    
-                    detail_data.append({
-                        'PolicyMainProductItemId': product_item.PolicyMainProductItemId,
-                        'ProductGroup': product_group.ProductGroupName if product_group else '-',
-                        'ProductName': product.ProductName if product else '-',
-                        'ItemName': item.ItemName if item else '-',
-                        'ItemCode': item.ItemCode if item else '-',
-                        'BeginDate': product_item.BeginDate,
-                        'EndDate': product_item.EndDate,
-                        'Valuation': product_item.Valuation,
-                        'CommPercent': product_item.CommPercent,
-                        'CommAmount': product_item.CommAmount
-                    })
-        except Policy_Main.DoesNotExist:
-            selected_policy = None
+    query_params = request.GET.copy()
+    for param in ('after', 'before', 'policy_id'):
+        query_params.pop(param, None)
+    base_query = query_params.urlencode()
     
     context = {
-        'policies': policies,
-        'selected_policy': selected_policy,
-        'selected_policy_id': selected_policy_id,
-        'detail_data': detail_data,
-        'total_valuation': total_valuation,
-        'total_comm_amount': total_comm_amount
+        'policies': page,
+        'selected_policy_id': request.GET.get('policy_id'),
+        'filters': filters,
+        'page_size': page_size,
+        'branches': Ref_Branch.objects.filter(IsActive=True).order_by('BranchName'),
+        'channels': Ref_Channel.objects.filter(IsActive=True).order_by('ChannelName'),
+        'next_cursor': _encode_policy_cursor(page[-1]) if page and has_older else '',
+        'prev_cursor': _encode_policy_cursor(page[0]) if page and has_newer else '',
+        'base_query': base_query,
     }
     
     return render(request, 'insurance/policy_list.html', context)
 
 
+@login_required
+@permission_required('core.view_policy_main', raise_exception=True)
+@require_http_methods(["GET"])
+def api_policy_details(request, policy_id):
+    """Product/Item detail rows for one policy (detail grid of policy_list)"""
+    from django.db.models import Prefetch
+    
+    policy = get_object_or_404(
+        Policy_Main.objects.prefetch_related(
+            Prefetch(
+                'policy_products',
+                queryset=Policy_Main_Product.objects.select_related(
+                    'ProductId__ProductTypeId__ProductGroupId'
+                ).prefetch_related(
+                    Prefetch(
+                        'product_items',
+                        queryset=Policy_Main_Product_Item.objects.select_related('ItemId')
+                    )
+                )
+            )
+        ),
+        PolicyId=policy_id
+    )
+    
+    try:
+        # Build detail data - only product items, no risks
+        details = []
+        total_valuation = Decimal('0')
+        total_comm_amount = Decimal('0')
+        for policy_product in policy.policy_products.all():
+            product = policy_product.ProductId
+            product_group = product.ProductTypeId.ProductGroupId if product and product.ProductTypeId else None
+            
+            for product_item in policy_product.product_items.all():
+                item = product_item.ItemId
+                total_valuation += product_item.Valuation or Decimal('0')
+                total_comm_amount += product_item.CommAmount or Decimal('0')
+                
+                details.append({
+                    'policyMainProductItemId': product_item.PolicyMainProductItemId,
+                    'productGroup': product_group.ProductGroupName if product_group else '-',
+                    'productName': product.ProductName if product else '-',
+                    'itemName': item.ItemName if item else '-',
+                    'itemCode': item.ItemCode if item else '-',
+                    'beginDate': product_item.BeginDate.strftime('%Y-%m-%d') if product_item.BeginDate else None,
+                    'endDate': product_item.EndDate.strftime('%Y-%m-%d') if product_item.EndDate else None,
+                    'valuation': float(product_item.Valuation) if product_item.Valuation else None,
+                    'commPercent': float(product_item.CommPercent) if product_item.CommPercent else None,
+                    'commAmount': float(product_item.CommAmount) if product_item.CommAmount else None,
+                })
+        
+        return JsonResponse({
+            'success': True,
+            'policyId': policy.PolicyId,
+            'policyNo': policy.PolicyNo,
+            'details': details,
+            'totalValuation': float(total_valuation),
+            'totalCommAmount': float(total_comm_amount),
+        })
+    except Exception as e:
+        logger.error(f'Error fetching policy details: {str(e)}')
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
 @login_required
 @require_http_methods(["GET"])
 def api_policy_item_questions(request, policy_main_product_item_id):
@@ -14033,6 +13633,94 @@ def api_table_fields(request, table_name):
         }, status=500)
 
 
+@login_required
+@permission_required('core.add_policy_main', raise_exception=True)
+@require_http_methods(["POST"])
+def api_policy_import(request):
+    """
+    Bulk import policies with their products, items, risks, questions,
+    payment schedule and files
+    Input: multipart 'file' (.json / .csv) or a JSON body {"policies": [...]}
+    ?dry_run=1 validates without inserting. Returns per-row errors and throughput.
+    """
+    from core.policy_import import detect_import_format, import_policies, parse_import_file
+    
+    try:
+        if 'file' in request.FILES:
+            uploaded_file = request.FILES['file']
+            import_format = detect_import_format(uploaded_file.name)
+            if import_format is None:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Зөвхөн .json эсвэл .csv файлууд зөвшөөрөгдөнө'
+                }, status=400)
+            records = parse_import_file(uploaded_file.read(), import_format)
+        else:
+            records = parse_import_file(request.body, 'json')
+    except (ValueError, UnicodeDecodeError) as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    if not records:
+        return JsonResponse({'success': False, 'error': 'No policies provided for import'}, status=400)
+    
+    dry_run = request.GET.get('dry_run') in ('1', 'true')
+    try:
+        summary = import_policies(records, get_current_db(), user_id=request.user.id, dry_run=dry_run)
+    except Exception as e:
+        logger.error(f'Error importing policies: {str(e)}')
+        return JsonResponse({'success': False, 'error': f'Алдаа: {str(e)}'}, status=500)
+    
+    logger.info(
+        f'Policy import: {summary["imported"]}/{summary["total"]} imported, {summary["failed"]} failed '
+        f'in {summary["elapsed_seconds"]}s'
+    )
+    return JsonResponse({'success': summary['failed'] == 0, **summary})
+
+
+@login_required
+@permission_required('core.view_policy_main', raise_exception=True)
+@require_http_methods(["GET", "POST"])
+def policy_generate_word_batch(request):
+    """
+    Generate Word documents for many policies and download them as one ZIP
+    Filters: template_id, branch_id, channel_id, date_from/date_to (BeginDate),
+    policy_ids (comma separated). Failed documents are listed in manifest.csv.
+    Rendered in a process pool; the batch is capped at POLICY_BATCH_MAX_POLICIES
+    to finish within the gunicorn worker timeout, larger batches go through
+    the generate_policy_documents command.
+    """
+    from core.policy_batch import (
+        batch_zip_filename, get_batch_max_policies, get_batch_workers, iter_batch_zip, parse_batch_filters,
+        select_policies
+    )
+    
+    params = request.POST if request.method == 'POST' else request.GET
+    try:
+        filters = parse_batch_filters(params)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    db_alias = get_current_db()
+    policies = select_policies(db_alias, **filters)
+    if not policies:
+        return JsonResponse({'success': False, 'error': 'Шүүлтэд тохирох гэрээ олдсонгүй.'}, status=404)
+    max_policies = get_batch_max_policies()
+    if len(policies) > max_policies:
+        return JsonResponse({
+            'success': False,
+            'error': (
+                f'Too many policies ({len(policies)}); narrow the filter to at most {max_policies} '
+                f'or run the generate_policy_documents command for larger batches.'
+            )
+        }, status=400)
+    
+    workers = min(len(policies), get_batch_workers())
+    response = StreamingHttpResponse(iter_batch_zip(policies, db_alias, workers), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{batch_zip_filename()}"'
+    response['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+
 @login_required
 @permission_required('core.view_policy_main', raise_exception=True)
 @require_http_methods(["GET"])
@@ -2,30 +2,109 @@
 Word Document Generator for Insurance Policies
 Generates Word documents from templates based on Ref_Template_Design configuration
 """
+import bisect
+import hashlib
+import io
 import os
+import re
+import threading
+import time
+from collections import OrderedDict
 from docx import Document
-from docx.shared import Pt
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
 from django.conf import settings
-from django.db.models import Model
-from core.models import (
-    Policy_Main,
-    Policy_Main_Product,
-    Policy_Main_Product_Item,
-    Policy_Main_Product_Item_Risk,
-    Policy_Main_Product_Item_Question,
-    Ref_Template_Design,
-    RefClient,
-    Ref_Product,
-    Ref_Item,
-    Ref_Risk,
-    Ref_Item_Question
-)
+from django.db.models import Count, Max
+from core.models import Policy_Main, Ref_Template_Design
+from core.thread_local import get_current_db
 import logging
 from decimal import Decimal
 from datetime import datetime, date
 
 logger = logging.getLogger(__name__)
 
+# [TableName.FieldName] or legacy [FieldName]
+PLACEHOLDER_PATTERN = re.compile(r'\[([^\[\]]+)\]')
+
+
+# Foreign keys rendered by a display attribute of the related row, per table
+FOREIGN_KEY_DISPLAY_FIELDS = {
+    'ins_policy_main': {
+        'ClientId': 'ClientName',
+        'AgentId': 'username',
+        'PolicyTemplateId': 'PolicyTemplateName',
+        'CurrencyId': 'Currency_name',
+        'AgentBranchId': 'BranchName',
+        'AgentChannelId': 'ChannelName',
+        'ApprovedBy': 'username',
+        'CreatedBy': 'username',
+        'ModifiedBy': 'username',
+    },
+    'ins_policy_main_product': {'ProductId': 'ProductName'},
+    'ins_policy_main_product_item': {'ItemId': 'ItemName'},
+    'ins_policy_main_product_item_risk': {'RiskId': 'RiskName'},
+    'ins_policy_main_product_item_question': {'ItemQuestionId': 'ItemQuestionName'},
+}
+
+
+def _by_pk(rows):
+    return sorted(rows, key=lambda row: row.pk)
+
+
+class PolicyValueResolver:
+    """
+    Serves Ref_Template_Design fields of one policy from an in-memory value
+    table built from its prefetched graph (see generate_policy_word_document),
+    so resolving any number of placeholders issues no further queries.
+
+    Rows per table follow the document conventions: every product of the
+    policy, and the items / risks / questions of the first product and item.
+    """
+
+    def __init__(self, policy):
+        self.policy = policy
+        products = _by_pk(policy.policy_products.all())
+        items = _by_pk(products[0].product_items.all()) if products else []
+        risks = _by_pk(items[0].item_risks.all()) if items else []
+        questions = _by_pk(items[0].item_questions.all()) if items else []
+        self._rows = {
+            'ins_policy_main': [policy],
+            'ins_policy_main_product': products,
+            'ins_policy_main_product_item': items,
+            'ins_policy_main_product_item_risk': risks,
+            'ins_policy_main_product_item_question': questions,
+        }
+
+    def _row_value(self, table_name, row, field_name):
+        display_field = FOREIGN_KEY_DISPLAY_FIELDS.get(table_name, {}).get(field_name)
+        if display_field:
+            related = getattr(row, field_name, None)
+            return getattr(related, display_field) if related else None
+        return getattr(row, field_name, None)
+
+    def value(self, table_name, field_name):
+        """Value of a field in the first row of a table, or None."""
+        try:
+            rows = self._rows.get(table_name)
+            if rows:
+                return self._row_value(table_name, rows[0], field_name)
+        except Exception as e:
+            logger.error(f'Error getting field value for {table_name}.{field_name}: {str(e)}')
+        return None
+
+    def values(self, table_name, field_name):
+        """Non-empty values of a field across the rows of a table."""
+        values = []
+        try:
+            for row in self._rows.get(table_name, []):
+                value = self._row_value(table_name, row, field_name)
+                if value is not None:
+                    values.append(value)
+        except Exception as e:
+            logger.error(f'Error getting field values list for {table_name}.{field_name}: {str(e)}')
+        return values
+
 
 def get_field_value(policy, table_name, field_name):
     """
@@ -39,75 +118,12 @@ def get_field_value(policy, table_name, field_name):
     Returns:
         Field value or None
     """
-    try:
-        if table_name == 'ins_policy_main':
-            value = getattr(policy, field_name, None)
-            # Handle foreign key fields
-            if field_name == 'ClientId':
-                return policy.ClientId.ClientName if policy.ClientId else None
-            elif field_name == 'AgentId':
-                return policy.AgentId.username if policy.AgentId else None
-            elif field_name == 'PolicyTemplateId':
-                return policy.PolicyTemplateId.PolicyTemplateName if policy.PolicyTemplateId else None
-            elif field_name == 'CurrencyId':
-                return policy.CurrencyId.Currency_name if policy.CurrencyId else None
-            elif field_name == 'AgentBranchId':
-                return policy.AgentBranchId.BranchName if policy.AgentBranchId else None
-            elif field_name == 'AgentChannelId':
-                return policy.AgentChannelId.ChannelName if policy.AgentChannelId else None
-            elif field_name == 'ApprovedBy':
-                return policy.ApprovedBy.username if policy.ApprovedBy else None
-            elif field_name == 'CreatedBy':
-                return policy.CreatedBy.username if policy.CreatedBy else None
-            elif field_name == 'ModifiedBy':
-                return policy.ModifiedBy.username if policy.ModifiedBy else None
-            return value
-        elif table_name == 'ins_policy_main_product':
-            # Get first product
-            product = Policy_Main_Product.objects.filter(PolicyMainId=policy).select_related('ProductId').first()
-            if product:
-                if field_name == 'ProductId':
-                    return product.ProductId.ProductName if product.ProductId else None
-                return getattr(product, field_name, None)
-        elif table_name == 'ins_policy_main_product_item':
-            # Get first item
-            product = Policy_Main_Product.objects.filter(PolicyMainId=policy).first()
-            if product:
-                item = Policy_Main_Product_Item.objects.filter(PolicyMainProductId=product).select_related('ItemId').first()
-                if item:
-                    if field_name == 'ItemId':
-                        return item.ItemId.ItemName if item.ItemId else None
-                    return getattr(item, field_name, None)
-        elif table_name == 'ins_policy_main_product_item_risk':
-            # Get first risk
-            product = Policy_Main_Product.objects.filter(PolicyMainId=policy).first()
-            if product:
-                item = Policy_Main_Product_Item.objects.filter(PolicyMainProductId=product).first()
-                if item:
-                    risk = Policy_Main_Product_Item_Risk.objects.filter(PolicyMainProductItemId=item).select_related('RiskId').first()
-                    if risk:
-                        if field_name == 'RiskId':
-                            return risk.RiskId.RiskName if risk.RiskId else None
-                        return getattr(risk, field_name, None)
-        elif table_name == 'ins_policy_main_product_item_question':
-            # Get first question
-            product = Policy_Main_Product.objects.filter(PolicyMainId=policy).first()
-            if product:
-                item = Policy_Main_Product_Item.objects.filter(PolicyMainProductId=product).first()
-                if item:
-                    question = Policy_Main_Product_Item_Question.objects.filter(PolicyMainProductItemId=item).select_related('ItemQuestionId').first()
-                    if question:
-                        if field_name == 'ItemQuestionId':
-                            return question.ItemQuestionId.ItemQuestionName if question.ItemQuestionId else None
-                        return getattr(question, field_name, None)
-    except Exception as e:
-        logger.error(f'Error getting field value for {table_name}.{field_name}: {str(e)}')
-    return None
+    return PolicyValueResolver(policy).value(table_name, field_name)
 
 
 def get_field_values_list(policy, table_name, field_name):
     """
-    Get list of field values for dynamic fields (IsStatic=True)
+    Get list of field values for dynamic fields (IsStatic=False)
     
     Args:
         policy: Policy_Main instance
@@ -117,57 +133,7 @@ def get_field_values_list(policy, table_name, field_name):
     Returns:
         List of field values
     """
-    values = []
-    try:
-        if table_name == 'ins_policy_main_product':
-            products = Policy_Main_Product.objects.filter(PolicyMainId=policy).select_related('ProductId')
-            for product in products:
-                if field_name == 'ProductId':
-                    value = product.ProductId.ProductName if product.ProductId else None
-                else:
-                    value = getattr(product, field_name, None)
-                if value is not None:
-                    values.append(value)
-        elif table_name == 'ins_policy_main_product_item':
-            product = Policy_Main_Product.objects.filter(PolicyMainId=policy).first()
-            if product:
-                items = Policy_Main_Product_Item.objects.filter(PolicyMainProductId=product).select_related('ItemId')
-                for item in items:
-                    if field_name == 'ItemId':
-                        value = item.ItemId.ItemName if item.ItemId else None
-                    else:
-                        value = getattr(item, field_name, None)
-                    if value is not None:
-                        values.append(value)
-        elif table_name == 'ins_policy_main_product_item_risk':
-            product = Policy_Main_Product.objects.filter(PolicyMainId=policy).first()
-            if product:
-                item = Policy_Main_Product_Item.objects.filter(PolicyMainProductId=product).first()
-                if item:
-                    risks = Policy_Main_Product_Item_Risk.objects.filter(PolicyMainProductItemId=item).select_related('RiskId')
-                    for risk in risks:
-                        if field_name == 'RiskId':
-                            value = risk.RiskId.RiskName if risk.RiskId else None
-                        else:
-                            value = getattr(risk, field_name, None)
-                        if value is not None:
-                            values.append(value)
-        elif table_name == 'ins_policy_main_product_item_question':
-            product = Policy_Main_Product.objects.filter(PolicyMainId=policy).first()
-            if product:
-                item = Policy_Main_Product_Item.objects.filter(PolicyMainProductId=product).first()
-                if item:
-                    questions = Policy_Main_Product_Item_Question.objects.filter(PolicyMainProductItemId=item).select_related('ItemQuestionId')
-                    for question in questions:
-                        if field_name == 'ItemQuestionId':
-                            value = question.ItemQuestionId.ItemQuestionName if question.ItemQuestionId else None
-                        else:
-                            value = getattr(question, field_name, None)
-                        if value is not None:
-                            values.append(value)
-    except Exception as e:
-        logger.error(f'Error getting field values list for {table_name}.{field_name}: {str(e)}')
-    return values
+    return PolicyValueResolver(policy).values(table_name, field_name)
 
 
 def format_field_value(value):
@@ -191,198 +157,446 @@ def format_field_value(value):
     return str(value)
 
 
-def replace_placeholder_in_paragraph(paragraph, placeholder, value):
+def _document_paragraphs(doc):
     """
-    Replace placeholder in a paragraph, handling multiple occurrences
-    
-    Args:
-        paragraph: docx paragraph object
-        placeholder: Placeholder text (e.g., '[PolicyNo]')
-        value: Replacement value
-    """
-    if placeholder in paragraph.text:
-        # Get original text and formatting before clearing
-        full_text = paragraph.text
-        original_runs = paragraph.runs
-        original_font_name = original_runs[0].font.name if original_runs else None
-        original_font_size = original_runs[0].font.size if original_runs else None
-        
-        # Clear paragraph
-        paragraph.clear()
-        
-        # Split by placeholder and rebuild
-        parts = full_text.split(placeholder)
-        for i, part in enumerate(parts):
-            if part:
-                run = paragraph.add_run(part)
-                if original_font_name:
-                    run.font.name = original_font_name
-                if original_font_size:
-                    run.font.size = original_font_size
-            if i < len(parts) - 1:
-                # Add the replacement value
-                run = paragraph.add_run(str(value))
-                if original_font_name:
-                    run.font.name = original_font_name
-                if original_font_size:
-                    run.font.size = original_font_size
-
-
-def replace_placeholder_in_table(table, placeholder, value):
-    """
-    Replace placeholder in all cells of a table
-    Optimized to prevent freezing
-    
-    Args:
-        table: docx table object
-        placeholder: Placeholder text
-        value: Replacement value
+    Return every paragraph element of the document in one walk: the body
+    (including table cells and nested tables) followed by headers and footers.
+    Merged table cells appear once, unlike table.rows[].cells.
     """
-    value_str = str(value)
-    max_cells = 10000  # Safety limit
-    cell_count = 0
-    
-    for row in table.rows:
-        for cell in row.cells:
-            if cell_count >= max_cells:
-                logger.warning(f'Reached maximum cell limit ({max_cells}) for table replacement')
-                return
-                
-            for paragraph in cell.paragraphs:
-                if placeholder in paragraph.text:
-                    try:
-                        # Get original formatting
-                        original_runs = paragraph.runs
-                        original_font_name = original_runs[0].font.name if original_runs and len(original_runs) > 0 else None
-                        original_font_size = original_runs[0].font.size if original_runs and len(original_runs) > 0 else None
-                        
-                        # Clear and rebuild
-                        full_text = paragraph.text
-                        paragraph.clear()
-                        
-                        parts = full_text.split(placeholder)
-                        for i, part in enumerate(parts):
-                            if part:
-                                run = paragraph.add_run(part)
-                                if original_font_name:
-                                    run.font.name = original_font_name
-                                if original_font_size:
-                                    run.font.size = original_font_size
-                            if i < len(parts) - 1:
-                                run = paragraph.add_run(value_str)
-                                if original_font_name:
-                                    run.font.name = original_font_name
-                                if original_font_size:
-                                    run.font.size = original_font_size
-                    except Exception as e:
-                        logger.warning(f'Error replacing in table cell paragraph: {str(e)}')
-                        # Fallback to simple replacement
-                        try:
-                            paragraph.text = paragraph.text.replace(placeholder, value_str)
-                        except:
-                            pass  # Skip if still fails
-            cell_count += 1
-
-
-def _placeholder_exists_in_document(doc, placeholder):
-    """
-    Check if placeholder exists in document (paragraphs or tables)
-    
+    paragraphs = list(doc.element.body.iter(qn('w:p')))
+    for rel in doc.part.rels.values():
+        if rel.reltype in (RT.HEADER, RT.FOOTER) and not rel.is_external:
+            paragraphs.extend(rel.target_part.element.iter(qn('w:p')))
+    return paragraphs
+
+
+def _paragraph_text_nodes(paragraph):
+    """w:t elements that belong to this paragraph (text boxes nest their own paragraphs)."""
+    return [
+        node for node in paragraph.iter(qn('w:t'))
+        if next(node.iterancestors(qn('w:p')), None) is paragraph
+    ]
+
+
+def find_placeholders(paragraphs):
+    """
+    Locate [Table.Field] / [Field] tokens, including tokens split across runs.
+    Returns {paragraph index: [token, ...]} for paragraphs that contain any.
+    """
+    index = {}
+    for position, paragraph in enumerate(paragraphs):
+        nodes = _paragraph_text_nodes(paragraph)
+        if not nodes:
+            continue
+        text = ''.join(node.text or '' for node in nodes)
+        if '[' not in text:
+            continue
+        tokens = PLACEHOLDER_PATTERN.findall(text)
+        if tokens:
+            index[position] = tokens
+    return index
+
+
+def _set_node_text(node, text):
+    node.text = text
+    node.set(qn('xml:space'), 'preserve')
+
+
+def _split_line_breaks(node):
+    """Turn newlines inside a w:t into <w:br/> so multi-value fields render one per line."""
+    lines = node.text.split('\n')
+    _set_node_text(node, lines[0])
+    anchor = node
+    for line in lines[1:]:
+        line_break = OxmlElement('w:br')
+        anchor.addnext(line_break)
+        text_node = OxmlElement('w:t')
+        _set_node_text(text_node, line)
+        line_break.addnext(text_node)
+        anchor = text_node
+
+
+def _replace_in_paragraph(paragraph, values):
+    """
+    Substitute every known token of a paragraph in place. The value is written
+    into the run holding the opening bracket, so each run keeps its formatting.
+    """
+    nodes = _paragraph_text_nodes(paragraph)
+    texts = [node.text or '' for node in nodes]
+    starts = []
+    offset = 0
+    for text in texts:
+        starts.append(offset)
+        offset += len(text)
+    full_text = ''.join(texts)
+
+    matches = [
+        match for match in PLACEHOLDER_PATTERN.finditer(full_text)
+        if match.group(1) in values
+    ]
+    if not matches:
+        return 0
+
+    def node_at(position):
+        return bisect.bisect_right(starts, position) - 1
+
+    multiline_nodes = set()
+    # Right to left, so the offsets of earlier matches stay valid
+    for match in reversed(matches):
+        value = values[match.group(1)]
+        first = node_at(match.start())
+        last = node_at(match.end() - 1)
+        head = texts[first][:match.start() - starts[first]]
+        if first == last:
+            tail = texts[first][match.end() - starts[first]:]
+            texts[first] = head + value + tail
+        else:
+            texts[first] = head + value
+            for middle in range(first + 1, last):
+                texts[middle] = ''
+            texts[last] = texts[last][match.end() - starts[last]:]
+        if '\n' in value:
+            multiline_nodes.add(first)
+
+    for position, node in enumerate(nodes):
+        if texts[position] != (node.text or ''):
+            _set_node_text(node, texts[position])
+    for position in multiline_nodes:
+        _split_line_breaks(nodes[position])
+    return len(matches)
+
+
+def render_placeholders(paragraphs, values, index=None):
+    """
+    Replace placeholders in a single pass over the paragraphs that contain them.
+
     Args:
-        doc: Document object
-        placeholder: Placeholder text to search for
-    
+        paragraphs: Paragraph elements from _document_paragraphs()
+        values: {token: formatted value}, token without brackets
+        index: Optional result of find_placeholders() to skip the scan
+
     Returns:
-        True if placeholder exists, False otherwise
+        Number of tokens replaced
     """
-    # Check paragraphs
-    for paragraph in doc.paragraphs:
-        if placeholder in paragraph.text:
-            return True
-    
-    # Check tables
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for paragraph in cell.paragraphs:
-                    if placeholder in paragraph.text:
-                        return True
-    return False
+    if index is None:
+        index = find_placeholders(paragraphs)
+    replaced = 0
+    for position, tokens in index.items():
+        if any(token in values for token in tokens):
+            replaced += _replace_in_paragraph(paragraphs[position], values)
+    return replaced
+
+
+def _design_value(resolver, design):
+    """Formatted value of one Ref_Template_Design field."""
+    if design.IsStatic:
+        return format_field_value(resolver.value(design.TableNameEng, design.FieldNameEng))
+    # Dynamic fields list one value per line
+    return '\n'.join(
+        format_field_value(value)
+        for value in resolver.values(design.TableNameEng, design.FieldNameEng)
+    )
 
 
-def replace_text_in_document(doc, placeholder, value):
+def build_placeholder_values(policy, designs, tokens):
     """
-    Replace placeholder text throughout the entire document
-    Optimized to prevent freezing on large documents
+    Resolve the placeholder values used by a document once.
+    [Table.Field] is the primary format; legacy [Field] tokens take the value
+    of the first design with that field name.
+    """
+    resolver = PolicyValueResolver(policy)
+    values = {}
+    for design in designs:
+        key = f'{design.TableNameEng}.{design.FieldNameEng}'
+        legacy_key = design.FieldNameEng
+        wanted = [token for token in (key, legacy_key) if token in tokens and token not in values]
+        if wanted:
+            value = _design_value(resolver, design)
+            for token in wanted:
+                values[token] = value
+    return values
+
+
+class CompiledTemplate:
+    """
+    A Word template prepared for rendering: the raw package bytes, the active
+    designs and the placeholder index of the parsed document.
+    """
+
+    def __init__(self, path, package, designs, placeholder_index, designs_version=None):
+        self.path = path
+        self.package = package
+        self.package_hash = hashlib.sha256(package).hexdigest()
+        self.designs = designs
+        self.designs_version = designs_version
+        self.placeholder_index = placeholder_index
+        self.tokens = {token for found in placeholder_index.values() for token in found}
+
+    def new_document(self):
+        """Parse a fresh, independently editable copy of the template."""
+        return Document(io.BytesIO(self.package))
+
+
+class CompiledTemplateCache:
+    """Per-process LRU of compiled templates."""
+
+    def __init__(self, max_size=None):
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def max_size(self):
+        return self._max_size or getattr(settings, 'WORD_TEMPLATE_CACHE_SIZE', 32)
+
+    def get(self, key):
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+            return compiled
+
+    def put(self, key, compiled):
+        with self._lock:
+            self._entries[key] = compiled
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+compiled_templates = CompiledTemplateCache()
+
+# Ref_Policy_Template.FilePath -> resolved file path
+_resolved_template_paths = {}
+
+
+def _template_path_candidates(file_path):
+    base_dir = str(settings.BASE_DIR)
+    return [
+        os.path.join(settings.MEDIA_ROOT, file_path),
+        os.path.join(base_dir, file_path),
+        file_path,  # Try as-is
+        os.path.join(base_dir, 'templates', 'word_templates', os.path.basename(file_path)),
+        os.path.join(settings.MEDIA_ROOT, 'templates', 'word_templates', os.path.basename(file_path))
+    ]
+
+
+def resolve_template_file(template):
+    """
+    Return (path, os.stat result) of a template's Word file. The resolved
+    location is remembered, so later calls cost a single stat.
+    """
+    if not template.FilePath:
+        error_msg = f'Word template file path not set for template "{template.PolicyTemplateName}" (ID: {template.PolicyTemplateId}). Please set the file path in template management.'
+        logger.error(error_msg)
+        raise ValueError(error_msg)
+
+    file_path = template.FilePath
+    cached_path = _resolved_template_paths.get(file_path)
+    if cached_path:
+        try:
+            return cached_path, os.stat(cached_path)
+        except OSError:
+            _resolved_template_paths.pop(file_path, None)
+
+    # Absolute paths are used as-is; relative ones are searched in media root or project root
+    candidates = [file_path] if os.path.isabs(file_path) else _template_path_candidates(file_path)
+    for path in candidates:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        _resolved_template_paths[file_path] = path
+        return path, stat
+
+    error_msg = f'Word template file not found. Searched in:\n'
+    error_msg += ''.join(f'- {path}\n' for path in candidates)
+    error_msg += f'- Template: {template.PolicyTemplateName} (ID: {template.PolicyTemplateId})'
+    logger.error(error_msg)
+    raise FileNotFoundError(f'Template file not found: {file_path}')
+
+
+def get_compiled_template(template, db_name=None):
+    """
+    Return the CompiledTemplate of a Ref_Policy_Template, compiling it on a
+    cache miss. Entries are keyed by resolved path, file mtime/size and the
+    designs version (latest ModifiedDate and row count), so editing the file
+    or any design makes the next call recompile.
+    """
+    db_name = db_name or template._state.db or get_current_db()
+    path, stat = resolve_template_file(template)
+    designs_version = Ref_Template_Design.objects.using(db_name).filter(
+        PolicyTemplateId=template
+    ).aggregate(modified=Max('ModifiedDate'), count=Count('DesignId'))
+    key = (
+        db_name, template.PolicyTemplateId, path, stat.st_mtime_ns, stat.st_size,
+        designs_version['modified'], designs_version['count'],
+    )
+
+    compiled = compiled_templates.get(key)
+    if compiled is None:
+        with open(path, 'rb') as template_file:
+            package = template_file.read()
+        designs = list(Ref_Template_Design.objects.using(db_name).filter(
+            PolicyTemplateId=template,
+            IsActive=True
+        ).order_by('TableNameEng', 'FieldNameEng'))
+        doc = Document(io.BytesIO(package))
+        compiled = CompiledTemplate(
+            path, package, designs, find_placeholders(_document_paragraphs(doc)),
+            designs_version=(designs_version['modified'], designs_version['count'])
+        )
+        compiled_templates.put(key, compiled)
+    return compiled
+
+
+def generated_documents_dir():
+    return os.path.join(settings.MEDIA_ROOT, 'policy_documents')
+
+
+def document_cache_key(compiled, values):
+    """
+    Content address of a generated document: the template file hash, the
+    designs version and every placeholder value. The values are exactly what
+    the document shows, so any change in the policy graph (or in the client,
+    product, item or risk names it displays) yields a new key.
+    """
+    digest = hashlib.sha256()
+    digest.update(compiled.package_hash.encode('utf-8'))
+    digest.update(repr(compiled.designs_version).encode('utf-8'))
+    for token in sorted(values):
+        digest.update(b'\0' + token.encode('utf-8') + b'\0' + values[token].encode('utf-8'))
+    return digest.hexdigest()
+
+
+_last_prune = 0.0
+_prune_lock = threading.Lock()
+
+
+def prune_generated_documents(max_age_days=None, max_bytes=None):
+    """
+    Apply the retention policy to MEDIA_ROOT/policy_documents: remove documents
+    not used for max_age_days, then the least recently used ones until the
+    directory fits in max_bytes. Served documents are touched, so mtime is the
+    last use. Returns (files removed, bytes removed).
+    """
+    if max_age_days is None:
+        max_age_days = getattr(settings, 'POLICY_DOCUMENT_MAX_AGE_DAYS', 30)
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'POLICY_DOCUMENT_MAX_BYTES', 2 * 1024 ** 3)
+
+    root = generated_documents_dir()
+    entries = []
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    entries.sort()
+
+    cutoff = time.time() - max_age_days * 86400
+    total_bytes = sum(size for _, size, _ in entries)
+    removed_files = removed_bytes = 0
+    for mtime, size, path in entries:
+        if mtime >= cutoff and total_bytes <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total_bytes -= size
+        removed_files += 1
+        removed_bytes += size
+        try:
+            os.rmdir(os.path.dirname(path))  # Only succeeds once the key directory is empty
+        except OSError:
+            pass
+    return removed_files, removed_bytes
+
+
+def _maybe_prune_generated_documents():
+    """Run the retention policy at most once per POLICY_DOCUMENT_PRUNE_INTERVAL seconds per process."""
+    global _last_prune
+    interval = getattr(settings, 'POLICY_DOCUMENT_PRUNE_INTERVAL', 3600)
+    now = time.time()
+    if now - _last_prune < interval or not _prune_lock.acquire(blocking=False):
+        return
+    try:
+        _last_prune = now
+        removed_files, removed_bytes = prune_generated_documents()
+        if removed_files:
+            logger.info(f'Pruned {removed_files} generated policy document(s), {removed_bytes} bytes')
+    except Exception as e:
+        logger.warning(f'Error pruning generated policy documents: {str(e)}')
+    finally:
+        _prune_lock.release()
+
+
+def render_policy_word_document(policy_id):
+    """
+    Generate Word document for a policy based on template design
     
     Args:
-        doc: Document object
-        placeholder: Placeholder text (e.g., '[PolicyNo]')
-        value: Replacement value
+        policy_id: Policy ID
+    
+    Returns:
+        Path to generated Word document
+    
+    Raises:
+        Policy_Main.DoesNotExist, ValueError / FileNotFoundError for template problems
     """
-    value_str = str(value)
+    # Get policy with related objects
+    policy = Policy_Main.objects.select_related(
+        'PolicyTemplateId', 'ClientId', 'AgentId', 'CurrencyId',
+        'AgentBranchId', 'AgentChannelId', 'ApprovedBy', 'CreatedBy', 'ModifiedBy'
+    ).prefetch_related(
+        'policy_products__ProductId',
+        'policy_products__product_items__ItemId',
+        'policy_products__product_items__item_risks__RiskId',
+        'policy_products__product_items__item_questions__ItemQuestionId'
+    ).get(PolicyId=policy_id)
     
-    # Replace in all paragraphs (limit to prevent freezing)
-    paragraph_count = 0
-    max_paragraphs = 10000  # Safety limit
+    # Template file, designs and placeholder index are compiled once per
+    # template version and reused from the per-process cache
+    compiled = get_compiled_template(policy.PolicyTemplateId)
     
-    for paragraph in doc.paragraphs:
-        if paragraph_count >= max_paragraphs:
-            logger.warning(f'Reached maximum paragraph limit ({max_paragraphs}) for replacement')
-            break
-            
-        if placeholder in paragraph.text:
-            try:
-                # Preserve formatting
-                runs = paragraph.runs
-                if runs and len(runs) > 0:
-                    # Get formatting from first run
-                    font_name = runs[0].font.name if runs[0].font.name else None
-                    font_size = runs[0].font.size if runs[0].font.size else None
-                    
-                    # Clear and rebuild
-                    full_text = paragraph.text
-                    paragraph.clear()
-                    
-                    parts = full_text.split(placeholder)
-                    for i, part in enumerate(parts):
-                        if part:
-                            run = paragraph.add_run(part)
-                            if font_name:
-                                run.font.name = font_name
-                            if font_size:
-                                run.font.size = font_size
-                        if i < len(parts) - 1:
-                            run = paragraph.add_run(value_str)
-                            if font_name:
-                                run.font.name = font_name
-                            if font_size:
-                                run.font.size = font_size
-                else:
-                    # Simple replacement if no runs
-                    paragraph.text = paragraph.text.replace(placeholder, value_str)
-            except Exception as e:
-                logger.warning(f'Error replacing in paragraph: {str(e)}')
-                # Fallback to simple replacement
-                try:
-                    paragraph.text = paragraph.text.replace(placeholder, value_str)
-                except:
-                    pass  # Skip if still fails
-        paragraph_count += 1
+    # Resolve only the fields the document uses
+    values = build_placeholder_values(policy, compiled.designs, compiled.tokens)
     
-    # Replace in all tables (limit to prevent freezing)
-    table_count = 0
-    max_tables = 1000  # Safety limit
+    # Documents are content-addressed: an unchanged policy and template reuse
+    # the file generated before instead of rendering it again
+    output_dir = os.path.join(generated_documents_dir(), document_cache_key(compiled, values))
+    output_filename = f'policy_{policy.PolicyNo}_{policy.PolicyId}.docx'
+    output_path = os.path.join(output_dir, output_filename)
     
-    for table in doc.tables:
-        if table_count >= max_tables:
-            logger.warning(f'Reached maximum table limit ({max_tables}) for replacement')
-            break
+    if os.path.exists(output_path):
         try:
-            replace_placeholder_in_table(table, placeholder, value_str)
-        except Exception as e:
-            logger.warning(f'Error replacing in table: {str(e)}')
-        table_count += 1
+            os.utime(output_path)  # Mark as recently used for the retention policy
+            logger.info(f'Word document served from cache: {output_path}')
+            return output_path
+        except OSError:
+            pass  # Evicted meanwhile: render it again
+    
+    # Substitute [TableName.FieldName] / legacy [FieldName] tokens in one pass
+    doc = compiled.new_document()
+    render_placeholders(_document_paragraphs(doc), values, compiled.placeholder_index)
+    
+    # Save generated document (atomically, concurrent requests may render the same key)
+    os.makedirs(output_dir, exist_ok=True)
+    temp_path = f'{output_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    doc.save(temp_path)
+    os.replace(temp_path, output_path)
+    
+    logger.info(f'Word document generated successfully: {output_path}')
+    _maybe_prune_generated_documents()
+    return output_path
 
 
 def generate_policy_word_document(policy_id):
@@ -396,168 +610,10 @@ def generate_policy_word_document(policy_id):
         Path to generated Word document or None if error
     """
     try:
-        # Get policy with related objects
-        policy = Policy_Main.objects.select_related(
-            'PolicyTemplateId', 'ClientId', 'AgentId', 'CurrencyId',
-            'AgentBranchId', 'AgentChannelId', 'ApprovedBy', 'CreatedBy', 'ModifiedBy'
-        ).prefetch_related(
-            'policy_products__ProductId',
-            'policy_products__product_items__ItemId',
-            'policy_products__product_items__item_risks__RiskId',
-            'policy_products__product_items__item_questions__ItemQuestionId'
-        ).get(PolicyId=policy_id)
-        
-        # Get template
-        template = policy.PolicyTemplateId
-        
-        # Check if template has Word file
-        if not template.FilePath:
-            error_msg = f'Word template file path not set for template "{template.PolicyTemplateName}" (ID: {template.PolicyTemplateId}). Please set the file path in template management.'
-            logger.error(error_msg)
-            raise ValueError(error_msg)
-        
-        # Check if file exists (handle both absolute and relative paths)
-        template_path = template.FilePath
-        original_path = template_path
-        
-        if not os.path.isabs(template_path):
-            # Relative path - check in media root or project root
-            from pathlib import Path
-            base_dir = Path(settings.BASE_DIR)
-            media_path = os.path.join(settings.MEDIA_ROOT, template_path)
-            base_path = os.path.join(base_dir, template_path)
-            
-            # Try different locations
-            possible_paths = [
-                media_path,
-                base_path,
-                template_path,  # Try as-is
-                os.path.join(base_dir, 'templates', 'word_templates', os.path.basename(template_path)),
-                os.path.join(settings.MEDIA_ROOT, 'templates', 'word_templates', os.path.basename(template_path))
-            ]
-            
-            found_path = None
-            for path in possible_paths:
-                if os.path.exists(path):
-                    found_path = path
-                    break
-            
-            if found_path:
-                template_path = found_path
-            else:
-                error_msg = f'Word template file not found. Searched in:\n'
-                error_msg += f'- Original path: {original_path}\n'
-                error_msg += f'- Media path: {media_path}\n'
-                error_msg += f'- Base path: {base_path}\n'
-                error_msg += f'- Template: {template.PolicyTemplateName} (ID: {template.PolicyTemplateId})'
-                logger.error(error_msg)
-                raise FileNotFoundError(f'Template file not found: {original_path}')
-        
-        if not os.path.exists(template_path):
-            error_msg = f'Word template file not found: {template_path} (Original: {original_path})'
-            logger.error(error_msg)
-            raise FileNotFoundError(error_msg)
-        
-        # Load Word template
-        doc = Document(template_path)
-        
-        # Get all template designs for this template
-        template_designs = Ref_Template_Design.objects.filter(
-            PolicyTemplateId=template,
-            IsActive=True
-        ).order_by('TableNameEng', 'FieldNameEng')
-        
-        # Process each template design
-        # Primary format: [TableName.FieldName]
-        # Limit processing to prevent freezing on large documents
-        max_replacements = 1000  # Safety limit
-        replacement_count = 0
-        
-        for design in template_designs:
-            if replacement_count >= max_replacements:
-                logger.warning(f'Reached maximum replacement limit ({max_replacements}) for policy {policy_id}')
-                break
-                
-            # Use format [TableName.FieldName] for placeholders
-            placeholder = f'[{design.TableNameEng}.{design.FieldNameEng}]'
-            
-            if design.IsStatic:
-                # Single value - replace throughout document
-                value = get_field_value(policy, design.TableNameEng, design.FieldNameEng)
-                formatted_value = format_field_value(value)
-                
-                # Replace in entire document
-                replace_text_in_document(doc, placeholder, formatted_value)
-                replacement_count += 1
-            else:
-                # Multiple rows - get all values
-                values = get_field_values_list(policy, design.TableNameEng, design.FieldNameEng)
-                
-                if values:
-                    # Format all values
-                    formatted_values = [format_field_value(v) for v in values]
-                    
-                    # For dynamic fields, join with newline or comma
-                    # Limit the number of values to prevent freezing
-                    if len(formatted_values) > 100:
-                        formatted_values = formatted_values[:100]
-                        logger.warning(f'Truncated dynamic field values to 100 for {placeholder}')
-                    
-                    combined_value = '\n'.join(formatted_values)
-                    
-                    # Replace in entire document
-                    replace_text_in_document(doc, placeholder, combined_value)
-                    replacement_count += 1
-                else:
-                    # No values found - replace with empty string
-                    replace_text_in_document(doc, placeholder, '')
-                    replacement_count += 1
-        
-        # Also support legacy format [FieldNameEng] for backward compatibility
-        # Only process if legacy placeholders might exist
-        for design in template_designs:
-            if replacement_count >= max_replacements:
-                break
-                
-            legacy_placeholder = f'[{design.FieldNameEng}]'
-            
-            # Check if legacy placeholder exists in document
-            if _placeholder_exists_in_document(doc, legacy_placeholder):
-                if design.IsStatic:
-                    value = get_field_value(policy, design.TableNameEng, design.FieldNameEng)
-                    formatted_value = format_field_value(value)
-                    replace_text_in_document(doc, legacy_placeholder, formatted_value)
-                    replacement_count += 1
-                else:
-                    values = get_field_values_list(policy, design.TableNameEng, design.FieldNameEng)
-                    if values:
-                        formatted_values = [format_field_value(v) for v in values]
-                        if len(formatted_values) > 100:
-                            formatted_values = formatted_values[:100]
-                        combined_value = '\n'.join(formatted_values)
-                        replace_text_in_document(doc, legacy_placeholder, combined_value)
-                        replacement_count += 1
-                    else:
-                        replace_text_in_document(doc, legacy_placeholder, '')
-                        replacement_count += 1
-        
-        # Save generated document
-        output_dir = os.path.join(settings.MEDIA_ROOT, 'policy_documents')
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Generate unique filename
-        output_filename = f'policy_{policy.PolicyNo}_{policy.PolicyId}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.docx'
-        output_path = os.path.join(output_dir, output_filename)
-        
-        doc.save(output_path)
-        
-        logger.info(f'Word document generated successfully: {output_path}')
-        return output_path
-        
+        return render_policy_word_document(policy_id)
     except Policy_Main.DoesNotExist:
         logger.error(f'Policy {policy_id} not found')
         return None
     except Exception as e:
         logger.error(f'Error generating Word document for policy {policy_id}: {str(e)}', exc_info=True)
         return None
-